@@ -16,9 +16,13 @@ if config.config_file_name is not None:
 
 # add your model's MetaData object here
 # for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+from app import database, models
+
+target_metadata = models.Base.metadata
+
+# La URL de la base de datos sale de la misma configuración que la API
+# (variables de entorno / .env), no de alembic.ini.
+config.set_main_option("sqlalchemy.url", database.DATABASE_URL.replace("%", "%%"))
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
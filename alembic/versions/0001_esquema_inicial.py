@@ -0,0 +1,140 @@
+"""esquema inicial
+
+Esquema creado hasta ahora por ``Base.metadata.create_all``. En bases de
+datos existentes basta con ``alembic stamp 0001`` antes de ``upgrade head``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'usuarios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('correo', sa.String(), nullable=False),
+        sa.Column('fecha_registro', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('correo'),
+    )
+    op.create_index('ix_usuarios_id', 'usuarios', ['id'])
+
+    op.create_table(
+        'proyectos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('descripcion', sa.String(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('horas', sa.Float(), nullable=True),
+        sa.Column('fuente', sa.String(), nullable=True),
+        sa.Column('tandem_id', sa.String(), nullable=True),
+        sa.Column('uuid', sa.String(), nullable=True),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_proyectos_id', 'proyectos', ['id'])
+
+    op.create_table(
+        'categorias',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('omniclass', sa.String(), nullable=True),
+        sa.Column('usuario', sa.String(), nullable=True),
+        sa.Column('proyecto_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['proyecto_id'], ['proyectos.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_categorias_id', 'categorias', ['id'])
+
+    op.create_table(
+        'familias',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('omniclass', sa.String(), nullable=True),
+        sa.Column('parametros', sa.NVARCHAR(), nullable=True),
+        sa.Column('categoria_id', sa.Integer(), nullable=False),
+        sa.Column('revit_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['categoria_id'], ['categorias.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_familias_id', 'familias', ['id'])
+
+    op.create_table(
+        'tipos_familia',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('omniclass', sa.String(), nullable=True),
+        sa.Column('parametros', sa.NVARCHAR(), nullable=True),
+        sa.Column('familia_id', sa.Integer(), nullable=False),
+        sa.Column('revit_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['familia_id'], ['familias.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_tipos_familia_id', 'tipos_familia', ['id'])
+
+    op.create_table(
+        'elementos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('omniclass', sa.String(), nullable=True),
+        sa.Column('parametros', sa.NVARCHAR(), nullable=True),
+        sa.Column('usuario', sa.String(), nullable=True),
+        sa.Column('fecha_modificacion', sa.DateTime(), nullable=True),
+        sa.Column('tipo_familia_id', sa.Integer(), nullable=False),
+        sa.Column('revit_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['tipo_familia_id'], ['tipos_familia.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_elementos_id', 'elementos', ['id'])
+
+    op.create_table(
+        'proyecto_usuarios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('proyecto_id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('horas', sa.Float(), nullable=True),
+        sa.Column('fecha_inicio', sa.DateTime(), nullable=True),
+        sa.Column('fecha_fin', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['proyecto_id'], ['proyectos.id']),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_proyecto_usuarios_id', 'proyecto_usuarios', ['id'])
+
+    op.create_table(
+        'auditoria_sync',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario', sa.String(length=255), nullable=True),
+        sa.Column('proyecto', sa.String(length=255), nullable=True),
+        sa.Column('entidad', sa.String(length=100), nullable=True),
+        sa.Column('revit_id', sa.Integer(), nullable=True),
+        sa.Column('accion', sa.String(length=50), nullable=True),
+        sa.Column('fecha_hora', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('detalle', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_auditoria_sync_id', 'auditoria_sync', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in ('auditoria_sync', 'proyecto_usuarios', 'elementos', 'tipos_familia',
+                  'familias', 'categorias', 'proyectos', 'usuarios'):
+        op.drop_index(f'ix_{tabla}_id', table_name=tabla)
+        op.drop_table(tabla)
@@ -0,0 +1,275 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import exc
+from app import crud, database
+
+# Fallos de conexión o de pool: el lote se reintenta entero más tarde. Cualquier
+# otro error se atribuye a los datos del lote.
+ERRORES_TRANSITORIOS = (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError)
+
+
+# ======================================================
+# 🧾 Auditoría en segundo plano (escritura por lotes)
+# ======================================================
+class EscritorAuditoria:
+    """
+    Acumula en memoria los eventos de AuditoriaSync y los escribe con INSERT
+    multi-fila desde un hilo propio, cuando hay ``tamano_lote`` pendientes o
+    cada ``intervalo`` segundos. Así una petición de borrado o de
+    sincronización no paga un commit extra por auditar, ni espera a la BD.
+
+    ``fecha_hora`` se fija al registrar el evento, no al escribirlo. El
+    buffer nunca pasa de ``max_pendientes``: lo que no cabe (BD caída o
+    lenta) se descarta y se cuenta en ``descartados``. Si la escritura falla
+    por la conexión, el lote vuelve al principio del buffer y se reintenta;
+    si falla por sus datos, se parte en mitades hasta aislar las filas que
+    no entran, que se apartan (``rechazados`` y ``ultimos_rechazos``) para
+    que no bloqueen al resto.
+
+    ``detener`` vacía lo pendiente; sin hilo arrancado se escribe en el acto.
+    Un cierre abrupto del proceso puede perder, como mucho, los eventos de
+    un intervalo.
+
+    Cada ``intervalo_retencion`` segundos, el worker que obtiene el bloqueo
+    ``retencion_auditoria`` archiva lo anterior a ``retencion_dias`` y purga
+    del archivo lo anterior a ``archivo_dias`` (0 desactiva cada paso).
+    """
+
+    def __init__(
+        self,
+        tamano_lote: int = 500,
+        intervalo: float = 2.0,
+        max_pendientes: int = 50000,
+        retencion_dias: int = 90,
+        archivo_dias: int = 0,
+        intervalo_retencion: float = 3600,
+    ):
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self.retencion_dias = retencion_dias
+        self.archivo_dias = archivo_dias
+        self.intervalo_retencion = intervalo_retencion
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+        self._lock_escritura = threading.Lock()  # un solo escritor: conserva el orden
+        self._hay_lote = threading.Event()
+        self._parar = threading.Event()
+        self._hilos = []
+        self.escritos = 0
+        self.errores = 0
+        self.descartados = 0
+        self.rechazados = 0
+        self.ultimos_rechazos = deque(maxlen=20)
+        self._desbordado = False
+        self.ultima_escritura = None
+        self.ultima_retencion = None
+
+    def iniciar(self):
+        """Arranca el hilo escritor y el de retención (idempotente)."""
+        with self._lock:
+            if self._hilos:
+                return
+            self._parar.clear()
+            self._hilos = [threading.Thread(target=self._bucle, name="auditoria-escritor", daemon=True)]
+            if self.retencion_dias > 0:
+                self._hilos.append(threading.Thread(target=self._bucle_retencion, name="auditoria-retencion", daemon=True))
+            for hilo in self._hilos:
+                hilo.start()
+        print(f"🧾 Auditoría por lotes iniciada (lote={self.tamano_lote}, intervalo={self.intervalo}s)")
+
+    def detener(self, timeout: float = None):
+        """Detiene los hilos y escribe todo lo pendiente."""
+        with self._lock:
+            hilos, self._hilos = self._hilos, []
+        self._parar.set()
+        self._hay_lote.set()
+        for hilo in hilos:
+            hilo.join(timeout)
+        self.volcar()
+        if self._pendientes:
+            print(f"⚠️ Quedan {len(self._pendientes)} eventos de auditoría sin escribir")
+
+    # --------------------------------------------------
+    # Registro de eventos
+    # --------------------------------------------------
+    def registrar(self, usuario: str, proyecto: str, entidad: str, revit_id: int, accion: str, detalle=None):
+        self.registrar_lote([{
+            "usuario": usuario, "proyecto": proyecto, "entidad": entidad,
+            "revit_id": revit_id, "accion": accion, "detalle": detalle,
+        }])
+
+    def registrar_lote(self, filas: list):
+        """Encola filas con las columnas de AuditoriaSync (seguro desde cualquier hilo)."""
+        if not filas:
+            return
+        ahora = datetime.now()
+        for fila in filas:
+            fila.setdefault("fecha_hora", ahora)
+        with self._lock:
+            self._pendientes.extend(filas)
+            self._acotar()
+            pendientes, activo = len(self._pendientes), bool(self._hilos)
+        if not activo:
+            self.volcar()
+        elif pendientes >= self.tamano_lote:
+            self._hay_lote.set()
+
+    def _acotar(self):
+        """Descarta lo más reciente que exceda ``max_pendientes`` (con ``_lock`` tomado)."""
+        sobran = len(self._pendientes) - self.max_pendientes
+        if sobran <= 0:
+            return
+        for _ in range(sobran):
+            self._pendientes.pop()
+        self.descartados += sobran
+        if not self._desbordado:
+            self._desbordado = True
+            print(f"⚠️ Buffer de auditoría lleno ({self.max_pendientes}): se descartan eventos nuevos")
+
+    def registrar_sincronizacion(self, resultado: dict):
+        """Un evento por sincronización Revit → SQL completada."""
+        detalle = {
+            clave: resultado[clave]
+            for clave in ("modo", "categorias_insertadas", "nodos_omitidos", "cambios", "insertados")
+            if clave in resultado
+        }
+        self.registrar(resultado.get("usuario") or "Desconocido", resultado.get("proyecto") or "Sin proyecto",
+                       "Proyecto", None, "SINCRONIZAR", detalle)
+
+    # --------------------------------------------------
+    # Escritura
+    # --------------------------------------------------
+    def volcar(self) -> int:
+        """Escribe lo pendiente en lotes; devuelve las filas escritas."""
+        escritas = 0
+        with self._lock_escritura:
+            while True:
+                with self._lock:
+                    n = min(len(self._pendientes), self.tamano_lote)
+                    lote = [self._pendientes.popleft() for _ in range(n)]
+                    if not lote:
+                        self._desbordado = False
+                if not lote:
+                    break
+                escritas_lote, completo = self._escribir(lote)
+                escritas += escritas_lote
+                if not completo:
+                    break
+        if escritas:
+            self.escritos += escritas
+            self.ultima_escritura = datetime.now()
+        return escritas
+
+    def _escribir(self, lote: list):
+        """
+        Escribe ``lote`` partiéndolo en mitades cuando falla por sus datos;
+        una fila que falla sola se aparta. Ante un error transitorio, lo que
+        falta vuelve al principio del buffer. Devuelve ``(escritas, completo)``.
+        """
+        escritas = 0
+        trozos = [lote]
+        while trozos:
+            trozo = trozos.pop()
+            try:
+                self._insertar(trozo)
+                escritas += len(trozo)
+            except ERRORES_TRANSITORIOS as e:
+                restantes = [fila for t in (trozo, *reversed(trozos)) for fila in t]
+                with self._lock:
+                    self._pendientes.extendleft(reversed(restantes))
+                    self._acotar()
+                self.errores += 1
+                print(f"⚠️ Error escribiendo auditoría ({len(restantes)} eventos, se reintentará): {e}")
+                return escritas, False
+            except Exception as e:
+                if len(trozo) > 1:
+                    mitad = len(trozo) // 2
+                    trozos.extend((trozo[mitad:], trozo[:mitad]))
+                    continue
+                self.rechazados += 1
+                self.ultimos_rechazos.append({"fila": trozo[0], "error": str(e)[:500]})
+                print(f"⚠️ Evento de auditoría rechazado por la BD, se descarta: {e}")
+        return escritas, True
+
+    def _insertar(self, filas: list):
+        db = database.SessionLocal()
+        try:
+            crud.insertar_auditoria(db, filas, self.tamano_lote)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            self._hay_lote.wait(self.intervalo)
+            self._hay_lote.clear()
+            self.volcar()
+
+    # --------------------------------------------------
+    # Retención
+    # --------------------------------------------------
+    def _bucle_retencion(self):
+        while not self._parar.wait(self.intervalo_retencion):
+            try:
+                self.aplicar_retencion()
+            except Exception as e:
+                print(f"⚠️ Error aplicando la retención de auditoría: {e}")
+
+    def aplicar_retencion(self):
+        """
+        Archiva y purga si este worker obtiene el bloqueo. El bloqueo no se
+        libera: caduca con el intervalo y evita que otro worker repita el
+        trabajo en la misma ventana.
+        """
+        db = database.SessionBulk()
+        try:
+            if not crud.adquirir_bloqueo(db, "retencion_auditoria", self.id, ttl=self.intervalo_retencion):
+                return None
+            ahora = datetime.now()
+            purgar = ahora - timedelta(days=self.archivo_dias) if self.archivo_dias > 0 else None
+            t0 = time.perf_counter()
+            resultado = crud.archivar_auditoria(db, ahora - timedelta(days=self.retencion_dias), purgar)
+        finally:
+            db.close()
+        self.ultima_retencion = {**resultado, "fecha": ahora, "duracion": round(time.perf_counter() - t0, 3)}
+        if resultado["archivados"] or resultado["purgados"]:
+            print(f"🧾 Auditoría: {resultado['archivados']} archivados, {resultado['purgados']} purgados")
+        return resultado
+
+    def estado(self) -> dict:
+        return {
+            "activo": bool(self._hilos),
+            "pendientes": len(self._pendientes),
+            "max_pendientes": self.max_pendientes,
+            "escritos": self.escritos,
+            "errores": self.errores,
+            "descartados": self.descartados,
+            "rechazados": self.rechazados,
+            "ultimos_rechazos": list(self.ultimos_rechazos),
+            "ultima_escritura": self.ultima_escritura,
+            "ultima_retencion": self.ultima_retencion,
+            "tamano_lote": self.tamano_lote,
+            "intervalo": self.intervalo,
+            "retencion_dias": self.retencion_dias,
+            "archivo_dias": self.archivo_dias,
+        }
+
+
+# Instancia global del escritor
+escritor = EscritorAuditoria(
+    tamano_lote=int(os.getenv("AUDITORIA_LOTE", "500")),
+    intervalo=float(os.getenv("AUDITORIA_INTERVALO", "2")),
+    max_pendientes=int(os.getenv("AUDITORIA_MAX_PENDIENTES", "50000")),
+    retencion_dias=int(os.getenv("AUDITORIA_RETENCION_DIAS", "90")),
+    archivo_dias=int(os.getenv("AUDITORIA_ARCHIVO_DIAS", "0")),
+)
@@ -1,13 +1,58 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from jose import jwt, JWTError, ExpiredSignatureError
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from fastapi import HTTPException, WebSocketException
+from starlette.requests import HTTPConnection
 
 # Cargar variables de entorno
 load_dotenv()
 
 JWT_SECRET = os.getenv("JWT_SECRET", "change_me")  # ⚠️ cambia esto en producción
 JWT_ALGO = os.getenv("JWT_ALGO", "HS256")
+# Por defecto toda petición necesita token; con AUTH_REQUERIDA=0 (solo para
+# desarrollo y pruebas) las que no lo traen pasan como cliente anónimo
+AUTH_REQUERIDA = os.getenv("AUTH_REQUERIDA", "1") != "0"
+JWT_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "10000"))
+
+
+# ===============================
+# 🗝️ Material de claves (se carga una sola vez)
+# ===============================
+_claves = None
+
+
+def _leer_pem(variable: str):
+    valor = os.getenv(variable)
+    ruta = os.getenv(f"{variable}_FILE")
+    if not valor and ruta:
+        with open(ruta) as f:
+            valor = f.read()
+    return valor
+
+
+def cargar_claves():
+    """
+    Carga las claves de firma y verificación (secreto HMAC o, para RS*/ES*,
+    JWT_PRIVATE_KEY / JWT_PUBLIC_KEY o sus variantes ``_FILE``) y vacía la
+    caché de tokens verificados. Se llama al arrancar la aplicación.
+    """
+    global _claves
+    if JWT_ALGO.startswith("HS"):
+        _claves = {"firma": JWT_SECRET, "verificacion": JWT_SECRET}
+    else:
+        _claves = {"firma": _leer_pem("JWT_PRIVATE_KEY"), "verificacion": _leer_pem("JWT_PUBLIC_KEY")}
+    cache_tokens.limpiar()
+    return _claves
+
+
+def _clave(uso: str):
+    return (_claves or cargar_claves())[uso]
+
 
 # ===============================
 # 🔐 Crear un JWT (para Revit / API)
@@ -22,9 +67,63 @@ def create_jwt(client_id: str, expires_minutes: int = 15):
         "iat": int(now.timestamp()),  # Issued at
         "exp": int((now + timedelta(minutes=expires_minutes)).timestamp())  # Expiration
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
+    token = jwt.encode(payload, _clave("firma"), algorithm=JWT_ALGO)
     return token
 
+
+# ===============================
+# 🧠 Caché de tokens verificados
+# ===============================
+class CacheTokens:
+    """
+    LRU acotada de claims ya verificados, indexada por el SHA-256 del token
+    (el token en claro no se guarda). Cada entrada vale hasta el ``exp`` del
+    token, o ``ttl_sin_exp`` segundos si no lo tiene.
+    """
+
+    def __init__(self, max_entradas: int = 10000, ttl_sin_exp: float = 300):
+        self.max_entradas = max_entradas
+        self.ttl_sin_exp = ttl_sin_exp
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def obtener(self, clave: bytes):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            claims, expira = entrada
+            if time.time() >= expira:
+                del self._entradas[clave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return claims
+
+    def guardar(self, clave: bytes, claims: dict):
+        expira = claims.get("exp") or time.time() + self.ttl_sin_exp
+        with self._lock:
+            self._entradas[clave] = (claims, expira)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_tokens = CacheTokens(max_entradas=JWT_CACHE_MAX)
+
+
 # ===============================
 # 🧾 Verificar y decodificar un JWT
 # ===============================
@@ -32,13 +131,93 @@ def verify_jwt(token: str):
     """
     Verifica y decodifica un token JWT.
     Lanza errores si el token no es válido o está expirado.
+
+    Un token ya verificado se sirve desde ``cache_tokens`` hasta su ``exp``
+    sin volver a comprobar la firma.
     """
+    clave = CacheTokens.clave(token)
+    claims = cache_tokens.obtener(clave)
+    if claims is not None:
+        return dict(claims)
+
     try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
-        return decoded
+        decoded = jwt.decode(token, _clave("verificacion"), algorithms=[JWT_ALGO])
     except ExpiredSignatureError:
         print("❌ Token expirado.")
         raise ValueError("El token ha expirado.")
     except JWTError:
         print("⚠️ Token inválido.")
         raise ValueError("El token es inválido.")
+    cache_tokens.guardar(clave, decoded)
+    return dict(decoded)
+
+
+# ===============================
+# 🪪 Identidad del cliente
+# ===============================
+class Cliente:
+    """
+    Identidad del llamante, disponible en ``request.state.cliente`` (o
+    ``websocket.state.cliente``) para limitación de tasa y auditoría.
+    """
+
+    __slots__ = ("id", "claims", "autenticado")
+
+    def __init__(self, id: str, claims: dict = None, autenticado: bool = True):
+        self.id = id
+        self.claims = claims or {}
+        self.autenticado = autenticado
+
+    def __repr__(self):
+        return f"Cliente({self.id!r})"
+
+
+ANONIMO = Cliente("anonimo", autenticado=False)
+
+
+def _token_de(authorization: str):
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return None
+
+
+def _identificar(token: str) -> Cliente:
+    claims = verify_jwt(token)
+    return Cliente(str(claims.get("sub")), claims)
+
+
+async def requerir_cliente(conexion: HTTPConnection) -> Cliente:
+    """
+    Dependencia de FastAPI para rutas HTTP y WebSocket: valida el token y
+    deja la identidad en ``conexion.state.cliente``. Es async para no pasar
+    por el threadpool: con la caché, verificar cuesta microsegundos.
+
+    El token llega en ``Authorization: Bearer``; en el handshake WebSocket
+    también se acepta ``?token=`` (los navegadores no pueden enviar
+    cabeceras). Un token inválido siempre se rechaza (401, o cierre 1008
+    en WebSocket); la ausencia de token solo si ``AUTH_REQUERIDA``.
+    """
+    es_websocket = conexion.scope["type"] == "websocket"
+    token = _token_de(conexion.headers.get("authorization"))
+    if token is None and es_websocket:
+        token = conexion.query_params.get("token")
+
+    try:
+        if token is None:
+            if AUTH_REQUERIDA:
+                raise ValueError("Falta el token de acceso")
+            cliente = ANONIMO
+        else:
+            cliente = _identificar(token)
+    except ValueError as e:
+        if es_websocket:
+            raise WebSocketException(code=1008, reason=str(e))
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+    conexion.state.cliente = cliente
+    return cliente
+
+
+def cliente_actual(conexion: HTTPConnection) -> Cliente:
+    """Identidad ya resuelta por ``requerir_cliente`` (o anónima)."""
+    return getattr(conexion.state, "cliente", ANONIMO)
@@ -1,28 +1,131 @@
+import asyncio
 import os
-import requests
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-APS_CLIENT_ID = os.getenv("APS_CLIENT_ID")
-APS_CLIENT_SECRET = os.getenv("APS_CLIENT_SECRET")
-APS_TOKEN_URL = os.getenv("APS_TOKEN_URL")
+APS_CLIENT_ID = os.getenv("APS_CLIENT_ID") or os.getenv("AUTODESK_CLIENT_ID")
+APS_CLIENT_SECRET = (
+    os.getenv("APS_CLIENT_SECRET")
+    or os.getenv("AUTODESK_CLIENT_SECRET")
+    or os.getenv("AUTODESK_CLIENT_SECRETT")  # nombre histórico con errata
+)
+APS_TOKEN_URL = os.getenv("APS_TOKEN_URL") or "https://developer.api.autodesk.com/authentication/v2/token"
 APS_SCOPES = os.getenv("APS_SCOPES")
 
-def get_aps_token():
+
+# ===============================
+# 🔑 Proveedor de tokens APS (caché + single-flight)
+# ===============================
+class ProveedorTokenAPS:
     """
-    Solicita un token de acceso de Autodesk Platform Services (APS).
+    Tokens 2-legged de Autodesk Platform Services cacheados por scope.
+
+    - Un token se reutiliza hasta ``margen`` segundos antes de ``expires_in``.
+    - En la última parte de su vida (``ventana_refresco``) se sigue devolviendo
+      el token vigente y se renueva en segundo plano.
+    - Si hay que pedir uno nuevo, las llamadas concurrentes del mismo scope
+      esperan a una sola petición al endpoint de tokens (single-flight).
+
+    La petición la hace ``solicitante(url, datos)`` (async); por defecto el
+    cliente Tandem compartido, con el mismo pool de conexiones, limitador de
+    tasa y reintentos que el resto de llamadas a Autodesk.
     """
-    data = {
-        "client_id": APS_CLIENT_ID,
-        "client_secret": APS_CLIENT_SECRET,
-        "grant_type": "client_credentials",
-        "scope": APS_SCOPES
-    }
 
-    response = requests.post(APS_TOKEN_URL, data=data)
+    def __init__(self, client_id: str, client_secret: str, token_url: str,
+                 margen: float = 60, ventana_refresco: float = 300, solicitante=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.margen = margen
+        self.ventana_refresco = ventana_refresco
+        self.solicitante = solicitante
+        self._cache = {}  # scope -> (datos, expira, refrescar_desde)
+        self._en_curso = {}  # scope -> tarea que está pidiendo su token
+
+    async def obtener(self, scope: str) -> dict:
+        """Respuesta de token (con ``expires_in`` restante) para ``scope``."""
+        entrada = self._vigente(scope)
+        if entrada is None:
+            entrada = await asyncio.shield(self._pedir(scope))
+        elif time.monotonic() >= entrada[2]:
+            self._pedir(scope)
+        return self._respuesta(entrada)
+
+    async def token(self, scope: str) -> str:
+        return (await self.obtener(scope))["access_token"]
+
+    def token_en_cache(self, scope: str):
+        """Token vigente sin esperar (o ``None`` si hay que pedir uno)."""
+        entrada = self._vigente(scope)
+        return entrada[0]["access_token"] if entrada is not None else None
+
+    def invalidar(self, scope: str = None):
+        """Descarta el token cacheado (p. ej. tras un 401)."""
+        if scope is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(scope, None)
+
+    def _vigente(self, scope: str):
+        entrada = self._cache.get(scope)
+        if entrada is not None and time.monotonic() < entrada[1]:
+            return entrada
+        return None
+
+    def _pedir(self, scope: str) -> asyncio.Task:
+        """Tarea que pide el token de ``scope``; la comparten todos los que lo esperan."""
+        loop = asyncio.get_running_loop()
+        tarea = self._en_curso.get(scope)
+        if tarea is None or tarea.done() or tarea.get_loop() is not loop:
+            tarea = loop.create_task(self._solicitar(scope))
+            self._en_curso[scope] = tarea
+            tarea.add_done_callback(lambda t: self._terminado(scope, t))
+        return tarea
 
-    if response.status_code != 200:
-        raise Exception(f"Error al obtener token de Autodesk: {response.text}")
+    def _terminado(self, scope: str, tarea: asyncio.Task):
+        if self._en_curso.get(scope) is tarea:
+            del self._en_curso[scope]
+        if not tarea.cancelled() and tarea.exception() is not None and self._vigente(scope) is not None:
+            # Renovación en segundo plano fallida: el token vigente sigue sirviendo
+            print(f"⚠️ No se pudo renovar el token APS en segundo plano: {tarea.exception()}")
 
-    return response.json()
+    async def _solicitar(self, scope: str):
+        if not self.client_id or not self.client_secret:
+            raise Exception("CLIENT_ID o CLIENT_SECRET de Autodesk no configurados en el entorno")
+
+        data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials",
+            "scope": scope,
+        }
+        solicitante = self.solicitante
+        if solicitante is None:
+            from app.tandem_client import cliente  # importa este módulo
+            solicitante = cliente.solicitar_token
+        datos = await solicitante(self.token_url, data)
+
+        ahora = time.monotonic()
+        vida = float(datos.get("expires_in", 3599))
+        expira = ahora + max(vida - self.margen, 0)
+        refrescar_desde = expira - min(self.ventana_refresco, vida / 2)
+        entrada = (datos, expira, refrescar_desde)
+        self._cache[scope] = entrada
+        return entrada
+
+    def _respuesta(self, entrada) -> dict:
+        datos, expira, _ = entrada
+        return {**datos, "expires_in": max(int(expira - time.monotonic()), 0)}
+
+
+# Instancia compartida por todas las llamadas a Autodesk
+proveedor_tokens = ProveedorTokenAPS(APS_CLIENT_ID, APS_CLIENT_SECRET, APS_TOKEN_URL)
+
+
+async def get_aps_token():
+    """
+    Solicita un token de acceso de Autodesk Platform Services (APS).
+    """
+    return await proveedor_tokens.obtener(APS_SCOPES)
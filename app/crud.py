@@ -1,5 +1,14 @@
+import hashlib
+import json
+import math
+import re
+import secrets
+import tempfile
+from sqlalchemy import DateTime, String, and_, or_, bindparam, case, func, insert, update, delete, select, literal, null
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import datetime
 from app import models, schemas
 
@@ -16,8 +25,7 @@ def obtener_o_crear_usuario(db: Session, usuario_data: schemas.UsuarioBase):
             fecha_registro=datetime.now()
         )
         db.add(usuario)
-        db.commit()
-        db.refresh(usuario)
+        db.flush()
     return usuario
 
 
@@ -34,12 +42,10 @@ def obtener_o_crear_proyecto(db: Session, nombre_proyecto: str, usuario_id: int,
             fecha_creacion=datetime.now()
         )
         db.add(proyecto)
-        db.commit()
-        db.refresh(proyecto)
+        db.flush()
     else:
         # Si ya existe, actualizamos horas
         proyecto.horas = horas
-        db.commit()
     return proyecto
 
 
@@ -69,15 +75,958 @@ def registrar_participacion_usuario(db: Session, proyecto_id: int, usuario_id: i
         participacion.horas += horas
         participacion.fecha_fin = datetime.now()
 
-    db.commit()
-    db.refresh(participacion)
+    db.flush()
     return participacion
 
 
+# ======================================================
+# 🔹 Escritura masiva por niveles
+# ======================================================
+def _insertar_lote(db: Session, modelo, filas: list):
+    """
+    Inserta todas las filas de un nivel con INSERT multi-fila y devuelve
+    los IDs generados en el mismo orden que ``filas``.
+    """
+    if not filas:
+        return []
+    stmt = insert(modelo).returning(modelo.id, sort_by_parameter_order=True)
+    return list(db.scalars(stmt, filas))
+
+
+# ======================================================
+# 🔹 Huellas de contenido por nodo y por subárbol
+# ======================================================
+_HIJOS_NIVEL = ("familias", "tipos_familia", "elementos")
+
+
+def _canonizar_parametros(parametros):
+    """
+    Normaliza el blob de parámetros: si es JSON se serializa con claves
+    ordenadas y sin espacios; si no, se usa el texto sin espacios extremos.
+    """
+    if parametros is None:
+        return ""
+    try:
+        return json.dumps(json.loads(parametros), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return parametros.strip()
+
+
+def _huella(*partes) -> str:
+    texto = "\x1f".join("" if p is None else str(p) for p in partes)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _calcular_huellas(nodo, huellas: dict, nivel: int = 0):
+    """
+    Calcula de hojas a raíz la huella de contenido (nombre, omniclass y
+    parámetros canónicos) y la huella de subárbol de ``nodo`` y sus
+    descendientes. Guarda ``(contenido, subarbol, tamano)`` en ``huellas``
+    indexado por ``id(nodo)``.
+    """
+    contenido = _huella(nodo.nombre, nodo.omniclass, _canonizar_parametros(getattr(nodo, "parametros", None)))
+    hijos = getattr(nodo, _HIJOS_NIVEL[nivel]) if nivel < len(_HIJOS_NIVEL) else []
+    subarboles, tamano = [], 1
+    for hijo in hijos:
+        _, subarbol_hijo, tamano_hijo = _calcular_huellas(hijo, huellas, nivel + 1)
+        subarboles.append(subarbol_hijo)
+        tamano += tamano_hijo
+    subarbol = _huella(contenido, getattr(nodo, "revit_id", None), *subarboles)
+    huellas[id(nodo)] = (contenido, subarbol, tamano)
+    return huellas[id(nodo)]
+
+
+# ======================================================
+# 🔹 Parámetros indexados (nombre/valor)
+# ======================================================
+_NIVELES_CON_PARAMETROS = (models.Familia, models.TipoFamilia, models.Elemento)
+_LONGITUD_PARAMETRO = 255
+
+
+def _a_numero(valor):
+    """``float`` finito a partir de un número o texto numérico, o None."""
+    if isinstance(valor, bool):
+        return float(valor)
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    elif isinstance(valor, str):
+        try:
+            numero = float(valor.strip())
+        except ValueError:
+            return None
+    else:
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def _valor_parametro(valor):
+    """Devuelve ``(valor_texto, valor_numero)`` para un valor del blob."""
+    if isinstance(valor, dict):
+        # {"valor": 300, "unidad": "mm"} y variantes en inglés
+        valor = next((valor[k] for k in ("valor", "value", "Value") if k in valor), None)
+    if valor is None:
+        return None, None
+    if isinstance(valor, bool):
+        texto = "true" if valor else "false"
+    elif isinstance(valor, str):
+        texto = valor.strip()
+    elif isinstance(valor, (int, float)):
+        texto = str(valor)
+    else:
+        texto = json.dumps(valor, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return texto[:_LONGITUD_PARAMETRO], _a_numero(valor)
+
+
+_SEPARADOR_PARES = re.compile(r"[;|\r\n]+")
+
+
+def _pares_texto(texto: str):
+    """``"FireRating=2h; Width=200"`` → ``[("FireRating", "2h"), ("Width", "200")]``."""
+    pares = []
+    for trozo in _SEPARADOR_PARES.split(texto):
+        nombre, igual, valor = trozo.partition("=")
+        if igual:
+            pares.append((nombre, valor))
+    return pares
+
+
+def _extraer_parametros(parametros):
+    """
+    Lista de ``(nombre, valor_texto, valor_numero)`` del blob de parámetros.
+    Acepta un objeto JSON ``{"nombre": valor}``, una lista de objetos con
+    ``nombre``/``name`` y ``valor``/``value`` o texto ``nombre=valor``
+    (varios pares separados por ``;``, ``|`` o saltos de línea); cualquier
+    otro contenido no se indexa (el blob se guarda igualmente).
+    """
+    if not parametros or not isinstance(parametros, str):
+        return []
+    try:
+        datos = json.loads(parametros)
+    except ValueError:
+        pares = _pares_texto(parametros)
+    else:
+        if isinstance(datos, dict):
+            pares = datos.items()
+        elif isinstance(datos, list):
+            pares = (
+                (next((p[k] for k in ("nombre", "name", "Name") if k in p), None), p)
+                for p in datos if isinstance(p, dict)
+            )
+        else:
+            return []
+
+    extraidos = []
+    for nombre, valor in pares:
+        if not isinstance(nombre, str) or not nombre.strip():
+            continue
+        extraidos.append((nombre.strip()[:_LONGITUD_PARAMETRO], *_valor_parametro(valor)))
+    return extraidos
+
+
+def _borrar_parametros(db: Session, modelo, ids):
+    """Borra los parámetros indexados de ``ids`` (lista o subconsulta)."""
+    Param = models.ParametroValor
+    db.execute(delete(Param).where(Param.entidad == modelo.__tablename__, Param.registro_id.in_(ids)))
+
+
+def _indexar_parametros(db: Session, modelo, proyecto_id: int, registros, reemplazar: bool = False):
+    """
+    Escribe los parámetros de ``registros`` (pares ``(id, blob)``) con
+    INSERT masivos. Con ``reemplazar`` se borran antes los que ya tuvieran.
+    """
+    registros = list(registros)
+    if reemplazar:
+        for lote in _en_lotes([registro_id for registro_id, _ in registros]):
+            _borrar_parametros(db, modelo, lote)
+
+    entidad = modelo.__tablename__
+    filas = [
+        {"entidad": entidad, "registro_id": registro_id, "proyecto_id": proyecto_id,
+         "nombre": nombre, "valor_texto": texto, "valor_numero": numero}
+        for registro_id, blob in registros
+        for nombre, texto, numero in _extraer_parametros(blob)
+    ]
+    # INSERT de Core (sin la capa ORM de bulk): la tabla puede tener millones de filas
+    for lote in _en_lotes(filas, 5000):
+        db.execute(insert(models.ParametroValor.__table__), lote)
+    return len(filas)
+
+
+def reconstruir_parametros(db: Session, proyecto_id: int = None, tamano_lote: int = 5000):
+    """
+    Regenera el índice de parámetros a partir de los blobs almacenados
+    (todos los proyectos o uno), leyendo por lotes de ``tamano_lote`` filas.
+    Sirve para poblarlo tras la migración o repararlo; confirma al final.
+    """
+    Param = models.ParametroValor
+    total = 0
+    for modelo in _NIVELES_CON_PARAMETROS:
+        borrar = delete(Param).where(Param.entidad == modelo.__tablename__)
+        if proyecto_id is not None:
+            borrar = borrar.where(Param.proyecto_id == proyecto_id)
+        db.execute(borrar)
+
+        ultimo = 0
+        while True:
+            consulta = _con_categoria(
+                select(modelo.id, modelo.parametros, models.Categoria.proyecto_id), modelo
+            ).where(modelo.id > ultimo)
+            if proyecto_id is not None:
+                consulta = consulta.where(models.Categoria.proyecto_id == proyecto_id)
+            filas = db.execute(consulta.order_by(modelo.id).limit(tamano_lote)).all()
+            if not filas:
+                break
+            por_proyecto = {}
+            for fila in filas:
+                por_proyecto.setdefault(fila.proyecto_id, []).append((fila.id, fila.parametros))
+            for proyecto, registros in por_proyecto.items():
+                total += _indexar_parametros(db, modelo, proyecto, registros)
+            ultimo = filas[-1].id
+    db.commit()
+    return total
+
+
+# ======================================================
+# 🔹 Árbol OmniClass por proyecto (ruta materializada)
+# ======================================================
+_SEPARADORES_OMNICLASS = re.compile(r"[\s.\-]+")
+
+
+def _segmentos_omniclass(codigo) -> list:
+    """
+    Segmentos numéricos de un código OmniClass (``"23-13 11 00"``,
+    ``"23.13.11.00"``...), sin los grupos ``00`` finales y sin el texto
+    descriptivo que pueda seguir al código.
+    """
+    segmentos = []
+    for segmento in _SEPARADORES_OMNICLASS.split((codigo or "").strip()):
+        # Cota para que la ruta quepa en omniclass_conteos.codigo
+        if not segmento.isdigit() or len(segmento) > 10 or len(segmentos) == 8:
+            break
+        segmentos.append(segmento)
+    while len(segmentos) > 1 and not segmentos[-1].strip("0"):
+        segmentos.pop()
+    return segmentos
+
+
+def normalizar_omniclass(codigo):
+    """Código OmniClass normalizado (``23-13-11``) o None si no es válido."""
+    segmentos = _segmentos_omniclass(codigo)
+    return "-".join(segmentos) if segmentos else None
+
+
+def filtro_omniclass(columna, prefijo: str):
+    """
+    Condición "``columna`` (código normalizado) es ``prefijo`` o cuelga de
+    él". El prefijo se normaliza igual que los códigos guardados, así que
+    ``23.13`` y ``23-13 00`` encuentran lo mismo que ``23-13``.
+    """
+    codigo = normalizar_omniclass(prefijo)
+    if codigo is None:
+        raise ValueError(f"Código OmniClass no válido: {prefijo!r}")
+    return or_(columna == codigo, columna.startswith(codigo + "-", autoescape=True))
+
+
+_CONTADORES_OMNICLASS = ("categorias", "familias", "tipos_familia", "elementos")
+
+
+def _anotar_omniclass(deltas: dict, modelo, codigo, cantidad: int = 1):
+    """Suma ``cantidad`` filas de ``modelo`` con el código normalizado ``codigo`` a ``deltas``."""
+    if codigo and cantidad:
+        clave = (codigo, modelo.__tablename__)
+        deltas[clave] = deltas.get(clave, 0) + cantidad
+
+
+def _anotar_filas_omniclass(db: Session, deltas: dict, modelo, condicion, signo: int = 1):
+    """Anota en ``deltas`` (con ``signo``) las filas de ``modelo`` que cumplen ``condicion``."""
+    consulta = select(modelo.omniclass_codigo, func.count()).where(condicion, modelo.omniclass_codigo.is_not(None))
+    for codigo, cantidad in db.execute(consulta.group_by(modelo.omniclass_codigo)):
+        _anotar_omniclass(deltas, modelo, codigo, signo * cantidad)
+
+
+def _aplicar_omniclass(db: Session, proyecto_id: int, deltas: dict):
+    """
+    Aplica a ``omniclass_conteos`` los cambios anotados en ``deltas``
+    (``(código, tabla) → ±filas``) en cada prefijo de la ruta de cada código:
+    un UPDATE por lotes para los nodos que ya existen, un INSERT para los
+    nuevos y un DELETE para los que se quedan a cero. Se llama dentro de la
+    transacción que cambió la jerarquía.
+    """
+    Conteo = models.ConteoOmniclass.__table__
+    nodos = {}
+    for (codigo, tabla), cantidad in deltas.items():
+        segmentos = codigo.split("-")
+        for nivel in range(1, len(segmentos) + 1):
+            ruta = "-".join(segmentos[:nivel])
+            nodo = nodos.get(ruta)
+            if nodo is None:
+                nodo = nodos[ruta] = {
+                    "proyecto_id": proyecto_id, "codigo": ruta, "nivel": nivel,
+                    "padre": "-".join(segmentos[:nivel - 1]) or None,
+                    **dict.fromkeys(_CONTADORES_OMNICLASS, 0),
+                }
+            nodo[tabla] += cantidad
+    nodos = {ruta: nodo for ruta, nodo in nodos.items() if any(nodo[c] for c in _CONTADORES_OMNICLASS)}
+    if not nodos:
+        return
+
+    existentes = set()
+    for lote in _en_lotes(list(nodos)):
+        existentes.update(db.scalars(
+            select(Conteo.c.codigo).where(Conteo.c.proyecto_id == proyecto_id, Conteo.c.codigo.in_(lote))
+        ))
+    if existentes:
+        db.execute(
+            update(Conteo)
+            .where(Conteo.c.proyecto_id == proyecto_id, Conteo.c.codigo == bindparam("b_codigo"))
+            .values({c: Conteo.c[c] + bindparam(f"b_{c}") for c in _CONTADORES_OMNICLASS}),
+            [{"b_codigo": ruta, **{f"b_{c}": nodos[ruta][c] for c in _CONTADORES_OMNICLASS}} for ruta in existentes],
+        )
+        for lote in _en_lotes(sorted(existentes)):
+            db.execute(delete(Conteo).where(
+                Conteo.c.proyecto_id == proyecto_id, Conteo.c.codigo.in_(lote),
+                *(Conteo.c[c] <= 0 for c in _CONTADORES_OMNICLASS),
+            ))
+    nuevos = [nodo for ruta, nodo in nodos.items() if ruta not in existentes]
+    for lote in _en_lotes(nuevos):
+        db.execute(insert(Conteo), lote)
+
+
+def _recalcular_omniclass(db: Session, proyecto_ids):
+    """
+    Reescribe desde cero el árbol OmniClass de los proyectos: vuelve a
+    normalizar ``omniclass_codigo`` (un UPDATE por código distinto) y cuenta
+    con un GROUP BY por nivel de la jerarquía. Solo para reparar o rellenar
+    los conteos: los cambios normales aplican sus diferencias con
+    ``_aplicar_omniclass``.
+    """
+    Conteo, Cat = models.ConteoOmniclass, models.Categoria
+    for proyecto_id in set(proyecto_ids):
+        db.execute(delete(Conteo).where(Conteo.proyecto_id == proyecto_id))
+        deltas = {}
+        for modelo in _PADRE_NIVEL:
+            ids = _con_categoria(select(modelo.id), modelo).where(Cat.proyecto_id == proyecto_id)
+            codigos = db.scalars(select(modelo.omniclass).where(modelo.id.in_(ids)).distinct()).all()
+            for codigo in codigos:
+                db.execute(
+                    update(modelo)
+                    .where(modelo.id.in_(ids), modelo.omniclass == codigo if codigo is not None
+                           else modelo.omniclass.is_(None))
+                    .values(omniclass_codigo=normalizar_omniclass(codigo))
+                    .execution_options(synchronize_session=False)
+                )
+            _anotar_filas_omniclass(db, deltas, modelo, modelo.id.in_(ids))
+        _aplicar_omniclass(db, proyecto_id, deltas)
+
+
+def reconstruir_omniclass(db: Session, proyecto_id: int = None):
+    """Recalcula el árbol OmniClass de un proyecto (o de todos) y confirma."""
+    proyecto_ids = [proyecto_id] if proyecto_id is not None else db.scalars(select(models.Proyecto.id)).all()
+    _recalcular_omniclass(db, proyecto_ids)
+    db.commit()
+    return len(proyecto_ids)
+
+
+def arbol_omniclass(db: Session, proyecto_id: int, prefijo: str = None):
+    """
+    Árbol OmniClass de un proyecto con sus contadores, leído con una sola
+    consulta sobre ``omniclass_conteos``. Con ``prefijo`` se devuelve solo
+    ese subárbol.
+    """
+    Conteo = models.ConteoOmniclass
+    consulta = select(
+        Conteo.codigo, Conteo.padre, Conteo.nivel,
+        Conteo.categorias, Conteo.familias, Conteo.tipos_familia, Conteo.elementos,
+    ).where(Conteo.proyecto_id == proyecto_id)
+    if prefijo:
+        consulta = consulta.where(filtro_omniclass(Conteo.codigo, prefijo))
+
+    # Por nivel: cada padre ya está construido cuando llegan sus hijos
+    nodos, raices = {}, []
+    for codigo, padre_codigo, nivel, categorias, familias, tipos, elementos in db.execute(
+        consulta.order_by(Conteo.nivel, Conteo.codigo)
+    ):
+        nodo = nodos[codigo] = {
+            "codigo": codigo, "nivel": nivel, "categorias": categorias, "familias": familias,
+            "tipos_familia": tipos, "elementos": elementos, "hijos": [],
+        }
+        padre = nodos.get(padre_codigo)
+        (padre["hijos"] if padre is not None else raices).append(nodo)
+    return raices
+
+
+# ======================================================
+# 🔹 Tablas de resumen (conteos, horas, última modificación)
+# ======================================================
+def _consulta_resumen_familias(condicion):
+    """Tipos, elementos y última modificación de las familias que cumplen ``condicion``."""
+    Cat, Fam, Tipo, Elem = models.Categoria, models.Familia, models.TipoFamilia, models.Elemento
+    return (
+        select(Fam.id, Cat.proyecto_id, Fam.categoria_id,
+               func.count(func.distinct(Tipo.id)), func.count(Elem.id), func.max(Elem.fecha_modificacion))
+        .join(Cat, Fam.categoria_id == Cat.id)
+        .outerjoin(Tipo, Tipo.familia_id == Fam.id)
+        .outerjoin(Elem, Elem.tipo_familia_id == Tipo.id)
+        .where(condicion)
+        .group_by(Fam.id, Cat.proyecto_id, Fam.categoria_id)
+    )
+
+
+def _consulta_resumen_proyectos(condicion):
+    """
+    Totales de los proyectos que cumplen ``condicion``, sumando las filas de
+    ``resumen_familias`` (no se recorren los elementos).
+    """
+    Proy, Cat, PU = models.Proyecto, models.Categoria, models.ProyectoUsuario
+    RF = models.ResumenFamilia
+
+    def escalar(expresion, donde):
+        return select(expresion).where(donde).scalar_subquery()
+
+    return select(
+        Proy.id,
+        escalar(func.count(Cat.id), Cat.proyecto_id == Proy.id),
+        escalar(func.count(RF.familia_id), RF.proyecto_id == Proy.id),
+        escalar(func.coalesce(func.sum(RF.tipos_familia), 0), RF.proyecto_id == Proy.id),
+        escalar(func.coalesce(func.sum(RF.elementos), 0), RF.proyecto_id == Proy.id),
+        escalar(func.count(PU.id), PU.proyecto_id == Proy.id),
+        escalar(func.coalesce(func.sum(PU.horas), 0.0), PU.proyecto_id == Proy.id),
+        escalar(func.max(RF.ultima_modificacion), RF.proyecto_id == Proy.id),
+    ).where(condicion)
+
+
+def _consulta_resumen_usuarios(condicion):
+    """Proyectos, horas y última actividad de los usuarios que cumplen ``condicion``."""
+    PU = models.ProyectoUsuario
+    return (
+        select(PU.usuario_id, func.count(PU.id), func.coalesce(func.sum(PU.horas), 0.0), func.max(PU.fecha_fin))
+        .where(condicion)
+        .group_by(PU.usuario_id)
+    )
+
+
+_COLUMNAS_RESUMEN = {
+    models.ResumenFamilia: ["familia_id", "proyecto_id", "categoria_id", "tipos_familia", "elementos",
+                            "ultima_modificacion"],
+    models.ResumenProyecto: ["proyecto_id", "categorias", "familias", "tipos_familia", "elementos", "usuarios",
+                             "horas", "ultima_modificacion"],
+    models.ResumenUsuario: ["usuario_id", "proyectos", "horas", "ultima_actividad"],
+}
+
+
+def _refrescar_resumen(db: Session, proyecto_ids=(), familia_ids=None, usuario_ids=()):
+    """
+    Actualiza las tablas de resumen dentro de la transacción en curso.
+
+    Solo se recalculan las filas de ``familia_ids`` (leyendo únicamente sus
+    tipos y elementos; las que ya no existen desaparecen), o todas las de
+    ``proyecto_ids`` si es None. Después se rehacen las filas de los
+    proyectos a partir de sus familias y las de ``usuario_ids`` a partir de
+    ``proyecto_usuarios``. Cada paso es un DELETE más un INSERT ... SELECT.
+    """
+    RF, RP, RU = models.ResumenFamilia, models.ResumenProyecto, models.ResumenUsuario
+    proyecto_ids, usuario_ids = sorted(set(proyecto_ids)), sorted(set(usuario_ids))
+
+    if familia_ids is None:
+        lotes = [(RF.proyecto_id.in_(lote), models.Categoria.proyecto_id.in_(lote))
+                 for lote in _en_lotes(proyecto_ids)]
+    else:
+        lotes = [(RF.familia_id.in_(lote), models.Familia.id.in_(lote))
+                 for lote in _en_lotes(sorted(set(familia_ids)))]
+    for borrar, recalcular in lotes:
+        db.execute(delete(RF).where(borrar))
+        db.execute(insert(RF).from_select(_COLUMNAS_RESUMEN[RF], _consulta_resumen_familias(recalcular)))
+
+    for lote in _en_lotes(proyecto_ids):
+        db.execute(delete(RP).where(RP.proyecto_id.in_(lote)))
+        db.execute(insert(RP).from_select(
+            _COLUMNAS_RESUMEN[RP], _consulta_resumen_proyectos(models.Proyecto.id.in_(lote))
+        ))
+
+    for lote in _en_lotes(usuario_ids):
+        db.execute(delete(RU).where(RU.usuario_id.in_(lote)))
+        db.execute(insert(RU).from_select(
+            _COLUMNAS_RESUMEN[RU], _consulta_resumen_usuarios(models.ProyectoUsuario.usuario_id.in_(lote))
+        ))
+
+
+def reconstruir_resumen(db: Session, proyecto_id: int = None):
+    """
+    Recalcula desde cero las tablas de resumen de un proyecto (y de sus
+    usuarios) o de todo, y confirma.
+    """
+    PU = models.ProyectoUsuario
+    if proyecto_id is None:
+        proyecto_ids = db.scalars(select(models.Proyecto.id)).all()
+        usuario_ids = db.scalars(select(PU.usuario_id).distinct()).all()
+        for modelo in _COLUMNAS_RESUMEN:
+            db.execute(delete(modelo))
+    else:
+        proyecto_ids = [proyecto_id]
+        usuario_ids = db.scalars(select(PU.usuario_id).where(PU.proyecto_id == proyecto_id).distinct()).all()
+    _refrescar_resumen(db, proyecto_ids, None, usuario_ids)
+    db.commit()
+    return {"proyectos": len(proyecto_ids), "usuarios": len(usuario_ids)}
+
+
+# ======================================================
+# 🔹 Reconciliación por niveles (revit_id / clave natural)
+# ======================================================
+# Campos que se comparan contra lo almacenado; los parámetros se comparan a
+# través de hash_contenido para no tener que cargar los blobs.
+_CAMPOS_NIVEL = {
+    models.Categoria: ("nombre", "omniclass", "hash_contenido", "hash_subarbol"),
+    models.Familia: ("nombre", "omniclass", "revit_id", "hash_contenido", "hash_subarbol"),
+    models.TipoFamilia: ("nombre", "omniclass", "revit_id", "hash_contenido", "hash_subarbol"),
+    models.Elemento: ("nombre", "omniclass", "revit_id", "hash_contenido"),
+}
+
+_PADRE_NIVEL = {
+    models.Categoria: "proyecto_id",
+    models.Familia: "categoria_id",
+    models.TipoFamilia: "familia_id",
+    models.Elemento: "tipo_familia_id",
+}
+
+
+def _en_lotes(valores: list, tamano: int = 1000):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _filas_existentes(db: Session, proyecto_id: int, modelo):
+    """
+    Carga (solo columnas, sin hidratar ORM ni blobs de parámetros) las filas
+    actuales de un nivel de la jerarquía del proyecto.
+    """
+    padre = getattr(modelo, _PADRE_NIVEL[modelo])
+    consulta = select(
+        modelo.id, padre.label("padre"), *[getattr(modelo, c) for c in _CAMPOS_NIVEL[modelo]]
+    )
+    consulta = _con_categoria(consulta, modelo).where(models.Categoria.proyecto_id == proyecto_id)
+    return db.execute(consulta.order_by(modelo.id)).all()
+
+
+def _con_categoria(consulta, modelo):
+    """Añade los JOIN necesarios para llegar de ``modelo`` a su categoría."""
+    Cat, Fam, Tipo = models.Categoria, models.Familia, models.TipoFamilia
+    if modelo is models.Elemento:
+        consulta = consulta.join(Tipo, modelo.tipo_familia_id == Tipo.id)
+    if modelo in (models.Elemento, Tipo):
+        consulta = consulta.join(Fam, Tipo.familia_id == Fam.id)
+    if modelo in (models.Elemento, Tipo, Fam):
+        consulta = consulta.join(Cat, Fam.categoria_id == Cat.id)
+    return consulta
+
+
+# ======================================================
+# 🔹 Secuencia de cambios y lápidas de borrado
+# ======================================================
+def siguiente_version(db: Session) -> int:
+    """
+    Reserva el siguiente número de la secuencia de cambios. El UPDATE
+    bloquea la fila del contador hasta el commit, así que solo debe llamarse
+    justo antes de confirmar (ver ``confirmar_version``): las versiones se
+    confirman en orden creciente sin que una transacción larga bloquee a los
+    demás escritores ni a quien lee ``version_actual``.
+    """
+    Contador = models.ContadorCambios
+    resultado = db.execute(
+        update(Contador).where(Contador.id == 1).values(valor=Contador.valor + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        raise RuntimeError("Falta la fila 1 de contador_cambios; aplica las migraciones (alembic upgrade head)")
+    return db.scalar(select(Contador.valor).where(Contador.id == 1))
+
+
+# Tablas cuyas filas llevan la versión del último cambio
+_MODELOS_VERSIONADOS = (
+    models.Proyecto, models.Categoria, models.Familia, models.TipoFamilia, models.Elemento, models.Eliminacion,
+)
+
+
+def version_provisional() -> int:
+    """
+    Marca negativa, única por transacción, con la que se escriben las filas
+    hasta que ``confirmar_version`` les asigna la versión definitiva.
+    """
+    return -1 - secrets.randbits(62)
+
+
+def confirmar_version(db: Session, provisional: int) -> int:
+    """
+    Reserva la versión de la transacción y la estampa en las filas escritas
+    con ``provisional``. Es lo último antes del commit, de modo que el
+    bloqueo del contador dura lo que tardan estos UPDATE y no toda la
+    sincronización.
+    """
+    db.flush()
+    version = siguiente_version(db)
+    for modelo in _MODELOS_VERSIONADOS:
+        db.execute(
+            update(modelo).where(modelo.version == provisional).values(version=version)
+            .execution_options(synchronize_session=False)
+        )
+    return version
+
+
+def version_actual(db: Session) -> int:
+    """Última versión confirmada de la secuencia de cambios."""
+    Contador = models.ContadorCambios
+    return db.scalar(select(Contador.valor).where(Contador.id == 1)) or 0
+
+
+class VersionPurgada(Exception):
+    """El ``desde`` pedido es anterior a las lápidas conservadas: hace falta una descarga completa."""
+
+    def __init__(self, desde: int, minimo: int):
+        super().__init__(
+            f"La versión {desde} es anterior a la mínima conservada ({minimo}); vuelve a descargar el proyecto"
+        )
+        self.desde = desde
+        self.minimo = minimo
+
+
+def version_minima(db: Session) -> int:
+    """Menor ``desde`` para el que aún se conservan todas las lápidas posteriores."""
+    Contador = models.ContadorCambios
+    return db.scalar(select(Contador.minimo).where(Contador.id == 1)) or 0
+
+
+def purgar_lapidas(db: Session, antes_de: datetime, tamano_lote: int = 5000) -> dict:
+    """
+    Borra las lápidas anteriores a ``antes_de`` (UTC) por lotes, cada uno en
+    su transacción.
+
+    Antes se sube y se confirma ``contador_cambios.minimo`` hasta la versión
+    más alta que se va a purgar: desde ese momento ``exportar_cambios``
+    rechaza cualquier ``desde`` inferior con ``VersionPurgada`` en lugar de
+    devolver un delta al que le faltan borrados.
+    """
+    Contador, Elim = models.ContadorCambios, models.Eliminacion
+    horizonte = db.scalar(select(func.max(Elim.version)).where(Elim.fecha < antes_de))
+    if horizonte is None:
+        return {"purgadas": 0, "minimo": version_minima(db)}
+
+    db.execute(
+        update(Contador).where(Contador.id == 1, Contador.minimo < horizonte).values(minimo=horizonte)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    purgadas = 0
+    while True:
+        ids = db.scalars(select(Elim.id).where(Elim.version <= horizonte).limit(tamano_lote)).all()
+        if not ids:
+            break
+        db.execute(delete(Elim).where(Elim.id.in_(ids)))
+        db.commit()
+        purgadas += len(ids)
+    return {"purgadas": purgadas, "minimo": version_minima(db)}
+
+
+def _registrar_eliminaciones(db: Session, modelo, condicion, version: int):
+    """Inserta (INSERT ... SELECT) una lápida por cada fila que cumple ``condicion``."""
+    revit_id = modelo.revit_id if hasattr(modelo, "revit_id") else null()
+    consulta = _con_categoria(
+        select(literal(modelo.__tablename__), modelo.id, revit_id, models.Categoria.proyecto_id, literal(version)),
+        modelo,
+    ).where(condicion)
+    db.execute(insert(models.Eliminacion).from_select(
+        ["entidad", "registro_id", "revit_id", "proyecto_id", "version"], consulta
+    ))
+
+
+def _invalidar_subarboles(db: Session, modelo, condicion, incluir_propios: bool = False):
+    """
+    Anula ``hash_subarbol`` en los ancestros de las filas de ``modelo`` que
+    cumplen ``condicion`` (y en ellas mismas con ``incluir_propios``), con un
+    UPDATE por nivel. Debe ejecutarse antes de borrar esas filas: cualquier
+    cambio fuera de una sincronización deja de coincidir con la huella
+    almacenada, y la siguiente reconciliación tiene que volver a bajar por
+    esa rama en lugar de podarla.
+    """
+    niveles = list(_PADRE_NIVEL)
+    ids = select(modelo.id).where(condicion)
+    if incluir_propios and "hash_subarbol" in _CAMPOS_NIVEL[modelo]:
+        db.execute(
+            update(modelo).where(modelo.id.in_(ids)).values(hash_subarbol=None)
+            .execution_options(synchronize_session=False)
+        )
+    hijo = modelo
+    for padre in reversed(niveles[:niveles.index(modelo)]):
+        if "hash_subarbol" not in _CAMPOS_NIVEL[padre]:
+            break
+        ids = select(getattr(hijo, _PADRE_NIVEL[hijo])).where(hijo.id.in_(ids))
+        db.execute(
+            update(padre).where(padre.id.in_(ids)).values(hash_subarbol=None)
+            .execution_options(synchronize_session=False)
+        )
+        hijo = padre
+
+
+def _eliminar_con_descendientes(db: Session, modelo, condicion, version: int, omniclass: dict = None):
+    """
+    Borra las filas de ``modelo`` que cumplen ``condicion`` y todos sus
+    descendientes con un DELETE por nivel (de hojas a raíz), dejando lápidas.
+    Los ancestros pierden su ``hash_subarbol`` (ver ``_invalidar_subarboles``).
+    Con ``omniclass`` se descuentan ahí las filas borradas por código.
+    """
+    _invalidar_subarboles(db, modelo, condicion)
+    niveles = list(_PADRE_NIVEL)
+    condiciones = [(modelo, condicion)]
+    ids = select(modelo.id).where(condicion)
+    for hijo in niveles[niveles.index(modelo) + 1:]:
+        condicion_hijo = getattr(hijo, _PADRE_NIVEL[hijo]).in_(ids)
+        condiciones.append((hijo, condicion_hijo))
+        ids = select(hijo.id).where(condicion_hijo)
+
+    for nivel, condicion_nivel in reversed(condiciones):
+        _registrar_eliminaciones(db, nivel, condicion_nivel, version)
+        if omniclass is not None:
+            _anotar_filas_omniclass(db, omniclass, nivel, condicion_nivel, signo=-1)
+        if nivel in _NIVELES_CON_PARAMETROS:
+            _borrar_parametros(db, nivel, select(nivel.id).where(condicion_nivel))
+        db.execute(delete(nivel).where(condicion_nivel))
+
+
+def _eliminar_jerarquia_proyecto(db: Session, proyecto_id: int, version: int):
+    """
+    Borra la jerarquía de un proyecto con un DELETE por nivel (de hojas a
+    raíz) y su árbol OmniClass, que se vuelve a anotar con lo que se inserte.
+    """
+    _eliminar_con_descendientes(db, models.Categoria, models.Categoria.proyecto_id == proyecto_id, version)
+    db.execute(delete(models.ConteoOmniclass).where(models.ConteoOmniclass.proyecto_id == proyecto_id))
+
+
+def _reconciliar_nivel(db: Session, modelo, entrantes: list, existentes: list, extras: dict,
+                       proyecto_id: int = None, omniclass: dict = None):
+    """
+    Reconcilia un nivel de la jerarquía contra las filas existentes.
+
+    ``entrantes`` es una lista de ``(padre_id, campos)``. Cada nodo se empareja
+    primero por ``revit_id`` (en todo el proyecto, por lo que un nodo puede
+    cambiar de padre) y, si no lo tiene, por la clave natural
+    ``(padre, nombre, ocurrencia)``. Solo se insertan los nodos nuevos y solo se
+    actualizan los que cambiaron; si la huella de subárbol coincide, el nodo y
+    todos sus descendientes se dan por sincronizados. Un nodo cuya única
+    diferencia es la huella de subárbol no cuenta como actualizado: se guarda
+    la huella nueva sin tocar su versión.
+
+    Los parámetros indexados se escriben para los nodos nuevos y se
+    reemplazan solo en los que cambió la huella de contenido. Los códigos
+    OmniClass que entran, cambian o salen se anotan en ``omniclass``.
+
+    Devuelve los IDs alineados con ``entrantes``, los IDs cuyo subárbol se
+    omitió, los IDs existentes que ya no aparecen y los contadores del nivel.
+    """
+    campos = _CAMPOS_NIVEL[modelo]
+    columna_padre = _PADRE_NIVEL[modelo]
+    usa_revit_id = "revit_id" in campos
+
+    por_revit_id = {}
+    por_clave = {}
+    for fila in existentes:
+        if usa_revit_id and fila.revit_id is not None:
+            por_revit_id.setdefault(fila.revit_id, fila)
+        por_clave.setdefault((fila.padre, fila.nombre), []).append(fila)
+    for cola in por_clave.values():
+        cola.reverse()
+
+    # 1ª pasada: revit_id; 2ª pasada: clave natural para el resto
+    emparejados = [None] * len(entrantes)
+    usados = set()
+    if usa_revit_id:
+        for i, (_, nodo) in enumerate(entrantes):
+            actual = por_revit_id.get(nodo.get("revit_id"))
+            if actual is not None and actual.id not in usados:
+                emparejados[i] = actual
+                usados.add(actual.id)
+
+    for i, (padre, nodo) in enumerate(entrantes):
+        if emparejados[i] is not None:
+            continue
+        cola = por_clave.get((padre, nodo["nombre"]), [])
+        while cola:
+            actual = cola.pop()
+            if actual.id in usados:
+                continue
+            if usa_revit_id and None not in (actual.revit_id, nodo.get("revit_id")):
+                # Ambos tienen revit_id y no coinciden: no es el mismo nodo
+                continue
+            emparejados[i] = actual
+            usados.add(actual.id)
+            break
+
+    ids = [None] * len(entrantes)
+    podados = set()
+    nuevas, posiciones, cambios, huellas, reindexar = [], [], [], [], []
+    sin_cambios = 0
+    for i, ((padre, nodo), actual) in enumerate(zip(entrantes, emparejados)):
+        if actual is None:
+            posiciones.append(i)
+            nuevas.append({**nodo, columna_padre: padre, **extras})
+            continue
+
+        ids[i] = actual.id
+        if (
+            actual.padre == padre
+            and "hash_subarbol" in nodo
+            and actual.hash_subarbol == nodo["hash_subarbol"]
+        ):
+            podados.add(actual.id)
+            continue
+        if usa_revit_id and nodo.get("revit_id") is None:
+            # Conservar el revit_id escrito por /sync/revit/ids
+            nodo = {**nodo, "revit_id": actual.revit_id}
+        # La huella de subárbol no decide el cambio: si solo difiere ella, el
+        # cambio está en un descendiente y el nodo conserva su versión
+        if actual.padre != padre or any(
+            getattr(actual, c) != nodo.get(c) for c in campos if c != "hash_subarbol"
+        ):
+            cambios.append({"id": actual.id, **nodo, columna_padre: padre, **extras})
+            anterior = normalizar_omniclass(actual.omniclass)
+            if omniclass is not None and anterior != nodo["omniclass_codigo"]:
+                _anotar_omniclass(omniclass, modelo, anterior, -1)
+                _anotar_omniclass(omniclass, modelo, nodo["omniclass_codigo"])
+            if actual.hash_contenido != nodo["hash_contenido"]:
+                reindexar.append((actual.id, nodo.get("parametros")))
+        else:
+            sin_cambios += 1
+            if "hash_subarbol" in campos and actual.hash_subarbol != nodo.get("hash_subarbol"):
+                huellas.append({"id": actual.id, "hash_subarbol": nodo.get("hash_subarbol")})
+
+    for i, nuevo_id in zip(posiciones, _insertar_lote(db, modelo, nuevas)):
+        ids[i] = nuevo_id
+
+    if cambios:
+        db.execute(update(modelo), cambios)
+    if huellas:
+        db.execute(update(modelo), huellas)
+
+    if modelo in _NIVELES_CON_PARAMETROS:
+        _indexar_parametros(db, modelo, proyecto_id, reindexar, reemplazar=True)
+        _indexar_parametros(
+            db, modelo, proyecto_id, ((ids[i], fila["parametros"]) for i, fila in zip(posiciones, nuevas))
+        )
+
+    eliminados = [fila for fila in existentes if fila.id not in usados]
+    if omniclass is not None:
+        for fila in nuevas:
+            _anotar_omniclass(omniclass, modelo, fila["omniclass_codigo"])
+        for fila in eliminados:
+            _anotar_omniclass(omniclass, modelo, normalizar_omniclass(fila.omniclass), -1)
+    eliminados = [fila.id for fila in eliminados]
+    contadores = {
+        "insertados": len(nuevas),
+        "actualizados": len(cambios),
+        "eliminados": len(eliminados),
+        "omitidos": sin_cambios + len(podados),
+    }
+    return ids, podados, eliminados, contadores
+
+
+def _sincronizar_jerarquia(db: Session, proyecto_id: int, usuario_nombre: str, categorias: list, reconciliar: bool,
+                           version: int, progreso=None):
+    """
+    Escribe la jerarquía nivel a nivel (categorias → familias → tipos_familia
+    → elementos) con inserciones y actualizaciones masivas, y después borra
+    de hojas a raíz los nodos que desaparecieron. Los subárboles cuya huella
+    coincide con la almacenada no se vuelven a leer ni a escribir.
+
+    Si se indica, ``progreso(nivel, contadores)`` se llama al terminar cada nivel.
+    ``resumen["familias_tocadas"]`` reúne las familias cuyo subárbol se
+    visitó o se borró: fuera de ellas no cambió ningún conteo.
+    ``resumen["omniclass"]`` lleva las diferencias para ``_aplicar_omniclass``.
+    """
+    ahora = datetime.now()
+    huellas = {}
+    for categoria in categorias:
+        _calcular_huellas(categoria, huellas)
+
+    niveles = (
+        (models.Categoria, ("nombre", "omniclass"), {"usuario": usuario_nombre, "version": version}),
+        (models.Familia, ("nombre", "omniclass", "parametros", "revit_id"), {"version": version}),
+        (models.TipoFamilia, ("nombre", "omniclass", "parametros", "revit_id"), {"version": version}),
+        (models.Elemento, ("nombre", "omniclass", "parametros", "revit_id"),
+         {"usuario": usuario_nombre, "fecha_modificacion": ahora, "version": version}),
+    )
+
+    resumen = {"nodos_omitidos": 0, "familias_tocadas": set(), "omniclass": {}}
+    por_eliminar = []
+    nodos = [(proyecto_id, c) for c in categorias]
+    podados = set()
+    pendientes = True
+    for nivel, (modelo, atributos, extras) in enumerate(niveles):
+        entrantes = []
+        for padre, data in nodos:
+            contenido, subarbol, _ = huellas[id(data)]
+            campos = {a: getattr(data, a) for a in atributos}
+            campos["omniclass_codigo"] = normalizar_omniclass(campos["omniclass"])
+            campos["hash_contenido"] = contenido
+            if "hash_subarbol" in _CAMPOS_NIVEL[modelo]:
+                campos["hash_subarbol"] = subarbol
+            entrantes.append((padre, campos))
+
+        # Las filas bajo un subárbol omitido se conservan tal cual; si en el
+        # nivel anterior no quedó nada por comparar, ni siquiera se consultan
+        existentes, heredados = [], set()
+        if reconciliar and pendientes:
+            for fila in _filas_existentes(db, proyecto_id, modelo):
+                if fila.padre in podados:
+                    heredados.add(fila.id)
+                else:
+                    existentes.append(fila)
+        ids, podados_nivel, eliminados, resumen[modelo.__tablename__] = _reconciliar_nivel(
+            db, modelo, entrantes, existentes, extras, proyecto_id, resumen["omniclass"]
+        )
+        pendientes = len(existentes) > len(podados_nivel)
+        por_eliminar.append((modelo, eliminados))
+        if modelo is models.Familia:
+            resumen["familias_tocadas"].update(i for i in ids if i not in podados_nivel)
+            resumen["familias_tocadas"].update(eliminados)
+        if progreso:
+            progreso(modelo.__tablename__, resumen[modelo.__tablename__])
+
+        # Los descendientes de un subárbol omitido no se visitan
+        resumen["nodos_omitidos"] += sum(
+            huellas[id(data)][2] - 1 for (_, data), nodo_id in zip(nodos, ids) if nodo_id in podados_nivel
+        )
+        resumen["nodos_omitidos"] += resumen[modelo.__tablename__]["omitidos"]
+        podados = podados_nivel | heredados
+        if nivel + 1 < len(niveles):
+            hijos = _HIJOS_NIVEL[nivel]
+            nodos = [
+                (nodo_id, hijo)
+                for (_, data), nodo_id in zip(nodos, ids) if nodo_id not in podados
+                for hijo in getattr(data, hijos)
+            ]
+
+    for modelo, ids in reversed(por_eliminar):
+        for lote in _en_lotes(ids):
+            _registrar_eliminaciones(db, modelo, modelo.id.in_(lote), version)
+            if modelo in _NIVELES_CON_PARAMETROS:
+                _borrar_parametros(db, modelo, lote)
+            db.execute(delete(modelo).where(modelo.id.in_(lote)))
+
+    return resumen
+
+
 # ======================================================
 # 🔹 Crear jerarquía completa desde Revit
 # ======================================================
-def sincronizar_desde_revit(db: Session, proyecto_sync: schemas.ProyectoSync):
+def sincronizar_desde_revit(db: Session, proyecto_sync: schemas.ProyectoSync, progreso=None):
+    """
+    Sincroniza un proyecto de Revit en una sola transacción.
+
+    - ``modo="reemplazar"`` (por defecto): borra la jerarquía del proyecto y
+      la vuelve a insertar completa.
+    - ``modo="reconciliar"``: compara contra lo almacenado y solo inserta,
+      actualiza o borra los nodos que cambiaron.
+
+    ``progreso`` (opcional) recibe ``(nivel, contadores)`` tras cada nivel.
+    """
     try:
 
         # 1️⃣ Usuario principal
@@ -91,60 +1040,35 @@ def sincronizar_desde_revit(db: Session, proyecto_sync: schemas.ProyectoSync):
         # 3️⃣ Registrar participación
         registrar_participacion_usuario(db, proyecto.id, usuario.id, proyecto_sync.horas)
 
-        # 4️⃣ Limpiar categorías anteriores (opcional)
-        db.query(models.Categoria).filter(models.Categoria.proyecto_id == proyecto.id).delete()
-        db.commit()
+        # 4️⃣ Versión provisional (la definitiva se reserva al confirmar); en
+        # modo reemplazo se parte de una jerarquía vacía
+        version = version_provisional()
+        proyecto.version = version
+        reconciliar = proyecto_sync.modo == "reconciliar"
+        if not reconciliar:
+            _eliminar_jerarquia_proyecto(db, proyecto.id, version)
 
-        # 5️⃣ Crear jerarquía completa
-        for cat_data in proyecto_sync.categorias:
-            categoria = models.Categoria(
-                nombre=cat_data.nombre,
-                omniclass=cat_data.omniclass,
-                usuario=usuario.nombre,
-                proyecto_id=proyecto.id
-            )
-            db.add(categoria)
-            db.commit()
-            db.refresh(categoria)
-
-            for fam_data in cat_data.familias:
-                familia = models.Familia(
-                    nombre=fam_data.nombre,
-                    omniclass=fam_data.omniclass,
-                    parametros=fam_data.parametros,
-                    categoria_id=categoria.id
-                )
-                db.add(familia)
-                db.commit()
-                db.refresh(familia)
-
-                for tipo_data in fam_data.tipos_familia:
-                    tipo = models.TipoFamilia(
-                        nombre=tipo_data.nombre,
-                        omniclass=tipo_data.omniclass,
-                        parametros=tipo_data.parametros,
-                        familia_id=familia.id
-                    )
-                    db.add(tipo)
-                    db.commit()
-                    db.refresh(tipo)
-
-                    for elem_data in tipo_data.elementos:
-                        elemento = models.Elemento(
-                            nombre=elem_data.nombre,
-                            omniclass=elem_data.omniclass,
-                            parametros=elem_data.parametros,
-                            usuario=usuario.nombre,
-                            fecha_modificacion=datetime.now(),
-                            tipo_familia_id=tipo.id
-                        )
-                        db.add(elemento)
-                        db.commit()
+        # 5️⃣ Escribir jerarquía por niveles con operaciones masivas
+        resumen = _sincronizar_jerarquia(
+            db, proyecto.id, usuario.nombre, proyecto_sync.categorias, reconciliar, version, progreso
+        )
+
+        # 6️⃣ Resúmenes (solo las familias tocadas) y diferencias del árbol OmniClass
+        familias_tocadas = resumen.pop("familias_tocadas")
+        _refrescar_resumen(db, [proyecto.id], familias_tocadas if reconciliar else None, [usuario.id])
+        _aplicar_omniclass(db, proyecto.id, resumen.pop("omniclass"))
+
+        # 7️⃣ Una sola transacción para toda la sincronización
+        confirmar_version(db, version)
+        db.commit()
 
         return {
             "proyecto": proyecto.nombre,
             "usuario": usuario.nombre,
-            "categorias_insertadas": len(proyecto_sync.categorias),
+            "modo": proyecto_sync.modo,
+            "categorias_insertadas": resumen["categorias"]["insertados"],
+            "nodos_omitidos": resumen.pop("nodos_omitidos"),
+            "cambios": resumen,
             "fecha_sync": datetime.now().isoformat()
         }
 
@@ -158,126 +1082,1080 @@ def sincronizar_desde_revit(db: Session, proyecto_sync: schemas.ProyectoSync):
 
 
 
+# ======================================================
+# 🔹 Ingesta incremental NDJSON desde Revit
+# ======================================================
+class IngestaNDJSON:
+    """
+    Escribe una sincronización recibida como NDJSON (un nodo por línea) sin
+    construir el árbol completo en memoria, en dos fases:
+
+    - ``agregar`` valida cada nodo mientras llega el cuerpo (padre conocido,
+      id único) y lo guarda en un archivo temporal (en memoria hasta
+      ``max_memoria`` bytes, después en disco). No toca la BD: una subida
+      lenta o detenida no abre transacción ni retiene bloqueos.
+    - ``cerrar`` relee el archivo con el cuerpo ya completo y validado y lo
+      escribe en una transacción. Los nodos se acumulan por nivel y se
+      insertan con ``_insertar_lote`` cuando un nivel alcanza
+      ``tamano_lote``; antes de volcar un nivel se vuelcan los niveles
+      superiores para poder resolver las referencias ``padre``.
+
+    Solo se conservan las referencias (y después el mapa referencia → ID) de
+    categorías, familias y tipos, nunca los elementos. Lo mismo para las
+    huellas de subárbol: cada tipo acumula las de sus elementos según llegan
+    y familias y categorías recuerdan sus hijos en orden; ``cerrar`` las
+    completa de tipos a categorías y las guarda como ``_calcular_huellas``.
+    Si la ingesta se abandona, ``descartar`` libera el archivo temporal.
+    """
+
+    NIVELES = ("categoria", "familia", "tipo", "elemento")
+    MODELOS = {
+        "categoria": models.Categoria,
+        "familia": models.Familia,
+        "tipo": models.TipoFamilia,
+        "elemento": models.Elemento,
+    }
+
+    def __init__(self, db: Session, cabecera: schemas.ProyectoSyncCabecera, tamano_lote: int = 1000,
+                 max_memoria: int = 8 * 1024 * 1024):
+        self.db = db
+        self.cabecera = cabecera
+        self.tamano_lote = tamano_lote
+        self._archivo = tempfile.SpooledTemporaryFile(max_size=max_memoria, mode="w+", encoding="utf-8")
+        self._refs = {nivel: set() for nivel in self.NIVELES[:-1]}
+        self._subarboles = {nivel: {} for nivel in self.NIVELES[:-1]}
+        self.insertados = {nivel: 0 for nivel in self.NIVELES}
+
+    def agregar(self, nodo: schemas.NodoSync):
+        """Valida el nodo y lo guarda para ``cerrar`` (sin acceso a BD)."""
+        nivel = nodo.tipo
+        indice = self.NIVELES.index(nivel)
+
+        if indice > 0:
+            nivel_padre = self.NIVELES[indice - 1]
+            if nodo.padre not in self._refs[nivel_padre]:
+                raise ValueError(f"{nivel} '{nodo.nombre}' referencia un {nivel_padre} desconocido: {nodo.padre}")
+        if nivel != "elemento":
+            if nodo.id is None:
+                raise ValueError(f"{nivel} '{nodo.nombre}' no tiene 'id' para que lo referencien sus hijos")
+            if nodo.id in self._refs[nivel]:
+                raise ValueError(f"{nivel} con id duplicado: {nodo.id}")
+            self._refs[nivel].add(nodo.id)
+
+        huella = _huella(nodo.nombre, nodo.omniclass, _canonizar_parametros(nodo.parametros))
+        self._anotar_subarbol(nodo, huella)
+        self._archivo.write(json.dumps(
+            [nivel, nodo.id, nodo.padre, nodo.nombre, nodo.omniclass, nodo.parametros, nodo.revit_id, huella],
+            ensure_ascii=False,
+        ))
+        self._archivo.write("\n")
+
+    def _anotar_subarbol(self, nodo: schemas.NodoSync, huella: str):
+        # _huella(contenido, revit_id, *subárboles hijos), calculada por partes
+        revit_id = None if nodo.tipo == "categoria" else nodo.revit_id
+        if nodo.tipo == "elemento":
+            self._subarboles["tipo"][nodo.padre][0].update(
+                ("\x1f" + _huella(huella, revit_id)).encode("utf-8")
+            )
+            return
+        parcial = hashlib.sha256(f"{huella}\x1f{'' if revit_id is None else revit_id}".encode("utf-8"))
+        self._subarboles[nodo.tipo][nodo.id] = (parcial, [])
+        if nodo.tipo != "categoria":
+            self._subarboles[self.NIVELES[self.NIVELES.index(nodo.tipo) - 1]][nodo.padre][1].append(nodo.id)
+
+    def _guardar_subarboles(self):
+        """Completa las huellas de subárbol de tipos, familias y categorías y las escribe."""
+        anteriores = {}
+        for nivel in reversed(self.NIVELES[:-1]):
+            huellas, filas = {}, []
+            for ref, (parcial, hijos) in self._subarboles[nivel].items():
+                for hijo in hijos:
+                    parcial.update(("\x1f" + anteriores[hijo]).encode("utf-8"))
+                huellas[ref] = parcial.hexdigest()
+                filas.append({"id": self._ids[nivel][ref], "hash_subarbol": huellas[ref]})
+            if filas:
+                self.db.execute(update(self.MODELOS[nivel]), filas)
+            anteriores = huellas
+        self._subarboles = None
+
+    def descartar(self):
+        self._archivo.close()
+
+    def cerrar(self):
+        """Escribe lo recibido en una transacción y la confirma."""
+        db = self.db
+        try:
+            self.ahora = datetime.now()
+            self.usuario = obtener_o_crear_usuario(db, self.cabecera.usuario)
+            self.proyecto = obtener_o_crear_proyecto(db, self.cabecera.nombre, self.usuario.id, self.cabecera.horas)
+            registrar_participacion_usuario(db, self.proyecto.id, self.usuario.id, self.cabecera.horas)
+            self.version = version_provisional()
+            self.proyecto.version = self.version
+            _eliminar_jerarquia_proyecto(db, self.proyecto.id, self.version)
+
+            self._refs = None
+            self._ids = {nivel: {} for nivel in self.NIVELES[:-1]}
+            self._pendientes = {nivel: [] for nivel in self.NIVELES}
+            self._omniclass = {}
+            self._archivo.seek(0)
+            for linea in self._archivo:
+                self._escribir(*json.loads(linea))
+            self._volcar(self.NIVELES[-1])
+            self._guardar_subarboles()
+
+            _refrescar_resumen(db, [self.proyecto.id], None, [self.usuario.id])
+            _aplicar_omniclass(db, self.proyecto.id, self._omniclass)
+            confirmar_version(db, self.version)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            self.descartar()
+        return {
+            "proyecto": self.proyecto.nombre,
+            "usuario": self.usuario.nombre,
+            "modo": "reemplazar",
+            "categorias_insertadas": self.insertados["categoria"],
+            "insertados": self.insertados,
+            "fecha_sync": datetime.now().isoformat()
+        }
+
+    def _escribir(self, nivel, ref, padre, nombre, omniclass, parametros, revit_id, huella):
+        codigo = normalizar_omniclass(omniclass)
+        fila = {"nombre": nombre, "omniclass": omniclass, "omniclass_codigo": codigo,
+                "hash_contenido": huella, "version": self.version}
+        _anotar_omniclass(self._omniclass, self.MODELOS[nivel], codigo)
+        if nivel == "categoria":
+            fila["usuario"] = self.usuario.nombre
+        else:
+            fila["parametros"] = parametros
+            fila["revit_id"] = revit_id
+        if nivel == "elemento":
+            fila["usuario"] = self.usuario.nombre
+            fila["fecha_modificacion"] = self.ahora
+
+        self._pendientes[nivel].append((ref, padre, fila))
+        if len(self._pendientes[nivel]) >= self.tamano_lote:
+            self._volcar(nivel)
+
+    def _volcar(self, nivel: str):
+        indice = self.NIVELES.index(nivel)
+        if indice > 0:
+            self._volcar(self.NIVELES[indice - 1])
+
+        pendientes = self._pendientes[nivel]
+        if not pendientes:
+            return
+
+        modelo = self.MODELOS[nivel]
+        if indice == 0:
+            filas = [{**fila, "proyecto_id": self.proyecto.id} for _, _, fila in pendientes]
+        else:
+            ids_padre = self._ids[self.NIVELES[indice - 1]]
+            columna_padre = _PADRE_NIVEL[modelo]
+            filas = [{**fila, columna_padre: ids_padre[padre]} for _, padre, fila in pendientes]
+
+        ids = _insertar_lote(self.db, modelo, filas)
+        if modelo in _NIVELES_CON_PARAMETROS:
+            _indexar_parametros(self.db, modelo, self.proyecto.id,
+                                ((nuevo_id, fila["parametros"]) for nuevo_id, fila in zip(ids, filas)))
+        if nivel in self._ids:
+            self._ids[nivel].update((ref, nuevo_id) for (ref, _, _), nuevo_id in zip(pendientes, ids))
+        self.insertados[nivel] += len(ids)
+        pendientes.clear()
+
+
 # ====================================================
 # 🔄 Sincronización SQL → Revit
 # ====================================================
 
-def obtener_todos_los_proyectos(db: Session):
-    proyectos = db.query(models.Proyecto).all()
-    resultado = []
+def _exportar_proyectos(db: Session, filtro=None):
+    """
+    Exporta proyectos con toda su jerarquía usando una consulta por nivel
+    (sin consultas por nodo ni objetos ORM) y arma los diccionarios anidados
+    en una sola pasada sobre las filas.
+
+    ``filtro`` es una condición opcional sobre ``models.Proyecto``.
+    """
+    Proy, Usr = models.Proyecto, models.Usuario
+    Cat, Fam, Tipo, Elem = models.Categoria, models.Familia, models.TipoFamilia, models.Elemento
 
-    for p in proyectos:
-        proyecto_dict = {
+    proyecto_ids = select(Proy.id)
+    if filtro is not None:
+        proyecto_ids = proyecto_ids.where(filtro)
+
+    consulta = (
+        select(Proy.id, Proy.nombre, Proy.fecha_creacion, Proy.horas,
+               Usr.id.label("usuario_id"), Usr.nombre.label("usuario_nombre"), Usr.correo.label("usuario_correo"))
+        .outerjoin(Usr, Proy.usuario_id == Usr.id)
+        .where(Proy.id.in_(proyecto_ids))
+        .order_by(Proy.id)
+    )
+    proyectos = {}
+    for p in db.execute(consulta):
+        proyectos[p.id] = {
             "id": p.id,
             "nombre": p.nombre,
             "fecha_creacion": p.fecha_creacion.isoformat() if p.fecha_creacion else None,
             "horas": p.horas,
             "usuario": {
-                "id": p.usuario.id if p.usuario else None,
-                "nombre": p.usuario.nombre if p.usuario else None,
-                "correo": p.usuario.correo if p.usuario else None,
-            } if p.usuario else None,
+                "id": p.usuario_id,
+                "nombre": p.usuario_nombre,
+                "correo": p.usuario_correo,
+            } if p.usuario_id is not None else None,
             "categorias": [],
         }
+    if not proyectos:
+        return []
 
-        # Categorías
-        for c in p.categorias:
-            cat_dict = {
-                "id": c.id,
-                "nombre": c.nombre,
-                "omniclass": c.omniclass,
-                "familias": [],
-            }
-
-            # Familias
-            for f in c.familias:
-                fam_dict = {
-                    "id": f.id,
-                    "nombre": f.nombre,
-                    "omniclass": f.omniclass,
-                    "tipos_familia": [],
-                }
+    # Una consulta por nivel; cada fila se cuelga de su padre ya construido
+    niveles = (
+        (select(Cat.id, Cat.nombre, Cat.omniclass, Cat.proyecto_id.label("padre"))
+         .where(Cat.proyecto_id.in_(proyecto_ids)), "categorias", "familias"),
+        (select(Fam.id, Fam.nombre, Fam.omniclass, Fam.categoria_id.label("padre"))
+         .join(Cat, Fam.categoria_id == Cat.id)
+         .where(Cat.proyecto_id.in_(proyecto_ids)), "familias", "tipos_familia"),
+        (select(Tipo.id, Tipo.nombre, Tipo.omniclass, Tipo.familia_id.label("padre"))
+         .join(Fam, Tipo.familia_id == Fam.id).join(Cat, Fam.categoria_id == Cat.id)
+         .where(Cat.proyecto_id.in_(proyecto_ids)), "tipos_familia", "elementos"),
+        (select(Elem.id, Elem.nombre, Elem.omniclass, Elem.tipo_familia_id.label("padre"))
+         .join(Tipo, Elem.tipo_familia_id == Tipo.id).join(Fam, Tipo.familia_id == Fam.id)
+         .join(Cat, Fam.categoria_id == Cat.id)
+         .where(Cat.proyecto_id.in_(proyecto_ids)), "elementos", None),
+    )
 
-                # Tipos de familia
-                for t in f.tipos_familia:
-                    tipo_dict = {
-                        "id": t.id,
-                        "nombre": t.nombre,
-                        "omniclass": t.omniclass,
-                        "elementos": [],
-                    }
+    padres = proyectos
+    for consulta, lista, hijos in niveles:
+        nivel = {}
+        for fila in db.execute(consulta.order_by(consulta.selected_columns.id)):
+            nodo = {"id": fila.id, "nombre": fila.nombre, "omniclass": fila.omniclass}
+            if hijos:
+                nodo[hijos] = []
+                nivel[fila.id] = nodo
+            padre = padres.get(fila.padre)
+            if padre is not None:
+                padre[lista].append(nodo)
+        padres = nivel
 
-                    # Elementos
-                    for e in t.elementos:
-                        tipo_dict["elementos"].append({
-                            "id": e.id,
-                            "nombre": e.nombre,
-                            "omniclass": e.omniclass,
-                        })
+    return list(proyectos.values())
 
-                    fam_dict["tipos_familia"].append(tipo_dict)
 
-                cat_dict["familias"].append(fam_dict)
+def filtro_proyectos(proyecto_id: int = None, nombre: str = None, uuid: str = None):
+    """Condición sobre ``models.Proyecto`` para los filtros indicados (o None)."""
+    condiciones = []
+    if proyecto_id is not None:
+        condiciones.append(models.Proyecto.id == proyecto_id)
+    if nombre is not None:
+        condiciones.append(models.Proyecto.nombre == nombre)
+    if uuid is not None:
+        condiciones.append(models.Proyecto.uuid == uuid)
+    return and_(*condiciones) if condiciones else None
 
-            proyecto_dict["categorias"].append(cat_dict)
 
-        resultado.append(proyecto_dict)
+def iterar_proyectos(db: Session, filtro=None, despues_de: int = None, limite: int = None,
+                     tamano_pagina: int = 50):
+    """
+    Recorre los proyectos por ID ascendente (paginación por cursor: solo los
+    de ID mayor que ``despues_de``) y produce la jerarquía de uno en uno.
 
-    return resultado
+    Los proyectos se exportan por páginas de ``tamano_pagina``: cada página
+    cuesta las cinco consultas de ``_exportar_proyectos`` (no cinco por
+    proyecto) y solo una página está en memoria a la vez.
+    """
+    consulta = select(models.Proyecto.id).order_by(models.Proyecto.id)
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+    if despues_de is not None:
+        consulta = consulta.where(models.Proyecto.id > despues_de)
+    if limite is not None:
+        consulta = consulta.limit(limite)
 
+    for pagina in _en_lotes(db.scalars(consulta).all(), tamano_pagina):
+        yield from _exportar_proyectos(db, models.Proyecto.id.in_(pagina))
 
-def actualizar_revit_id(db: Session, item):
-    tabla = None
-    if item.tipo == "familia":
-        tabla = models.Familia
-    elif item.tipo == "tipo":
-        tabla = models.TipoFamilia
-    elif item.tipo == "elemento":
-        tabla = models.Elemento
+
+def exportar_cambios(db: Session, desde: int, filtro=None, hasta: int = None):
+    """
+    Exporta solo lo que cambió después de la versión ``desde`` (y hasta
+    ``hasta`` o la versión actual): filas insertadas o actualizadas de cada
+    nivel (planas, con el ID de su padre y de su proyecto) y lápidas de las
+    eliminadas. ``token`` es la versión a usar en la próxima consulta.
+
+    Si las lápidas posteriores a ``desde`` ya se purgaron (ver
+    ``purgar_lapidas``) lanza ``VersionPurgada``.
+    """
+    minimo = version_minima(db)
+    if desde < minimo:
+        raise VersionPurgada(desde, minimo)
+    token = version_actual(db) if hasta is None else hasta
+    Proy = models.Proyecto
+
+    proyecto_ids = select(Proy.id)
+    if filtro is not None:
+        proyecto_ids = proyecto_ids.where(filtro)
+
+    def rango(columna):
+        return and_(columna > desde, columna <= token)
+
+    proyectos = db.execute(
+        select(Proy.id, Proy.nombre, Proy.horas, Proy.uuid, Proy.version)
+        .where(Proy.id.in_(proyecto_ids), rango(Proy.version))
+        .order_by(Proy.id)
+    )
+    cambios = {"proyectos": [dict(fila._mapping) for fila in proyectos]}
+
+    for modelo, columna_padre in _PADRE_NIVEL.items():
+        columnas = [modelo.id, getattr(modelo, columna_padre).label("padre"),
+                    models.Categoria.proyecto_id.label("proyecto_id"), modelo.nombre, modelo.omniclass]
+        if hasattr(modelo, "revit_id"):
+            columnas.append(modelo.revit_id)
+        consulta = _con_categoria(select(*columnas, modelo.version), modelo).where(
+            models.Categoria.proyecto_id.in_(proyecto_ids), rango(modelo.version)
+        )
+        cambios[modelo.__tablename__] = [dict(fila._mapping) for fila in db.execute(consulta.order_by(modelo.id))]
+
+    Elim = models.Eliminacion
+    eliminados = db.execute(
+        select(Elim.entidad, Elim.registro_id.label("id"), Elim.revit_id, Elim.proyecto_id, Elim.version)
+        .where(Elim.proyecto_id.in_(proyecto_ids), rango(Elim.version))
+        .order_by(Elim.version, Elim.id)
+    ).all()
+    # Una purga confirmada mientras se leía pudo llevarse lápidas del rango
+    minimo = version_minima(db)
+    if desde < minimo:
+        raise VersionPurgada(desde, minimo)
+    return {
+        "desde": desde,
+        "token": token,
+        "cambios": cambios,
+        "eliminados": [dict(fila._mapping) for fila in eliminados],
+    }
+
+
+# ======================================================
+# 🔎 Consulta por parámetros
+# ======================================================
+_FILTRO_PARAMETRO = re.compile(r"^(.+?)(>=|<=|\^=|=|>|<)(.*)$")
+
+
+def parsear_filtro_parametro(texto: str):
+    """
+    ``"FireRating=2h"`` → ``("FireRating", "=", "2h")``. Operadores: ``=``,
+    ``>``, ``>=``, ``<``, ``<=`` y ``^=`` (el texto empieza por).
+    """
+    coincidencia = _FILTRO_PARAMETRO.match(texto)
+    if coincidencia is None or not coincidencia.group(1).strip():
+        raise ValueError(f"Filtro de parámetro no válido: {texto!r} (formato nombre=valor)")
+    nombre, operador, valor = coincidencia.groups()
+    return nombre.strip(), operador, valor.strip()
+
+
+def condicion_parametro(modelo, nombre: str, operador: str, valor: str, proyecto_id: int = None):
+    """
+    Condición sobre ``modelo.id`` para un filtro de parámetro, resuelta con
+    los índices de ``parametros_valores``. ``=`` compara como número si el
+    valor lo es y como texto si no; ``>``/``<`` exigen un valor numérico.
+    """
+    Param = models.ParametroValor
+    ids = select(Param.registro_id).where(Param.entidad == modelo.__tablename__, Param.nombre == nombre)
+    if proyecto_id is not None:
+        ids = ids.where(Param.proyecto_id == proyecto_id)
+
+    numero = _a_numero(valor)
+    if operador == "=":
+        ids = ids.where(Param.valor_numero == numero if numero is not None else Param.valor_texto == valor)
+    elif operador == "^=":
+        ids = ids.where(Param.valor_texto.startswith(valor, autoescape=True))
+    elif numero is None:
+        raise ValueError(f"El filtro {nombre}{operador}{valor} necesita un valor numérico")
     else:
-        raise Exception(f"Tipo no reconocido: {item.tipo}")
+        comparaciones = {
+            ">": Param.valor_numero > numero,
+            ">=": Param.valor_numero >= numero,
+            "<": Param.valor_numero < numero,
+            "<=": Param.valor_numero <= numero,
+        }
+        ids = ids.where(comparaciones[operador])
+    return modelo.id.in_(ids)
 
-    registro = db.query(tabla).filter(tabla.id == item.id_sql).first()
-    if registro:
-        registro.revit_id = item.revit_id
-        db.commit()
 
-def eliminar_por_revit_id(db: Session, tipo: str, revit_id: int):
-    tabla = None
-    if tipo == "familia":
-        tabla = models.Familia
-    elif tipo == "tipo":
-        tabla = models.TipoFamilia
-    elif tipo == "elemento":
-        tabla = models.Elemento
+def buscar_por_parametros(db: Session, tipo: str, filtros: list, proyecto_id: int = None,
+                          despues_de: int = None, limite: int = 100, incluir_parametros: bool = False):
+    """
+    Familias, tipos o elementos (``tipo``) que cumplen todos los ``filtros``
+    (``(nombre, operador, valor)``), por ID ascendente y paginados por
+    cursor (``despues_de``). Con ``incluir_parametros`` se añade el blob
+    original.
+    """
+    modelo = _tabla_por_tipo(tipo)
+    columnas = [modelo.id, modelo.nombre, modelo.omniclass, modelo.revit_id,
+                models.Categoria.proyecto_id.label("proyecto_id")]
+    if incluir_parametros:
+        columnas.append(modelo.parametros)
+    consulta = _con_categoria(select(*columnas), modelo).where(
+        *(condicion_parametro(modelo, *filtro, proyecto_id=proyecto_id) for filtro in filtros)
+    )
+    if proyecto_id is not None:
+        consulta = consulta.where(models.Categoria.proyecto_id == proyecto_id)
+    if despues_de is not None:
+        consulta = consulta.where(modelo.id > despues_de)
+    filas = db.execute(consulta.order_by(modelo.id).limit(limite))
+    return [dict(fila._mapping) for fila in filas]
+
+
+# ======================================================
+# 🔎 Búsqueda de familias, tipos y elementos
+# ======================================================
+CAMPOS_BUSQUEDA_DEFECTO = ("id", "nombre", "omniclass", "revit_id")
+
+
+def _columnas_busqueda(modelo) -> dict:
+    """Campos proyectables de ``modelo`` (columnas propias y de sus ancestros)."""
+    Cat, Fam, Tipo = models.Categoria, models.Familia, models.TipoFamilia
+    columnas = {
+        "id": modelo.id,
+        "nombre": modelo.nombre,
+        "omniclass": modelo.omniclass,
+        "revit_id": modelo.revit_id,
+        "parametros": modelo.parametros,
+        "version": modelo.version,
+        "proyecto_id": Cat.proyecto_id,
+        "categoria_id": Cat.id,
+        "categoria": Cat.nombre,
+    }
+    if modelo is not Fam:
+        columnas.update(familia_id=Fam.id, familia=Fam.nombre)
+    if modelo is models.Elemento:
+        columnas.update(tipo_familia_id=Tipo.id, tipo_familia=Tipo.nombre,
+                        usuario=modelo.usuario, fecha_modificacion=modelo.fecha_modificacion)
+    return columnas
+
+
+def _patron_nombre(columna, patron: str):
+    """``*`` es comodín (LIKE); sin comodines se compara por igualdad."""
+    if "*" not in patron:
+        return columna == patron
+    escapado = patron.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return columna.like(escapado.replace("*", "%"), escape="\\")
+
+
+def buscar_entidades(db: Session, tipo: str, campos: list = None, proyecto_id: int = None,
+                     categoria: str = None, familia: str = None, omniclass: str = None, nombre: str = None,
+                     revit_id: int = None, desde: int = None, modificado_desde: datetime = None,
+                     parametros: list = None, despues_de: int = None, limite: int = 500):
+    """
+    Busca familias, tipos o elementos (``tipo``) con una sola consulta SQL
+    (JOIN hasta la categoría, sin relaciones ORM) y devuelve solo ``campos``.
+
+    Filtros: proyecto, nombre de categoría y de familia, prefijo OmniClass,
+    patrón de nombre (``*`` comodín), ``revit_id``, versión posterior a
+    ``desde`` (token de /sync/sql/), ``modificado_desde`` (solo elementos) y
+    filtros de parámetros ``(nombre, operador, valor)``. Se pagina por ID
+    ascendente a partir de ``despues_de``.
+    """
+    modelo = _tabla_por_tipo(tipo)
+    disponibles = _columnas_busqueda(modelo)
+    campos = list(dict.fromkeys(["id", *(campos or CAMPOS_BUSQUEDA_DEFECTO)]))
+    desconocidos = [c for c in campos if c not in disponibles]
+    if desconocidos:
+        raise ValueError(f"Campos no disponibles para {tipo}: {', '.join(desconocidos)}")
+
+    Cat, Fam = models.Categoria, models.Familia
+    condiciones = []
+    if proyecto_id is not None:
+        condiciones.append(Cat.proyecto_id == proyecto_id)
+    if categoria is not None:
+        condiciones.append(Cat.nombre == categoria)
+    if familia is not None:
+        condiciones.append(Fam.nombre == familia)
+    if omniclass:
+        condiciones.append(filtro_omniclass(modelo.omniclass_codigo, omniclass))
+    if nombre:
+        condiciones.append(_patron_nombre(modelo.nombre, nombre))
+    if revit_id is not None:
+        condiciones.append(modelo.revit_id == revit_id)
+    if desde is not None:
+        condiciones.append(modelo.version > desde)
+    if modificado_desde is not None:
+        if modelo is not models.Elemento:
+            raise ValueError("modificado_desde solo aplica a elementos")
+        condiciones.append(modelo.fecha_modificacion >= modificado_desde)
+    for filtro in parametros or []:
+        condiciones.append(condicion_parametro(modelo, *filtro, proyecto_id=proyecto_id))
+    if despues_de is not None:
+        condiciones.append(modelo.id > despues_de)
+
+    consulta = _con_categoria(select(*(disponibles[c].label(c) for c in campos)), modelo)
+    filas = db.execute(consulta.where(*condiciones).order_by(modelo.id).limit(limite))
+    return [dict(fila._mapping) for fila in filas]
+
+
+# ======================================================
+# 📊 Informes desde las tablas de resumen
+# ======================================================
+def resumen_proyecto(db: Session, proyecto_id: int, con_familias: bool = False):
+    """
+    Totales del proyecto y conteos por categoría (y por familia, si se pide)
+    leídos de las tablas de resumen: el coste depende del número de
+    familias, no del de elementos. None si el proyecto no existe.
+    """
+    Proy, Cat, Fam = models.Proyecto, models.Categoria, models.Familia
+    RF, RP = models.ResumenFamilia, models.ResumenProyecto
+    fila = db.execute(
+        select(Proy.id, Proy.nombre, RP.categorias, RP.familias, RP.tipos_familia, RP.elementos,
+               RP.usuarios, RP.horas, RP.ultima_modificacion)
+        .outerjoin(RP, RP.proyecto_id == Proy.id)
+        .where(Proy.id == proyecto_id)
+    ).first()
+    if fila is None:
+        return None
+
+    proyecto = dict(fila._mapping)
+    for campo in ("categorias", "familias", "tipos_familia", "elementos", "usuarios", "horas"):
+        proyecto[campo] = proyecto[campo] or 0  # proyecto aún sin sincronizar
+    categorias = db.execute(
+        select(Cat.id, Cat.nombre, func.count(RF.familia_id).label("familias"),
+               func.coalesce(func.sum(RF.tipos_familia), 0).label("tipos_familia"),
+               func.coalesce(func.sum(RF.elementos), 0).label("elementos"),
+               func.max(RF.ultima_modificacion).label("ultima_modificacion"))
+        .outerjoin(RF, RF.categoria_id == Cat.id)
+        .where(Cat.proyecto_id == proyecto_id)
+        .group_by(Cat.id, Cat.nombre)
+        .order_by(Cat.id)
+    )
+    proyecto["categorias_detalle"] = [dict(c._mapping) for c in categorias]
+    if con_familias:
+        familias = db.execute(
+            select(RF.familia_id.label("id"), Fam.nombre, RF.categoria_id, RF.tipos_familia, RF.elementos,
+                   RF.ultima_modificacion)
+            .join(Fam, Fam.id == RF.familia_id)
+            .where(RF.proyecto_id == proyecto_id)
+            .order_by(RF.familia_id)
+        )
+        proyecto["familias_detalle"] = [dict(f._mapping) for f in familias]
+    return proyecto
+
+
+def resumen_usuarios(db: Session, usuario_id: int = None, despues_de: int = None, limite: int = 100):
+    """Horas, proyectos y última actividad por usuario (paginado por ID)."""
+    Usr, RU = models.Usuario, models.ResumenUsuario
+    consulta = (
+        select(Usr.id, Usr.nombre, Usr.correo, RU.proyectos, RU.horas, RU.ultima_actividad)
+        .join(RU, RU.usuario_id == Usr.id)
+        .order_by(Usr.id)
+        .limit(limite)
+    )
+    if usuario_id is not None:
+        consulta = consulta.where(Usr.id == usuario_id)
+    if despues_de is not None:
+        consulta = consulta.where(Usr.id > despues_de)
+    return [dict(fila._mapping) for fila in db.execute(consulta)]
+
+
+def _diferencias(db: Session, modelo, recalculo, condicion=None):
+    """Claves cuya fila de ``modelo`` no coincide con ``recalculo``."""
+    columnas = _COLUMNAS_RESUMEN[modelo]
+    guardadas = select(*(getattr(modelo, c) for c in columnas))
+    if condicion is not None:
+        guardadas = guardadas.where(condicion)
+
+    def normalizar(fila):
+        return tuple(round(v, 6) if isinstance(v, float) else v for v in fila)
+
+    esperado = {fila[0]: normalizar(fila) for fila in db.execute(recalculo)}
+    actual = {fila[0]: normalizar(fila) for fila in db.execute(guardadas)}
+    return sorted(k for k in esperado.keys() | actual.keys() if esperado.get(k) != actual.get(k))
+
+
+def verificar_resumen(db: Session, proyecto_id: int = None):
+    """
+    Compara las tablas de resumen con lo que resulta de recalcularlas desde
+    las tablas base (de un proyecto o de todo) sin modificar nada. Los
+    totales de proyecto se comprueban contra ``resumen_familias``, que a su
+    vez se comprueba contra los elementos.
+    """
+    RF, RP, RU, PU = models.ResumenFamilia, models.ResumenProyecto, models.ResumenUsuario, models.ProyectoUsuario
+    if proyecto_id is None:
+        familias = _diferencias(db, RF, _consulta_resumen_familias(literal(True)))
+        proyectos = _diferencias(db, RP, _consulta_resumen_proyectos(literal(True)))
+        usuarios = _diferencias(db, RU, _consulta_resumen_usuarios(literal(True)))
     else:
+        usuario_ids = select(PU.usuario_id).where(PU.proyecto_id == proyecto_id)
+        familias = _diferencias(db, RF, _consulta_resumen_familias(models.Categoria.proyecto_id == proyecto_id),
+                                RF.proyecto_id == proyecto_id)
+        proyectos = _diferencias(db, RP, _consulta_resumen_proyectos(models.Proyecto.id == proyecto_id),
+                                 RP.proyecto_id == proyecto_id)
+        usuarios = _diferencias(db, RU, _consulta_resumen_usuarios(PU.usuario_id.in_(usuario_ids)),
+                                RU.usuario_id.in_(usuario_ids))
+    return {
+        "consistente": not (familias or proyectos or usuarios),
+        "familias": familias,
+        "proyectos": proyectos,
+        "usuarios": usuarios,
+    }
+
+
+_TABLAS_REVIT = {
+    "familia": models.Familia,
+    "tipo": models.TipoFamilia,
+    "elemento": models.Elemento,
+}
+
+
+def _tabla_por_tipo(tipo: str):
+    tabla = _TABLAS_REVIT.get(tipo)
+    if tabla is None:
         raise Exception(f"Tipo no reconocido: {tipo}")
+    return tabla
+
 
-    registro = db.query(tabla).filter(tabla.revit_id == revit_id).first()
-    if registro:
-        db.delete(registro)
+def actualizar_revit_ids(db: Session, items: list):
+    """
+    Escribe en bloque los revit_id devueltos por Revit.
+
+    Agrupa los items por tipo y aplica cada grupo con un único
+    ``UPDATE ... SET revit_id = CASE id ... END WHERE id IN (...)`` por lote,
+    todo en una transacción. Devuelve cuántos se actualizaron y qué
+    ``id_sql`` no existen.
+    """
+    grupos = {}
+    for item in items:
+        grupos.setdefault(_tabla_por_tipo(item.tipo), {})[item.id_sql] = item.revit_id
+
+    actualizados = 0
+    no_encontrados = {}
+    try:
+        version = version_provisional()
+        for tabla, revit_ids in grupos.items():
+            ids = list(revit_ids)
+            for lote in _en_lotes(ids, 500):
+                existentes = set(db.scalars(select(tabla.id).where(tabla.id.in_(lote))))
+                faltantes = [i for i in lote if i not in existentes]
+                if faltantes:
+                    tipo = next(t for t, m in _TABLAS_REVIT.items() if m is tabla)
+                    no_encontrados.setdefault(tipo, []).extend(faltantes)
+                if not existentes:
+                    continue
+                # El revit_id forma parte de la huella de subárbol
+                _invalidar_subarboles(db, tabla, tabla.id.in_(existentes), incluir_propios=True)
+                db.execute(
+                    update(tabla)
+                    .where(tabla.id.in_(existentes))
+                    .values(
+                        revit_id=case({i: revit_ids[i] for i in existentes}, value=tabla.id),
+                        version=version,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                actualizados += len(existentes)
+        if actualizados:
+            confirmar_version(db, version)
         db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error al actualizar revit_id: {str(e)}")
+
+    return {"actualizados": actualizados, "no_encontrados": no_encontrados}
+
+
+def actualizar_revit_id(db: Session, item):
+    return actualizar_revit_ids(db, [item])
+
+def eliminar_por_revit_ids(db: Session, items: list, usuario: str, proyecto: str, auditar=None):
+    """
+    Elimina en bloque entidades por revit_id en una sola transacción.
+
+    Por cada tipo (y lote de revit_id) se leen las filas afectadas con una
+    consulta, se borran con un DELETE por nivel (incluidos sus descendientes)
+    y al final se insertan todas las filas de AuditoriaSync en un INSERT
+    multi-fila. ``proyecto`` (nombre) es obligatorio: un revit_id solo es
+    único dentro de un modelo, así que nunca se borra entre proyectos.
+
+    Con ``auditar`` (p. ej. ``auditoria.escritor.registrar_lote``) las filas
+    de auditoría se le entregan tras el commit en lugar de escribirse en la
+    misma transacción.
+    """
+    grupos = {}
+    for item in items:
+        grupos.setdefault(_tabla_por_tipo(item.tipo), set()).add(item.revit_id)
+
+    Proy, Cat = models.Proyecto, models.Categoria
+    eliminados, no_encontrados, auditoria = {}, {}, []
+    afectados, familias, omniclass = set(), set(), {}
+    if not proyecto:
+        raise ValueError("Falta el proyecto del que eliminar")
+    try:
+        proyecto_id = db.scalar(select(Proy.id).where(Proy.nombre == proyecto))
+        if proyecto_id is None:
+            raise Exception(f"Proyecto no encontrado: {proyecto}")
+
+        version = version_provisional()
+        for tabla, revit_ids in grupos.items():
+            tipo = next(t for t, m in _TABLAS_REVIT.items() if m is tabla)
+            familia = models.Familia.id if tabla is models.Familia else models.TipoFamilia.familia_id
+            for lote in _en_lotes(sorted(revit_ids)):
+                consulta = (
+                    _con_categoria(select(tabla.id, tabla.revit_id, tabla.nombre, Cat.proyecto_id,
+                                          familia.label("familia_id"), Proy.nombre.label("proyecto")), tabla)
+                    .join(Proy, Cat.proyecto_id == Proy.id)
+                    .where(tabla.revit_id.in_(lote), Cat.proyecto_id == proyecto_id)
+                )
+                filas = db.execute(consulta).all()
+
+                encontrados = {f.revit_id for f in filas}
+                faltantes = [r for r in lote if r not in encontrados]
+                if faltantes:
+                    no_encontrados.setdefault(tipo, []).extend(faltantes)
+                if not filas:
+                    continue
+
+                _eliminar_con_descendientes(db, tabla, tabla.id.in_([f.id for f in filas]), version, omniclass)
+                afectados.update(f.proyecto_id for f in filas)
+                familias.update(f.familia_id for f in filas)
+                eliminados[tipo] = eliminados.get(tipo, 0) + len(filas)
+                auditoria.extend(
+                    {
+                        "usuario": usuario or "Desconocido",
+                        "proyecto": f.proyecto or "Sin proyecto",
+                        "entidad": tipo.capitalize(),
+                        "revit_id": f.revit_id,
+                        "accion": "ELIMINAR",
+                        "detalle": json.dumps({"nombre": f.nombre, "id": f.id}, ensure_ascii=False),
+                    }
+                    for f in filas
+                )
+
+        _refrescar_resumen(db, afectados, familias)
+        _aplicar_omniclass(db, proyecto_id, omniclass)
+        if auditoria and auditar is None:
+            insertar_auditoria(db, auditoria)
+        if eliminados:
+            confirmar_version(db, version)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error al eliminar por revit_id: {str(e)}")
+    except Exception:
+        db.rollback()
+        raise
+
+    if auditoria and auditar is not None:
+        auditar(auditoria)
+
+    for tipo, faltantes in no_encontrados.items():
+        print(f"⚠️ No se encontraron {len(faltantes)} {tipo}(s) por RevitID: {faltantes[:10]}")
+    return {"eliminados": eliminados, "no_encontrados": no_encontrados}
+
+
+def eliminar_por_revit_id(db: Session, tipo: str, revit_id: int, usuario: str, proyecto: str, auditar=None):
+    item = schemas.RevitDeleteSync(tipo=tipo, revit_id=revit_id)
+    return eliminar_por_revit_ids(db, [item], usuario, proyecto, auditar)
+
+
+# ======================================================
+# 🔄 Tandem → SQL
+# ======================================================
+def aplicar_proyectos_tandem(db: Session, proyectos: list):
+    """
+    Upsert en bloque de proyectos leídos de Tandem, emparejados por
+    ``tandem_id`` (o por nombre si un proyecto previo aún no lo tiene).
+
+    ``proyectos`` es una lista de dicts con ``tandem_id``, ``nombre`` y
+    ``descripcion``. Aplica un INSERT multi-fila y un UPDATE por clave
+    primaria en bloque sin confirmar la transacción; devuelve los contadores.
+    """
+    Proyecto = models.Proyecto
+    entrantes = {p["tandem_id"]: p for p in proyectos if p.get("tandem_id")}
+
+    existentes = {}
+    for lote in _en_lotes(list(entrantes)):
+        for fila in db.execute(
+            select(Proyecto.id, Proyecto.tandem_id, Proyecto.nombre, Proyecto.descripcion)
+            .where(Proyecto.tandem_id.in_(lote))
+        ):
+            existentes[fila.tandem_id] = fila
+
+    # Proyectos creados antes por nombre, sin tandem_id: se adoptan
+    por_nombre = {}
+    pendientes = [p["nombre"] for t, p in entrantes.items() if t not in existentes and p.get("nombre")]
+    for lote in _en_lotes(list(set(pendientes))):
+        for fila in db.execute(
+            select(Proyecto.id, Proyecto.tandem_id, Proyecto.nombre, Proyecto.descripcion)
+            .where(Proyecto.tandem_id.is_(None), Proyecto.nombre.in_(lote))
+            .order_by(Proyecto.id)
+        ):
+            por_nombre.setdefault(fila.nombre, fila)
+
+    nuevos, cambios = [], []
+    sin_cambios = 0
+    for tandem_id, p in entrantes.items():
+        fila = existentes.get(tandem_id) or por_nombre.pop(p.get("nombre"), None)
+        if fila is None:
+            if p.get("nombre"):
+                nuevos.append({"nombre": p["nombre"], "descripcion": p.get("descripcion", ""),
+                               "tandem_id": tandem_id, "fuente": "tandem"})
+            continue
+        valores = {"id": fila.id}
+        if fila.tandem_id != tandem_id:
+            valores["tandem_id"] = tandem_id
+        if p.get("nombre") and fila.nombre != p["nombre"]:
+            valores["nombre"] = p["nombre"]
+        if fila.descripcion != p.get("descripcion", ""):
+            valores["descripcion"] = p.get("descripcion", "")
+        if len(valores) > 1:
+            cambios.append(valores)
+        else:
+            sin_cambios += 1
+
+    if nuevos or cambios:
+        version = version_provisional()
+        if nuevos:
+            ids = _insertar_lote(db, Proyecto, [{**fila, "version": version} for fila in nuevos])
+            _refrescar_resumen(db, ids)
+        if cambios:
+            db.execute(update(Proyecto), [{**fila, "version": version} for fila in cambios])
+        confirmar_version(db, version)
+
+    return {"leidos": len(proyectos), "insertados": len(nuevos),
+            "actualizados": len(cambios), "sin_cambios": sin_cambios}
+
+
+def ultima_marca_tandem(db: Session):
+    """Marca de agua de la última sincronización Tandem completada."""
+    Ejecucion = models.EjecucionSyncTandem
+    return db.scalar(
+        select(Ejecucion.marca_agua)
+        .where(Ejecucion.estado == "completado", Ejecucion.marca_agua.is_not(None))
+        .order_by(Ejecucion.inicio.desc())
+        .limit(1)
+    )
+
+
+def registrar_ejecucion_tandem(db: Session, **datos):
+    """Agrega el registro de una ejecución (se confirma con la transacción)."""
+    ejecucion = models.EjecucionSyncTandem(**datos)
+    db.add(ejecucion)
+    return ejecucion
 
-        registrar_auditoria(
-            db=db,
-            usuario=usuario or "Desconocido",
-            proyecto=proyecto or "Sin proyecto",
-            entidad=tipo.capitalize(),
-            revit_id=revit_id,
-            accion="ELIMINAR",
-            detalle={"nombre": getattr(registro, "nombre", None)}
+
+def listar_ejecuciones_tandem(db: Session, limite: int = 50, estado: str = None, antes_de: int = None):
+    """Historial de ejecuciones, de la más reciente a la más antigua."""
+    Ejecucion = models.EjecucionSyncTandem
+    consulta = select(Ejecucion).order_by(Ejecucion.id.desc()).limit(limite)
+    if estado:
+        consulta = consulta.where(Ejecucion.estado == estado)
+    if antes_de is not None:
+        consulta = consulta.where(Ejecucion.id < antes_de)
+    return [
+        {c.name: getattr(e, c.name) for c in Ejecucion.__table__.columns}
+        for e in db.scalars(consulta)
+    ]
+
+
+# ======================================================
+# 🔒 Bloqueos con lease (liderazgo entre workers)
+# ======================================================
+class _AhoraBD(FunctionElement):
+    """
+    Hora UTC del servidor de BD desplazada ``segundos``. Los leases se
+    comparan y caducan con este reloj único: con el de cada worker, un
+    desfase entre máquinas podría dar dos líderes a la vez.
+    """
+
+    type = DateTime()
+    name = "ahora_bd"
+    inherit_cache = True
+
+
+@compiles(_AhoraBD, "mssql")
+def _ahora_bd_mssql(elemento, compilador, **kw):
+    return f"DATEADD(second, {compilador.process(elemento.clauses, **kw)}, SYSUTCDATETIME())"
+
+
+@compiles(_AhoraBD, "sqlite")
+def _ahora_bd_sqlite(elemento, compilador, **kw):
+    return f"strftime('%Y-%m-%d %H:%M:%f', 'now', {compilador.process(elemento.clauses, **kw)} || ' seconds')"
+
+
+def _ahora_bd(segundos: float = 0):
+    return _AhoraBD(literal(int(math.ceil(segundos))))
+
+
+def adquirir_bloqueo(db: Session, nombre: str, propietario: str, ttl: float) -> bool:
+    """
+    Toma o renueva el bloqueo ``nombre`` durante ``ttl`` segundos.
+
+    Un único UPDATE condicional (libre, caducado o ya nuestro) decide quién
+    lo tiene; si la fila aún no existe se inserta y, si otro worker se
+    adelanta, la clave primaria rechaza el duplicado. Tanto la caducidad
+    como la comparación usan la hora de la BD. Confirma la transacción.
+    """
+    Bloqueo = models.BloqueoScheduler
+    try:
+        resultado = db.execute(
+            update(Bloqueo)
+            .where(Bloqueo.nombre == nombre, or_(Bloqueo.propietario == propietario, Bloqueo.expira < _ahora_bd()))
+            .values(
+                propietario=propietario,
+                expira=_ahora_bd(ttl),
+                adquirido=case((Bloqueo.propietario == propietario, Bloqueo.adquirido), else_=_ahora_bd()),
+            )
+            .execution_options(synchronize_session=False)
         )
-    else:
-        print(f"⚠️ No se encontró {tipo} con RevitID {revit_id}")
-
-def registrar_auditoria(db, usuario, proyecto, entidad, revit_id, accion, detalle=None):
-    registro = models.AuditoriaSync(
-        usuario=usuario,
-        proyecto=proyecto,
-        entidad=entidad,
-        revit_id=revit_id,
-        accion=accion,
-        detalle=json.dumps(detalle or {}, ensure_ascii=False)
+        if resultado.rowcount == 0:
+            existe = db.scalar(select(Bloqueo.nombre).where(Bloqueo.nombre == nombre))
+            if existe is not None:
+                db.rollback()
+                return False
+            db.execute(insert(Bloqueo).values(
+                nombre=nombre, propietario=propietario, expira=_ahora_bd(ttl), adquirido=_ahora_bd(),
+            ))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def liberar_bloqueo(db: Session, nombre: str, propietario: str):
+    Bloqueo = models.BloqueoScheduler
+    db.execute(delete(Bloqueo).where(Bloqueo.nombre == nombre, Bloqueo.propietario == propietario))
+    db.commit()
+
+
+def solicitar_ejecucion(db: Session, nombre: str, solicitante: str, ttl: float) -> bool:
+    """
+    Deja pedida una ejecución de ``nombre`` para el worker que tenga su
+    bloqueo: una fila ``<nombre>:solicitud`` en la misma tabla, válida
+    ``ttl`` segundos. Devuelve False si ya había una pendiente (las
+    peticiones se funden en una).
+    """
+    # Propietario único por petición: ni el mismo worker renueva una pendiente
+    return adquirir_bloqueo(db, f"{nombre}:solicitud", f"{solicitante}#{secrets.token_hex(4)}", ttl)
+
+
+def consumir_solicitud(db: Session, nombre: str) -> bool:
+    """Retira la petición pendiente de ``nombre``, si la hay y no ha caducado."""
+    Bloqueo = models.BloqueoScheduler
+    resultado = db.execute(
+        delete(Bloqueo)
+        .where(Bloqueo.nombre == f"{nombre}:solicitud", Bloqueo.expira >= _ahora_bd())
+        .execution_options(synchronize_session=False)
     )
-    db.add(registro)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    return resultado.rowcount > 0
+
+
+def obtener_bloqueo(db: Session, nombre: str):
+    Bloqueo = models.BloqueoScheduler
+    bloqueo = db.get(Bloqueo, nombre)
+    if bloqueo is None:
+        return None
+    return {"propietario": bloqueo.propietario, "expira": bloqueo.expira, "adquirido": bloqueo.adquirido}
+
+
+# ======================================================
+# 🧾 Auditoría (escritura por lotes, consulta y archivo)
+# ======================================================
+# Columnas de texto acotado de AuditoriaSync (usuario y proyecto llegan del cliente)
+_LONGITUDES_AUDITORIA = {
+    columna.name: columna.type.length
+    for columna in models.AuditoriaSync.__table__.columns
+    if isinstance(columna.type, String) and columna.type.length
+}
+
+
+def insertar_auditoria(db: Session, filas: list, tamano_lote: int = 500):
+    """
+    Inserta filas de AuditoriaSync con INSERT multi-fila (sin commit).
+    ``detalle`` se guarda tal cual si ya es texto; si no, como JSON. Los
+    textos más largos que su columna se recortan en lugar de hacer fallar
+    el lote entero.
+    """
+    for fila in filas:
+        detalle = fila.get("detalle")
+        if detalle is not None and not isinstance(detalle, str):
+            fila["detalle"] = json.dumps(detalle, ensure_ascii=False, default=str)
+        for columna, longitud in _LONGITUDES_AUDITORIA.items():
+            valor = fila.get(columna)
+            if isinstance(valor, str) and len(valor) > longitud:
+                fila[columna] = valor[:longitud]
+    for i in range(0, len(filas), tamano_lote):
+        db.execute(insert(models.AuditoriaSync.__table__), filas[i:i + tamano_lote])
+
+
+def listar_auditoria(
+    db: Session,
+    proyecto: str = None,
+    entidad: str = None,
+    accion: str = None,
+    usuario: str = None,
+    desde: datetime = None,
+    hasta: datetime = None,
+    antes_de: int = None,
+    limite: int = 100,
+):
+    """
+    Eventos de auditoría, del más reciente al más antiguo. Filtrar por
+    ``proyecto`` o ``entidad`` junto con el rango ``[desde, hasta)`` usa los
+    índices compuestos (columna, fecha_hora). Paginación con ``antes_de``
+    (último ``id`` recibido).
+    """
+    A = models.AuditoriaSync
+    consulta = select(*A.__table__.columns).order_by(A.id.desc()).limit(limite)
+    if proyecto:
+        consulta = consulta.where(A.proyecto == proyecto)
+    if entidad:
+        consulta = consulta.where(A.entidad == entidad)
+    if accion:
+        consulta = consulta.where(A.accion == accion)
+    if usuario:
+        consulta = consulta.where(A.usuario == usuario)
+    if desde is not None:
+        consulta = consulta.where(A.fecha_hora >= desde)
+    if hasta is not None:
+        consulta = consulta.where(A.fecha_hora < hasta)
+    if antes_de is not None:
+        consulta = consulta.where(A.id < antes_de)
+    return [dict(fila._mapping) for fila in db.execute(consulta)]
+
+
+def archivar_auditoria(db: Session, antes_de: datetime, purgar_archivo_antes_de: datetime = None,
+                       tamano_lote: int = 1000):
+    """
+    Mueve a ``auditoria_sync_archivo`` los eventos anteriores a ``antes_de``
+    (INSERT…SELECT + DELETE) y, si se indica, borra del archivo lo anterior a
+    ``purgar_archivo_antes_de``. Trabaja en lotes de ``tamano_lote`` ids con
+    un commit por lote, para no retener bloqueos sobre la tabla viva.
+    """
+    A, Archivo = models.AuditoriaSync, models.AuditoriaSyncArchivo
+    columnas = [c.name for c in A.__table__.columns]
+    archivados = purgados = 0
+    try:
+        while True:
+            ids = db.scalars(
+                select(A.id).where(A.fecha_hora < antes_de).order_by(A.id).limit(tamano_lote)
+            ).all()
+            if not ids:
+                break
+            db.execute(insert(Archivo).from_select(columnas, select(*A.__table__.columns).where(A.id.in_(ids))))
+            db.execute(delete(A).where(A.id.in_(ids)))
+            db.commit()
+            archivados += len(ids)
+
+        while purgar_archivo_antes_de is not None:
+            ids = db.scalars(
+                select(Archivo.id).where(Archivo.fecha_hora < purgar_archivo_antes_de)
+                .order_by(Archivo.id).limit(tamano_lote)
+            ).all()
+            if not ids:
+                break
+            db.execute(delete(Archivo).where(Archivo.id.in_(ids)))
+            db.commit()
+            purgados += len(ids)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error al archivar la auditoría: {str(e)}")
+
+    return {"archivados": archivados, "purgados": purgados}
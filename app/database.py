@@ -1,6 +1,13 @@
+import asyncio
+import functools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,17 +17,207 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-DATABASE_URL = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+# Cualquier URL de SQLAlchemy (p. ej. sqlite:///local.db para pruebas);
+# por defecto, SQL Server con las variables DB_*.
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+)
+
+
+# ==============================================
+# 📊 Métricas de pool (espera en checkout y saturación)
+# ==============================================
+class MetricasPool:
+    def __init__(self, perfil: str, max_overflow: int = 0):
+        self.perfil = perfil
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.timeouts = 0
+
+    def registrar(self, espera: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.checkouts += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+            else:
+                self.timeouts += 1
+
+    def como_dict(self, pool):
+        capacidad = pool.size() + max(self.max_overflow, 0)
+        with self._lock:
+            return {
+                "perfil": self.perfil,
+                "tamano": pool.size(),
+                "en_uso": pool.checkedout(),
+                "saturacion": round(pool.checkedout() / capacidad, 3) if capacidad else None,
+                "checkouts": self.checkouts,
+                "espera_media_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto se espera para obtener una conexión."""
+
+    metricas: MetricasPool = None
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except Exception:
+            self.metricas.registrar(time.perf_counter() - inicio, ok=False)
+            raise
+        self.metricas.registrar(time.perf_counter() - inicio)
+        return conexion
+
+
+# ==============================================
+# 🏭 Fábrica de engines por tipo de carga
+# ==============================================
+# - oltp:    peticiones cortas de la API
+# - bulk:    sincronizaciones masivas (fast_executemany, lotes grandes)
+# - lectura: exportaciones SQL → Revit
+PERFILES = {
+    "oltp": {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    },
+    "bulk": {
+        "pool_size": int(os.getenv("DB_BULK_POOL_SIZE", "4")),
+        "max_overflow": 0,
+        "pool_timeout": 120,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "insertmanyvalues_page_size": int(os.getenv("DB_BULK_PAGE_SIZE", "5000")),
+    },
+    "lectura": {
+        "pool_size": int(os.getenv("DB_READ_POOL_SIZE", "5")),
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    },
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def crear_engine(perfil: str = "oltp", url: str = None):
+    """
+    Devuelve (y reutiliza) el engine del perfil indicado para ``url``.
+
+    Con SQLite se ignoran los ajustes de pool y todos los perfiles comparten
+    un mismo engine, de modo que una base en memoria es la misma para todos.
+    """
+    url = make_url(url or DATABASE_URL)
+    es_sqlite = url.get_backend_name() == "sqlite"
+    clave = (str(url), "sqlite" if es_sqlite else perfil)
+
+    with _engines_lock:
+        if clave in _engines:
+            return _engines[clave]
+
+        if es_sqlite:
+            opciones = {"connect_args": {"check_same_thread": False}}
+            if url.database in (None, "", ":memory:"):
+                opciones["poolclass"] = StaticPool
+        else:
+            opciones = dict(PERFILES[perfil])
+            opciones["poolclass"] = type(
+                f"PoolMedido_{perfil}", (PoolMedido,),
+                {"metricas": MetricasPool(perfil, opciones["max_overflow"])},
+            )
+            if perfil == "bulk" and url.get_backend_name() == "mssql" and url.get_driver_name() == "pyodbc":
+                opciones["fast_executemany"] = True
+
+        _engines[clave] = create_engine(url, **opciones)
+        return _engines[clave]
+
+
+def metricas_pools():
+    """Métricas de cada engine creado por la fábrica."""
+    return [
+        engine.pool.metricas.como_dict(engine.pool)
+        for engine in _engines.values()
+        if isinstance(engine.pool, PoolMedido)
+    ]
+
+
+engine = crear_engine("oltp")
+engine_bulk = crear_engine("bulk")
+engine_lectura = crear_engine("lectura")
 
-engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionBulk = sessionmaker(autocommit=False, autoflush=False, bind=engine_bulk)
+SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
 
 Base = declarative_base()
 
+# Pool acotado de hilos para el trabajo bloqueante de BD desde rutas async:
+# una sincronización grande ocupa un hilo, nunca el event loop. Lo crea
+# ``iniciar_executor`` (el lifespan de la app, o el primer uso) y lo cierra
+# ``detener_executor``, de modo que un nuevo arranque tiene uno nuevo.
+DB_THREADS = int(os.getenv("DB_THREADS", "8"))
+db_executor = None
+_executor_lock = threading.Lock()
+
+
+def iniciar_executor() -> ThreadPoolExecutor:
+    """Devuelve el executor de BD, creándolo si no hay uno activo."""
+    global db_executor
+    with _executor_lock:
+        if db_executor is None:
+            db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+        return db_executor
+
+
+def detener_executor(wait: bool = True):
+    """Cierra el executor actual; el siguiente uso creará otro."""
+    global db_executor
+    with _executor_lock:
+        executor, db_executor = db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def ejecutar_en_hilo(func, *args, **kwargs):
+    """
+    Ejecuta ``func`` (bloqueante) en ``db_executor`` y espera su resultado sin
+    bloquear el event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(iniciar_executor(), functools.partial(func, *args, **kwargs))
+
 # Dependencia para usar en los endpoints
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_db_bulk():
+    db = SessionBulk()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_db_lectura():
+    db = SessionLectura()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,224 @@
+import asyncio
+import contextlib
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from app import crud, database, models
+from app.ws_manager import manager
+
+
+def tema_proyecto(proyecto_id: int) -> str:
+    return f"proyecto:{proyecto_id}"
+
+
+def _version_actual():
+    db = database.SessionLectura()
+    try:
+        return crud.version_actual(db)
+    finally:
+        db.close()
+
+
+def _leer_cambios(desde: int, proyectos: list, hasta: int = None):
+    db = database.SessionLectura()
+    try:
+        return crud.exportar_cambios(db, desde, models.Proyecto.id.in_(proyectos), hasta)
+    finally:
+        db.close()
+
+
+def _purgar_lapidas(propietario: str, dias: int, intervalo: float):
+    """Purga si este worker obtiene el bloqueo ``purga_lapidas`` (caduca con el intervalo)."""
+    db = database.SessionBulk()
+    try:
+        if not crud.adquirir_bloqueo(db, "purga_lapidas", propietario, ttl=intervalo):
+            return None
+        return crud.purgar_lapidas(db, datetime.utcnow() - timedelta(days=dias))
+    finally:
+        db.close()
+
+
+def _agrupar(lote: dict, reanudacion: bool = False):
+    """Divide el resultado de ``exportar_cambios`` en un evento por proyecto."""
+    eventos = defaultdict(lambda: {"cambios": {}, "eliminados": []})
+    for tabla, filas in lote["cambios"].items():
+        for fila in filas:
+            proyecto_id = fila["id"] if tabla == "proyectos" else fila["proyecto_id"]
+            eventos[proyecto_id]["cambios"].setdefault(tabla, []).append(fila)
+    for eliminado in lote["eliminados"]:
+        eventos[eliminado["proyecto_id"]]["eliminados"].append(eliminado)
+
+    for proyecto_id, contenido in eventos.items():
+        evento = {"tipo": "cambios", "proyecto_id": proyecto_id,
+                  "desde": lote["desde"], "version": lote["token"], **contenido}
+        if reanudacion:
+            evento["reanudacion"] = True
+        yield proyecto_id, evento
+
+
+# ======================================================
+# 📡 Feed de cambios por proyecto (WebSocket)
+# ======================================================
+class FeedCambios:
+    """
+    Publica por WebSocket los cambios confirmados de cada proyecto.
+
+    Tras cada commit de una sincronización o borrado, ``notificar`` despierta
+    al bucle, que lee una sola vez lo cambiado desde su cursor (filas con
+    versión en ``(cursor, actual]`` y lápidas, solo de proyectos con
+    suscriptores) y envía a cada tema ``proyecto:<id>`` únicamente su parte.
+    Además sondea la versión cada ``intervalo_sondeo`` segundos para ver
+    commits de otros workers.
+
+    Un cliente que se reconecta indica la última ``version`` recibida y
+    recibe lo ocurrido desde entonces hasta el cursor; a partir de ahí le
+    llegan los eventos en vivo, sin huecos ni descarga completa. Quien
+    suscribe y reanuda lo hace con ``reparto`` tomado, el mismo lock bajo el
+    que se avanza el cursor y se reparten los eventos en vivo: la
+    reanudación queda encolada antes que cualquier evento posterior y no se
+    repite nada.
+
+    Las lápidas solo hacen falta para esas reanudaciones: cada
+    ``intervalo_purga`` segundos se purgan las de más de
+    ``retencion_lapidas_dias`` días (0 lo desactiva). Quien reanude desde
+    antes recibe ``resync_requerido`` y debe descargar de nuevo.
+    """
+
+    def __init__(self, intervalo_sondeo: float = 2.0, retencion_lapidas_dias: int = 30,
+                 intervalo_purga: float = 3600):
+        self.intervalo_sondeo = intervalo_sondeo
+        self.retencion_lapidas_dias = retencion_lapidas_dias
+        self.intervalo_purga = intervalo_purga
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._proxima_purga = 0.0
+        self.cursor = None
+        self._loop = None
+        self._despertar = None
+        self._tarea = None
+        self.reparto = asyncio.Lock()
+
+    async def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        self._despertar = asyncio.Event()
+        self.reparto = asyncio.Lock()
+        self.cursor = await database.ejecutar_en_hilo(_version_actual)
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._tarea
+            self._tarea = None
+
+    def notificar(self):
+        """Avisa de un commit con cambios (seguro desde cualquier hilo)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._despertar.set)
+
+    # --------------------------------------------------
+    # Suscripciones
+    # --------------------------------------------------
+    def suscribir(self, websocket, proyectos: list) -> int:
+        """
+        Suscribe la conexión y devuelve el cursor actual: los eventos en
+        vivo cubrirán lo posterior a él. Llamar con ``reparto`` tomado si se
+        va a reanudar hasta ese cursor.
+        """
+        for proyecto_id in proyectos:
+            manager.suscribir(websocket, tema_proyecto(proyecto_id))
+        return self.cursor
+
+    def cancelar(self, websocket, proyectos: list):
+        for proyecto_id in proyectos:
+            manager.cancelar(websocket, tema_proyecto(proyecto_id))
+
+    async def reanudar(self, proyectos: list, desde: int, hasta: int) -> list:
+        """Eventos con lo ocurrido en ``(desde, hasta]`` para los proyectos."""
+        if not proyectos or desde >= hasta:
+            return []
+        lote = await database.ejecutar_en_hilo(_leer_cambios, desde, proyectos, hasta)
+        return [evento for _, evento in _agrupar(lote, reanudacion=True)]
+
+    # --------------------------------------------------
+    # Publicación
+    # --------------------------------------------------
+    def _proyectos_suscritos(self) -> set:
+        return {
+            int(tema.split(":", 1)[1])
+            for tema in manager.temas_activos()
+            if tema.startswith("proyecto:")
+        }
+
+    async def _bucle(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._despertar.wait(), self.intervalo_sondeo)
+            except asyncio.TimeoutError:
+                pass
+            self._despertar.clear()
+            try:
+                await self._publicar_pendientes()
+            except Exception as e:
+                print(f"⚠️ Error publicando cambios: {e}")
+            if self.retencion_lapidas_dias > 0 and time.monotonic() >= self._proxima_purga:
+                self._proxima_purga = time.monotonic() + self.intervalo_purga
+                try:
+                    resultado = await database.ejecutar_en_hilo(
+                        _purgar_lapidas, self.id, self.retencion_lapidas_dias, self.intervalo_purga
+                    )
+                    if resultado and resultado["purgadas"]:
+                        print(f"🪦 Lápidas purgadas: {resultado}")
+                except Exception as e:
+                    print(f"⚠️ Error purgando lápidas: {e}")
+
+    async def _publicar_pendientes(self):
+        desde = self.cursor
+        hasta = await database.ejecutar_en_hilo(_version_actual)
+        if hasta <= desde:
+            return
+
+        lotes, leidos = [], set()
+        # Repite para los proyectos que se suscriban mientras se lee; la
+        # comprobación final se hace ya con ``reparto`` tomado
+        while True:
+            await self.reparto.acquire()
+            pendientes = self._proyectos_suscritos() - leidos
+            if not pendientes:
+                break
+            self.reparto.release()
+            try:
+                lotes.append(await database.ejecutar_en_hilo(_leer_cambios, desde, sorted(pendientes), hasta))
+            except crud.VersionPurgada as e:
+                # El feed se quedó más atrás que la retención: que los clientes rehagan su copia
+                self.cursor = hasta
+                await asyncio.gather(*[
+                    manager.publicar(tema_proyecto(p), {"tipo": "resync_requerido", "proyectos": [p],
+                                                        "minimo": e.minimo})
+                    for p in self._proyectos_suscritos()
+                ])
+                return
+            leidos |= pendientes
+
+        # Cursor y reparto bajo ``reparto``: una suscripción no puede colarse
+        # entre ambos (recibiría en vivo lo que también reanuda) ni reanudar
+        # mientras tanto (sus eventos en vivo llegarían antes que lo anterior)
+        try:
+            self.cursor = hasta
+            for lote in lotes:
+                for proyecto_id, evento in _agrupar(lote):
+                    await manager.publicar(tema_proyecto(proyecto_id), evento)
+        finally:
+            self.reparto.release()
+
+
+# Instancia global del feed
+feed = FeedCambios(
+    intervalo_sondeo=float(os.getenv("FEED_SONDEO", "2")),
+    retencion_lapidas_dias=int(os.getenv("LAPIDAS_RETENCION_DIAS", "30")),
+)
@@ -1,7 +1,35 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app import database, models
-from app.routes import sync
+from app import auditoria, auth, database, routes, scheduler, sync_jobs, tandem_client
+from app.feed_cambios import feed
+
+
+# ==============================================
+# ♻️ Ciclo de vida: trabajadores, auditoría, feed de cambios y scheduler Tandem
+# ==============================================
+TANDEM_SYNC = os.getenv("TANDEM_SYNC", "0") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    auth.cargar_claves()
+    database.iniciar_executor()
+    auditoria.escritor.iniciar()
+    sync_jobs.cola.iniciar(asyncio.get_running_loop())
+    await feed.iniciar()
+    if TANDEM_SYNC:
+        scheduler.start_scheduler()
+    yield
+    await scheduler.planificador.detener()
+    sync_jobs.cola.detener(timeout=30)
+    await feed.detener()
+    database.detener_executor()
+    auditoria.escritor.detener(timeout=30)  # tras los trabajos y peticiones que aún auditan
+    await tandem_client.cliente.cerrar()
+
 
 # ==============================================
 # 🔧 Inicialización de la aplicación
@@ -9,7 +37,8 @@ from app.routes import sync
 app = FastAPI(
     title="Revit ↔ SQL Sync API",
     description="Sincroniza proyectos, usuarios y elementos desde Revit hacia SQL Server.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # ==============================================
@@ -24,14 +53,16 @@ app.add_middleware(
 )
 
 # ==============================================
-# 🧩 Crear tablas automáticamente si no existen
+# 🧩 Esquema de base de datos
 # ==============================================
-models.Base.metadata.create_all(bind=database.engine)
+# Las tablas e índices se gestionan con Alembic (alembic/versions):
+#     alembic upgrade head
+# En una base creada antes con create_all: alembic stamp 0001 && alembic upgrade head
 
 # ==============================================
 # 📦 Registrar rutas
 # ==============================================
-app.include_router(sync.router)
+app.include_router(routes.router)
 
 # ==============================================
 # 🩵 Endpoint raíz de prueba
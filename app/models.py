@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, NVARCHAR
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Index, NVARCHAR, Text, event, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -27,14 +27,15 @@ class Proyecto(Base):
     __tablename__ = "proyectos"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, nullable=False)
+    nombre = Column(String(255), nullable=False, index=True)
     descripcion = Column(String, nullable=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)  # 🔗 relación con usuarios
     horas = Column(Float, default=0.0)
     fuente = Column(String, nullable=True)
-    tandem_id = Column(String, nullable=True)
+    tandem_id = Column(String(255), nullable=True, index=True)
     uuid = Column(String, nullable=True)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    version = Column(BigInteger, nullable=True, index=True)  # secuencia del último cambio
 
     # Relaciones
     usuario_relacion = relationship("Usuario", back_populates="proyectos")
@@ -49,10 +50,14 @@ class Categoria(Base):
     __tablename__ = "categorias"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, nullable=False)
+    nombre = Column(String(255), nullable=False, index=True)
     omniclass = Column(String, nullable=True)
+    omniclass_codigo = Column(String(100), nullable=True, index=True)  # código normalizado (23-13-11)
     usuario = Column(String, nullable=True)
-    proyecto_id = Column(Integer, ForeignKey("proyectos.id"), nullable=False)
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id"), nullable=False, index=True)
+    hash_contenido = Column(String(64), nullable=True, index=True)  # huella de nombre/omniclass/parámetros
+    hash_subarbol = Column(String(64), nullable=True, index=True)  # huella del nodo y sus descendientes
+    version = Column(BigInteger, nullable=True, index=True)  # secuencia del último cambio
 
     # Relaciones
     proyecto = relationship("Proyecto", back_populates="categorias")
@@ -66,11 +71,16 @@ class Familia(Base):
     __tablename__ = "familias"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, nullable=False)
-    omniclass = Column(String, nullable=True)
+    nombre = Column(String(255), nullable=False, index=True)
+    omniclass = Column(String(255), nullable=True, index=True)
+    omniclass_codigo = Column(String(100), nullable=True, index=True)  # código normalizado (23-13-11)
     parametros = Column(NVARCHAR, nullable=True)
-    categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
-    revit_id = Column(Integer, nullable=True)  # 👈 agregado
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False, index=True)
+    revit_id = Column(Integer, nullable=True, index=True)  # 👈 agregado
+    hash_contenido = Column(String(64), nullable=True, index=True)  # huella de nombre/omniclass/parámetros
+    hash_subarbol = Column(String(64), nullable=True, index=True)  # huella del nodo y sus descendientes
+    version = Column(BigInteger, nullable=True, index=True)  # secuencia del último cambio
+
     # Relaciones
     categoria = relationship("Categoria", back_populates="familias")
     tipos_familia = relationship("TipoFamilia", back_populates="familia", cascade="all, delete-orphan")
@@ -83,11 +93,15 @@ class TipoFamilia(Base):
     __tablename__ = "tipos_familia"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, nullable=False)
-    omniclass = Column(String, nullable=True)
+    nombre = Column(String(255), nullable=False, index=True)
+    omniclass = Column(String(255), nullable=True, index=True)
+    omniclass_codigo = Column(String(100), nullable=True, index=True)  # código normalizado (23-13-11)
     parametros = Column(NVARCHAR, nullable=True)
-    familia_id = Column(Integer, ForeignKey("familias.id"), nullable=False)
-    revit_id = Column(Integer, nullable=True)  # 👈 agregado
+    familia_id = Column(Integer, ForeignKey("familias.id"), nullable=False, index=True)
+    revit_id = Column(Integer, nullable=True, index=True)  # 👈 agregado
+    hash_contenido = Column(String(64), nullable=True, index=True)  # huella de nombre/omniclass/parámetros
+    hash_subarbol = Column(String(64), nullable=True, index=True)  # huella del nodo y sus descendientes
+    version = Column(BigInteger, nullable=True, index=True)  # secuencia del último cambio
 
 
     # Relaciones
@@ -102,22 +116,112 @@ class Elemento(Base):
     __tablename__ = "elementos"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, nullable=False)
-    omniclass = Column(String, nullable=True)
+    nombre = Column(String(255), nullable=False, index=True)
+    omniclass = Column(String(255), nullable=True, index=True)
+    omniclass_codigo = Column(String(100), nullable=True, index=True)  # código normalizado (23-13-11)
     parametros = Column(NVARCHAR, nullable=True)
     usuario = Column(String, nullable=True)
-    fecha_modificacion = Column(DateTime, default=datetime.utcnow)
-    tipo_familia_id = Column(Integer, ForeignKey("tipos_familia.id"), nullable=False)
-    revit_id = Column(Integer, nullable=True)  # 👈 agregado
+    fecha_modificacion = Column(DateTime, default=datetime.utcnow, index=True)
+    tipo_familia_id = Column(Integer, ForeignKey("tipos_familia.id"), nullable=False, index=True)
+    revit_id = Column(Integer, nullable=True, index=True)  # 👈 agregado
+    hash_contenido = Column(String(64), nullable=True, index=True)  # huella de nombre/omniclass/parámetros
+    version = Column(BigInteger, nullable=True, index=True)  # secuencia del último cambio
     # Relaciones
     tipo_familia = relationship("TipoFamilia", back_populates="elementos")
 
 
+# =========================
+#  TABLA: PARÁMETROS (nombre/valor indexados)
+# =========================
+class ParametroValor(Base):
+    """
+    Un parámetro de Revit de una familia, tipo o elemento, extraído del blob
+    ``parametros`` durante la sincronización (el blob se conserva tal cual).
+    ``valor_numero`` se rellena cuando el valor es numérico; ``valor_texto``
+    guarda hasta 255 caracteres del valor.
+    """
+    __tablename__ = "parametros_valores"
+    __table_args__ = (
+        Index("ix_parametros_valores_registro", "entidad", "registro_id"),
+        Index("ix_parametros_valores_texto", "entidad", "nombre", "valor_texto", "proyecto_id", "registro_id"),
+        Index("ix_parametros_valores_numero", "entidad", "nombre", "valor_numero", "proyecto_id", "registro_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entidad = Column(String(20), nullable=False)  # familias | tipos_familia | elementos
+    registro_id = Column(Integer, nullable=False)
+    proyecto_id = Column(Integer, nullable=False)
+    nombre = Column(String(255), nullable=False)
+    valor_texto = Column(String(255), nullable=True)
+    valor_numero = Column(Float, nullable=True)
+
+
+# =========================
+#  TABLA: CONTEOS OMNICLASS (ruta materializada)
+# =========================
+class ConteoOmniclass(Base):
+    """
+    Un nodo del árbol OmniClass de un proyecto. ``codigo`` es la ruta
+    normalizada (``23-13-11``) y los contadores incluyen todo lo clasificado
+    en el nodo o por debajo de él. Cada cambio de la jerarquía le suma o
+    resta lo que cambió por código.
+    """
+    __tablename__ = "omniclass_conteos"
+
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id"), primary_key=True)
+    codigo = Column(String(100), primary_key=True)
+    padre = Column(String(100), nullable=True)
+    nivel = Column(Integer, nullable=False)
+    categorias = Column(Integer, nullable=False, default=0)
+    familias = Column(Integer, nullable=False, default=0)
+    tipos_familia = Column(Integer, nullable=False, default=0)
+    elementos = Column(Integer, nullable=False, default=0)
+
+
+# =========================
+#  TABLAS DE RESUMEN (se mantienen en la misma transacción que los cambios)
+# =========================
+class ResumenFamilia(Base):
+    __tablename__ = "resumen_familias"
+
+    familia_id = Column(Integer, primary_key=True)
+    proyecto_id = Column(Integer, nullable=False, index=True)
+    categoria_id = Column(Integer, nullable=False, index=True)
+    tipos_familia = Column(Integer, nullable=False, default=0)
+    elementos = Column(Integer, nullable=False, default=0)
+    ultima_modificacion = Column(DateTime, nullable=True)  # la más reciente de sus elementos
+
+
+class ResumenProyecto(Base):
+    __tablename__ = "resumen_proyectos"
+
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id"), primary_key=True)
+    categorias = Column(Integer, nullable=False, default=0)
+    familias = Column(Integer, nullable=False, default=0)
+    tipos_familia = Column(Integer, nullable=False, default=0)
+    elementos = Column(Integer, nullable=False, default=0)
+    usuarios = Column(Integer, nullable=False, default=0)
+    horas = Column(Float, nullable=False, default=0.0)  # suma de proyecto_usuarios.horas
+    ultima_modificacion = Column(DateTime, nullable=True)
+
+
+class ResumenUsuario(Base):
+    __tablename__ = "resumen_usuarios"
+
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), primary_key=True)
+    proyectos = Column(Integer, nullable=False, default=0)
+    horas = Column(Float, nullable=False, default=0.0)
+    ultima_actividad = Column(DateTime, nullable=True)
+
+
 # =========================
 #  TABLA: PROYECTO_USUARIOS
 # =========================
 class ProyectoUsuario(Base):
     __tablename__ = "proyecto_usuarios"
+    __table_args__ = (
+        Index("ix_proyecto_usuarios_proyecto_usuario", "proyecto_id", "usuario_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     proyecto_id = Column(Integer, ForeignKey("proyectos.id"), nullable=False)
@@ -132,6 +236,10 @@ class ProyectoUsuario(Base):
 
 class AuditoriaSync(Base):
     __tablename__ = "auditoria_sync"
+    __table_args__ = (
+        Index("ix_auditoria_sync_proyecto_fecha", "proyecto", "fecha_hora"),
+        Index("ix_auditoria_sync_entidad_fecha", "entidad", "fecha_hora"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario = Column(String(255))
@@ -139,5 +247,89 @@ class AuditoriaSync(Base):
     entidad = Column(String(100))
     revit_id = Column(Integer, nullable=True)
     accion = Column(String(50))
-    fecha_hora = Column(DateTime, server_default=func.now())
+    fecha_hora = Column(DateTime, server_default=func.now(), index=True)  # momento del evento
     detalle = Column(Text)
+
+
+# =========================
+#  TABLA: ARCHIVO DE AUDITORÍA (filas antiguas)
+# =========================
+class AuditoriaSyncArchivo(Base):
+    __tablename__ = "auditoria_sync_archivo"
+    __table_args__ = (
+        Index("ix_auditoria_sync_archivo_proyecto_fecha", "proyecto", "fecha_hora"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # mismo id que en auditoria_sync
+    usuario = Column(String(255))
+    proyecto = Column(String(255))
+    entidad = Column(String(100))
+    revit_id = Column(Integer, nullable=True)
+    accion = Column(String(50))
+    fecha_hora = Column(DateTime, index=True)
+    detalle = Column(Text)
+
+
+# =========================
+#  TABLA: CONTADOR DE CAMBIOS
+# =========================
+class ContadorCambios(Base):
+    __tablename__ = "contador_cambios"
+
+    id = Column(Integer, primary_key=True)
+    valor = Column(BigInteger, nullable=False, default=0)
+    # Menor ``since`` que aún se puede servir: las lápidas anteriores se purgaron
+    minimo = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+@event.listens_for(ContadorCambios.__table__, "after_create")
+def _sembrar_contador(tabla, conexion, **kwargs):
+    # La fila única se crea con la tabla (como en la migración 0002), nunca al primer uso
+    conexion.execute(tabla.insert().values(id=1, valor=0, minimo=0))
+
+
+# =========================
+#  TABLA: ELIMINACIONES (lápidas)
+# =========================
+class Eliminacion(Base):
+    __tablename__ = "eliminaciones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entidad = Column(String(50), nullable=False)
+    registro_id = Column(Integer, nullable=False)
+    revit_id = Column(Integer, nullable=True)
+    proyecto_id = Column(Integer, nullable=True, index=True)
+    version = Column(BigInteger, nullable=False, index=True)
+    fecha = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# =========================
+#  TABLA: EJECUCIONES DE SYNC TANDEM
+# =========================
+class EjecucionSyncTandem(Base):
+    __tablename__ = "ejecuciones_sync_tandem"
+
+    id = Column(Integer, primary_key=True, index=True)
+    inicio = Column(DateTime, nullable=False, index=True)
+    fin = Column(DateTime, nullable=True)
+    duracion = Column(Float, nullable=True)  # segundos
+    estado = Column(String(20), nullable=False)  # completado | error
+    leidos = Column(Integer, default=0)
+    insertados = Column(Integer, default=0)
+    actualizados = Column(Integer, default=0)
+    sin_cambios = Column(Integer, default=0)
+    marca_agua = Column(String(64), nullable=True)  # última fecha de modificación vista en Tandem
+    error = Column(Text, nullable=True)
+    ejecutor = Column(String(100), nullable=True)  # worker que la ejecutó
+
+
+# =========================
+#  TABLA: BLOQUEOS DEL SCHEDULER (liderazgo)
+# =========================
+class BloqueoScheduler(Base):
+    __tablename__ = "bloqueos_scheduler"
+
+    nombre = Column(String(100), primary_key=True)
+    propietario = Column(String(100), nullable=False)
+    expira = Column(DateTime, nullable=False)
+    adquirido = Column(DateTime, nullable=False)
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import datetime, timedelta
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app import crud, schemas, database
+from app import auditoria, auth, crud, schemas, database, scheduler, sync_jobs
+from app.feed_cambios import feed
+from app.ws_manager import manager
+import json
 import traceback
 
-router = APIRouter(tags=["Sincronización"], prefix="/sync")
+# Toda ruta (HTTP y WebSocket) identifica al cliente; ver auth.requerir_cliente
+router = APIRouter(tags=["Sincronización"], prefix="/sync", dependencies=[Depends(auth.requerir_cliente)])
 
 
 # =========================
@@ -17,68 +25,616 @@ def get_db():
         db.close()
 
 
+# =========================
+#  INGESTA NDJSON
+# =========================
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson")
+TAMANO_BLOQUE_NDJSON = 500
+
+
+def _decodificar_linea(numero: int, linea):
+    try:
+        return json.loads(linea)
+    except ValueError as e:
+        raise ValueError(f"Línea {numero}: JSON no válido ({e})")
+
+
+async def _lineas_ndjson(request: Request):
+    """
+    Lee el cuerpo por fragmentos y entrega cada línea no vacía ya decodificada,
+    junto con su número de línea.
+
+    Cada fragmento se añade a un ``bytearray`` y los saltos de línea se
+    buscan solo en lo recién llegado: una línea larga repartida en muchos
+    fragmentos no se vuelve a copiar ni a recorrer entera con cada uno.
+    """
+    buffer = bytearray()
+    numero = 0
+    async for fragmento in request.stream():
+        buscar_desde = len(buffer)  # lo que ya había no tiene saltos de línea
+        buffer += fragmento
+        inicio = 0
+        fin = buffer.find(b"\n", buscar_desde)
+        while fin >= 0:
+            numero += 1
+            linea = buffer[inicio:fin]
+            if linea.strip():
+                yield numero, _decodificar_linea(numero, linea)
+            inicio = fin + 1
+            fin = buffer.find(b"\n", inicio)
+        del buffer[:inicio]
+    if buffer.strip():
+        yield numero + 1, _decodificar_linea(numero + 1, buffer)
+
+
+async def _sincronizar_ndjson(request: Request, db: Session):
+    """
+    La primera línea es la cabecera del proyecto (``ProyectoSyncCabecera``) y
+    cada línea siguiente un ``NodoSync``; los padres deben llegar antes que
+    sus hijos.
+
+    Mientras llega el cuerpo, los nodos solo se validan y se guardan en un
+    archivo temporal (por bloques de ``TAMANO_BLOQUE_NDJSON``, en
+    ``database.db_executor``); la BD no se toca hasta tener el cuerpo
+    completo, así que un cliente lento no retiene ninguna transacción.
+
+    Las huellas de contenido y de subárbol se guardan igual que con JSON,
+    así que una sincronización posterior en modo reconciliar poda lo que no
+    cambió.
+    """
+    ingesta = None
+    numero = 0
+    bloque = []
+
+    def agregar_bloque(nodos):
+        for numero_nodo, nodo in nodos:
+            try:
+                ingesta.agregar(nodo)
+            except Exception as e:
+                raise Exception(f"Línea {numero_nodo}: {e}")
+
+    try:
+        async for numero, data in _lineas_ndjson(request):
+            if ingesta is None:
+                ingesta = crud.IngestaNDJSON(db, schemas.ProyectoSyncCabecera(**data))
+                continue
+            bloque.append((numero, schemas.NodoSync(**data)))
+            if len(bloque) >= TAMANO_BLOQUE_NDJSON:
+                await database.ejecutar_en_hilo(agregar_bloque, bloque)
+                bloque = []
+        if ingesta is None:
+            raise ValueError("El cuerpo NDJSON está vacío")
+        await database.ejecutar_en_hilo(agregar_bloque, bloque)
+    except Exception as e:
+        if ingesta is not None:
+            ingesta.descartar()
+        mensaje = str(e)
+        raise Exception(mensaje if mensaje.startswith("Línea ") else f"Línea {numero}: {mensaje}")
+
+    # Cuerpo completo y validado: ahora sí, una transacción para escribirlo
+    return await database.ejecutar_en_hilo(ingesta.cerrar)
+
+
 # =========================
 #  ENDPOINT PRINCIPAL
 # =========================
 @router.post("/revit/")
-async def sync_desde_revit(request: Request, db: Session = Depends(get_db)):
+async def sync_desde_revit(request: Request, esperar: bool = False, db: Session = Depends(database.get_db_bulk)):
+    """
+    Los cuerpos JSON se encolan y se responde al instante con el ID del
+    trabajo (202), o 429 si la cola del proyecto está llena;
+    ``?esperar=true`` conserva la sincronización en línea.
+    Los cuerpos NDJSON siempre se procesan en línea mientras se leen.
+    """
     try:
-        # Recibir JSON
-        data = await request.json()
-        print("📥 JSON recibido:", data)
+        if request.headers.get("content-type", "").split(";")[0].strip() in TIPOS_NDJSON:
+            # Ingesta por líneas en lotes acotados
+            resultado = await _sincronizar_ndjson(request, db)
+        else:
+            # Recibir JSON
+            data = await request.json()
+            print(f"📥 JSON recibido: proyecto '{data.get('nombre')}' ({len(data.get('categorias', []))} categorías)")
+
+            # Validar estructura Pydantic (en un hilo: con modelos grandes es costoso)
+            proyecto = await database.ejecutar_en_hilo(schemas.ProyectoSync, **data)
 
-        # Validar estructura Pydantic
-        proyecto = schemas.ProyectoSync(**data)
+            if not esperar:
+                trabajo = sync_jobs.cola.encolar(proyecto)
+                print(f"🕓 Sincronización encolada: {trabajo.id}")
+                return JSONResponse(
+                    status_code=202,
+                    content={"status": "en_cola", "trabajo_id": trabajo.id, "estado_url": f"/sync/jobs/{trabajo.id}"},
+                )
 
-        # Procesar sincronización
-        resultado = crud.sincronizar_desde_revit(db, proyecto)
+            # Procesar sincronización (fuera del event loop)
+            resultado = await database.ejecutar_en_hilo(crud.sincronizar_desde_revit, db, proyecto)
 
+        feed.notificar()
+        auditoria.escritor.registrar_sincronizacion(resultado)
         print("✅ Sincronización completada:", resultado)
         return {"status": "ok", "detalle": resultado}
 
+    except sync_jobs.ColaLlena as e:
+        print(f"🚧 {e}")
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         print(f"[ERROR] {e}")
         traceback.print_exc()
         raise HTTPException(status_code=422, detail=str(e))
 
+# =========================
+#  TRABAJOS DE SINCRONIZACIÓN
+# =========================
+@router.get("/jobs/{trabajo_id}")
+def estado_trabajo(trabajo_id: str):
+    """
+    Estado de un trabajo encolado. Se guarda en memoria del worker que lo
+    encoló: con varios workers de uvicorn, los demás responden 404.
+    """
+    trabajo = sync_jobs.cola.obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado en este worker: {trabajo_id}")
+    return trabajo.como_dict()
+
+
+@router.get("/metricas/bd")
+def metricas_bd():
+    """Tiempo de espera en checkout y saturación de cada pool de conexiones."""
+    return {"status": "ok", "pools": database.metricas_pools()}
+
+
+@router.get("/metricas/auditoria")
+def metricas_auditoria():
+    """Eventos pendientes y escritos por el escritor de auditoría de este worker."""
+    return {"status": "ok", "auditoria": auditoria.escritor.estado()}
+
+
+@router.get("/tandem/ejecuciones")
+def ejecuciones_tandem(
+    limite: int = Query(50, ge=1, le=500),
+    estado: Optional[str] = None,
+    antes_de: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Historial de sincronizaciones Tandem (paginado por ``antes_de`` = id)."""
+    ejecuciones = crud.listar_ejecuciones_tandem(db, limite, estado, antes_de)
+    return {
+        "status": "ok",
+        "ejecuciones": ejecuciones,
+        "siguiente": ejecuciones[-1]["id"] if len(ejecuciones) == limite else None,
+    }
+
+
+@router.get("/tandem/estado")
+def estado_scheduler_tandem(db: Session = Depends(get_db)):
+    """Estado del planificador en este worker y quién tiene el liderazgo."""
+    return {
+        "status": "ok",
+        "planificador": scheduler.planificador.estado(),
+        "lider": crud.obtener_bloqueo(db, scheduler.PlanificadorTandem.nombre_bloqueo),
+    }
+
+
+@router.post("/tandem/ejecutar")
+async def ejecutar_sync_tandem():
+    """
+    Sincroniza ya (o se une a la ejecución en curso) si este worker es el
+    líder. Si no, deja la petición en BD para que el líder la recoja en su
+    próximo latido y responde 202 indicando quién lo es.
+    """
+    planificador = scheduler.planificador
+    if not planificador.es_lider:
+        solicitud = await planificador.solicitar()
+        return JSONResponse(status_code=202, content=jsonable_encoder({
+            "status": "en_cola" if solicitud["nueva"] else "ya_en_cola",
+            "lider": solicitud["lider"],
+            "latido": planificador.latido,
+        }))
+    resultado = await planificador.ejecutar_ahora()
+    if resultado is None:
+        raise HTTPException(status_code=502, detail="La sincronización con Tandem falló; ver /sync/tandem/ejecuciones")
+    return {"status": "ok", "resultado": resultado}
+
+
+@router.websocket("/ws")
+async def eventos_sync(websocket: WebSocket, proyecto: Optional[str] = None):
+    """
+    Canal de eventos (progreso de trabajos de sincronización): los de todos
+    los proyectos o, con ``?proyecto=<nombre>``, solo los de ese proyecto.
+    """
+    await manager.connect(websocket)
+    manager.suscribir(websocket, sync_jobs.tema_trabajos(proyecto))
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+
+
+@router.websocket("/ws/cambios")
+async def feed_de_cambios(websocket: WebSocket):
+    """
+    Feed de cambios por proyecto. Mensajes del cliente:
+
+    - ``{"accion": "suscribir", "proyectos": [1, 2], "desde": <version>}``:
+      ``desde`` (opcional) es la última ``version`` recibida; se reenvía lo
+      ocurrido desde entonces antes de seguir en vivo.
+    - ``{"accion": "cancelar", "proyectos": [2]}``
+    """
+    await manager.connect(websocket)
+    try:
+        while True:
+            try:
+                mensaje = await websocket.receive_json()
+                accion = mensaje.get("accion")
+                proyectos = [int(p) for p in mensaje.get("proyectos", [])]
+                desde = mensaje.get("desde")
+                desde = int(desde) if desde is not None else None
+            except (ValueError, TypeError, AttributeError):
+                await manager.send_personal_message({"tipo": "error", "detalle": "Mensaje no válido"}, websocket)
+                continue
+
+            if accion == "suscribir":
+                # Con el reparto en vivo en pausa: lo reanudado va antes que lo nuevo
+                async with feed.reparto:
+                    version = feed.suscribir(websocket, proyectos)
+                    await manager.send_personal_message(
+                        {"tipo": "suscrito", "proyectos": proyectos, "version": version}, websocket
+                    )
+                    if desde is not None:
+                        try:
+                            eventos = await feed.reanudar(proyectos, desde, version)
+                        except crud.VersionPurgada as e:
+                            eventos = [{"tipo": "resync_requerido", "proyectos": proyectos, "minimo": e.minimo}]
+                        for evento in eventos:
+                            await manager.send_personal_message(evento, websocket)
+            elif accion == "cancelar":
+                feed.cancelar(websocket, proyectos)
+                await manager.send_personal_message({"tipo": "cancelado", "proyectos": proyectos}, websocket)
+            else:
+                await manager.send_personal_message(
+                    {"tipo": "error", "detalle": f"Acción no reconocida: {accion}"}, websocket
+                )
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+
 # =========================================
 # 🔄 SINCRONIZAR DESDE SQL → REVIT
 # =========================================
+def _json_proyectos(db: Session, filtro, despues_de, limite):
+    """
+    Genera el documento ``{"status", "proyectos", "siguiente"}`` proyecto a
+    proyecto con la sesión de lectura de la petición. Se consume durante la
+    respuesta, cuando la dependencia ya la cerró: la sesión vuelve a tomar
+    una conexión al usarse y se cierra aquí al terminar.
+    """
+    try:
+        token = crud.version_actual(db)
+        yield f'{{"status": "ok", "token": {token}, "proyectos": ['
+        enviados, ultimo = 0, None
+        for proyecto in crud.iterar_proyectos(db, filtro, despues_de, limite):
+            yield ("," if enviados else "") + json.dumps(proyecto, ensure_ascii=False)
+            enviados += 1
+            ultimo = proyecto["id"]
+        siguiente = ultimo if limite is not None and enviados == limite else None
+        yield f'], "siguiente": {json.dumps(siguiente)}}}'
+        print(f"✅ {enviados} proyectos enviados desde SQL")
+    except Exception as e:
+        print(f"[ERROR SQL→Revit] {e}")
+        traceback.print_exc()
+        raise
+    finally:
+        db.close()
+
+
 @router.get("/sql/")
-def sync_desde_sql(db: Session = Depends(get_db)):
+def sync_desde_sql(
+    proyecto_id: Optional[int] = None,
+    nombre: Optional[str] = None,
+    uuid: Optional[str] = None,
+    despues_de: Optional[int] = None,
+    limite: Optional[int] = Query(None, ge=1, le=1000),
+    since: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(database.get_db_lectura),
+):
+    """
+    Exporta proyectos filtrados por ``proyecto_id``, ``nombre`` o ``uuid``.
+    Con ``limite`` se pagina por cursor: ``siguiente`` es el valor a pasar en
+    ``despues_de`` para la página siguiente (``null`` en la última).
+    La respuesta se escribe proyecto a proyecto e incluye el ``token`` de la
+    secuencia de cambios.
+
+    Con ``since=<token>`` solo se devuelven los cambios y eliminaciones
+    posteriores a ese token, junto con el nuevo ``token``. Si las lápidas de
+    ese tramo ya se purgaron responde 410: hay que descargar sin ``since``.
+    """
+    filtro = crud.filtro_proyectos(proyecto_id, nombre, uuid)
+    if since is not None:
+        try:
+            delta = crud.exportar_cambios(db, since, filtro)
+            print(f"📤 Cambios desde {since} hasta {delta['token']} enviados a Revit")
+            return {"status": "ok", **delta}
+        except crud.VersionPurgada as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        except Exception as e:
+            print(f"[ERROR SQL→Revit] {e}")
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
+
+    print("📤 Enviando datos de SQL Server a Revit...")
+    return StreamingResponse(
+        _json_proyectos(db, filtro, despues_de, limite), media_type="application/json"
+    )
+
+# =========================================
+# 🔎 BÚSQUEDA DE FAMILIAS, TIPOS Y ELEMENTOS
+# =========================================
+@router.get("/buscar")
+def buscar_entidades(
+    tipo: Literal["familia", "tipo", "elemento"] = "elemento",
+    campos: Optional[str] = Query(None, description="Campos separados por comas (id siempre se incluye)"),
+    proyecto_id: Optional[int] = None,
+    categoria: Optional[str] = None,
+    familia: Optional[str] = None,
+    omniclass: Optional[str] = Query(None, description="Prefijo OmniClass"),
+    nombre: Optional[str] = Query(None, description="Nombre exacto o patrón con *"),
+    revit_id: Optional[int] = None,
+    desde: Optional[int] = Query(None, ge=0, description="Solo lo cambiado después de este token"),
+    modificado_desde: Optional[datetime] = None,
+    filtro: list[str] = Query([], description="Filtros de parámetros, como en /sync/parametros"),
+    despues_de: Optional[int] = None,
+    limite: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(database.get_db_lectura),
+):
+    """
+    Busca familias, tipos o elementos con filtros y devuelve solo los
+    ``campos`` pedidos, p. ej. ``?proyecto_id=1&omniclass=23-13&campos=nombre,revit_id``.
+    Se pagina por cursor: ``siguiente`` es el valor a pasar en ``despues_de``.
+    """
     try:
-        print("📤 Enviando datos de SQL Server a Revit...")
+        resultados = crud.buscar_entidades(
+            db, tipo,
+            campos=[c.strip() for c in campos.split(",") if c.strip()] if campos else None,
+            proyecto_id=proyecto_id, categoria=categoria, familia=familia, omniclass=omniclass,
+            nombre=nombre, revit_id=revit_id, desde=desde, modificado_desde=modificado_desde,
+            parametros=[crud.parsear_filtro_parametro(f) for f in filtro],
+            despues_de=despues_de, limite=limite,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "ok",
+        "resultados": resultados,
+        "siguiente": resultados[-1]["id"] if len(resultados) == limite else None,
+    }
 
-        proyectos = crud.obtener_todos_los_proyectos(db)
-        print(f"✅ {len(proyectos)} proyectos obtenidos desde SQL")
 
-        return {"status": "ok", "proyectos": proyectos}
+# =========================================
+# 🔎 CONSULTA POR PARÁMETROS
+# =========================================
+@router.get("/parametros")
+def buscar_por_parametros(
+    filtro: list[str] = Query(..., description="nombre=valor; también >, >=, <, <= y ^= (empieza por)"),
+    tipo: Literal["familia", "tipo", "elemento"] = "elemento",
+    proyecto_id: Optional[int] = None,
+    despues_de: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    incluir_parametros: bool = False,
+    db: Session = Depends(database.get_db_lectura),
+):
+    """
+    Busca familias, tipos o elementos por sus parámetros de Revit (todos los
+    ``filtro`` deben cumplirse), p. ej. ``?filtro=FireRating=2h``. Se pagina
+    por cursor: ``siguiente`` es el valor a pasar en ``despues_de``.
+    """
+    try:
+        filtros = [crud.parsear_filtro_parametro(f) for f in filtro]
+        resultados = crud.buscar_por_parametros(
+            db, tipo, filtros, proyecto_id, despues_de, limite, incluir_parametros
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "ok",
+        "resultados": resultados,
+        "siguiente": resultados[-1]["id"] if len(resultados) == limite else None,
+    }
 
+
+@router.post("/parametros/reconstruir")
+def reconstruir_parametros(proyecto_id: Optional[int] = None, db: Session = Depends(database.get_db_bulk)):
+    """Regenera el índice de parámetros desde los blobs guardados."""
+    try:
+        total = crud.reconstruir_parametros(db, proyecto_id)
     except Exception as e:
-        print(f"[ERROR SQL→Revit] {e}")
-        traceback.print_exc()
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    print(f"🔁 Índice de parámetros reconstruido: {total} valores")
+    return {"status": "ok", "parametros_indexados": total}
+
+
+# =========================================
+# 🗂️ ÁRBOL OMNICLASS
+# =========================================
+@router.get("/omniclass/{proyecto_id}")
+def arbol_omniclass(
+    proyecto_id: int,
+    prefijo: Optional[str] = Query(None, description="Solo el subárbol de este código, p. ej. 23-13"),
+    db: Session = Depends(database.get_db_lectura),
+):
+    """
+    Clasificación OmniClass del proyecto en árbol, con cuántas categorías,
+    familias, tipos y elementos hay en cada nodo o por debajo de él.
+    """
+    try:
+        arbol = crud.arbol_omniclass(db, proyecto_id, prefijo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "proyecto_id": proyecto_id, "arbol": arbol}
+
+
+@router.post("/omniclass/reconstruir")
+def reconstruir_omniclass(proyecto_id: Optional[int] = None, db: Session = Depends(database.get_db_bulk)):
+    """Recalcula los códigos normalizados y los conteos OmniClass desde la jerarquía guardada."""
+    try:
+        proyectos = crud.reconstruir_omniclass(db, proyecto_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"🔁 Árbol OmniClass reconstruido para {proyectos} proyecto(s)")
+    return {"status": "ok", "proyectos": proyectos}
+
+
+# =========================================
+# 📊 INFORMES (TABLAS DE RESUMEN)
+# =========================================
+@router.get("/resumen/proyectos/{proyecto_id}")
+def resumen_proyecto(proyecto_id: int, familias: bool = False, db: Session = Depends(database.get_db_lectura)):
+    """Totales del proyecto y conteos por categoría (y por familia con ``familias=true``)."""
+    resumen = crud.resumen_proyecto(db, proyecto_id, familias)
+    if resumen is None:
+        raise HTTPException(status_code=404, detail=f"Proyecto no encontrado: {proyecto_id}")
+    return {"status": "ok", "proyecto": resumen}
+
+
+@router.get("/resumen/usuarios")
+def resumen_usuarios(
+    despues_de: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(database.get_db_lectura),
+):
+    """Horas y proyectos por usuario, paginado por cursor (``despues_de``)."""
+    usuarios = crud.resumen_usuarios(db, despues_de=despues_de, limite=limite)
+    return {
+        "status": "ok",
+        "usuarios": usuarios,
+        "siguiente": usuarios[-1]["id"] if len(usuarios) == limite else None,
+    }
+
+
+@router.get("/resumen/usuarios/{usuario_id}")
+def resumen_usuario(usuario_id: int, db: Session = Depends(database.get_db_lectura)):
+    usuarios = crud.resumen_usuarios(db, usuario_id=usuario_id)
+    if not usuarios:
+        raise HTTPException(status_code=404, detail=f"Usuario sin actividad registrada: {usuario_id}")
+    return {"status": "ok", "usuario": usuarios[0]}
+
+
+@router.get("/resumen/verificar")
+def verificar_resumen(proyecto_id: Optional[int] = None, db: Session = Depends(database.get_db_lectura)):
+    """Compara las tablas de resumen con las tablas base; no modifica nada."""
+    return {"status": "ok", **crud.verificar_resumen(db, proyecto_id)}
+
+
+@router.post("/resumen/reconstruir")
+def reconstruir_resumen(proyecto_id: Optional[int] = None, db: Session = Depends(database.get_db_bulk)):
+    """Recalcula las tablas de resumen desde las tablas base."""
+    try:
+        resultado = crud.reconstruir_resumen(db, proyecto_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"🔁 Resúmenes reconstruidos: {resultado}")
+    return {"status": "ok", **resultado}
+
+
+# =========================
+#  AUDITORÍA
+# =========================
+@router.get("/auditoria")
+def listar_auditoria(
+    proyecto: Optional[str] = None,
+    entidad: Optional[str] = None,
+    accion: Optional[str] = None,
+    usuario: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    antes_de: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(database.get_db_lectura),
+):
+    """Eventos de auditoría, del más reciente al más antiguo (paginado por ``antes_de`` = id)."""
+    eventos = crud.listar_auditoria(db, proyecto, entidad, accion, usuario, desde, hasta, antes_de, limite)
+    return {
+        "status": "ok",
+        "eventos": eventos,
+        "siguiente": eventos[-1]["id"] if len(eventos) == limite else None,
+    }
+
+
+@router.post("/auditoria/archivar")
+def archivar_auditoria(
+    dias: int = Query(auditoria.escritor.retencion_dias or 90, ge=0),
+    purgar_archivo_dias: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(database.get_db_bulk),
+):
+    """Archiva ya los eventos de más de ``dias`` días (y purga el archivo si se indica)."""
+    ahora = datetime.now()
+    purgar = ahora - timedelta(days=purgar_archivo_dias) if purgar_archivo_dias is not None else None
+    try:
+        resultado = crud.archivar_auditoria(db, ahora - timedelta(days=dias), purgar)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"🧾 Auditoría archivada: {resultado}")
+    return {"status": "ok", **resultado}
+
+
+@router.post("/lapidas/purgar")
+def purgar_lapidas(
+    dias: int = Query(feed.retencion_lapidas_dias or 30, ge=0),
+    db: Session = Depends(database.get_db_bulk),
+):
+    """Purga ya las lápidas de más de ``dias`` días; un ``since`` anterior recibirá 410."""
+    try:
+        resultado = crud.purgar_lapidas(db, datetime.utcnow() - timedelta(days=dias))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"🪦 Lápidas purgadas: {resultado}")
+    return {"status": "ok", **resultado}
+
 
 @router.post("/revit/ids")
-def actualizar_revit_ids(items: list[schemas.RevitElementoSync], db: Session = Depends(get_db)):
+def actualizar_revit_ids(items: list[schemas.RevitElementoSync], request: Request, db: Session = Depends(get_db)):
     try:
-        for item in items:
-            crud.actualizar_revit_id(db, item)
-        return {"status": "ok", "mensaje": "IDs de Revit actualizados correctamente"}
+        resultado = crud.actualizar_revit_ids(db, items)
+        feed.notificar()
+        auditoria.escritor.registrar(auth.cliente_actual(request).id, None, "RevitId", None,
+                                     "ACTUALIZAR_IDS", resultado)
+        return {"status": "ok", "mensaje": "IDs de Revit actualizados correctamente", **resultado}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/revit/delete")
-def eliminar_desde_revit(data: dict, db: Session = Depends(get_db)):
+def eliminar_desde_revit(data: dict, request: Request, db: Session = Depends(get_db)):
     try:
         revit_id = data.get("revit_id")
         tipo = data.get("tipo")
+        proyecto = data.get("proyecto")
 
-        if not revit_id or not tipo:
-            raise HTTPException(status_code=400, detail="Faltan parámetros (revit_id, tipo)")
+        if not revit_id or not tipo or not proyecto:
+            raise HTTPException(status_code=400, detail="Faltan parámetros (revit_id, tipo, proyecto)")
 
-        crud.eliminar_por_revit_id(db, tipo, revit_id)
+        usuario = data.get("usuario") or auth.cliente_actual(request).id
+        crud.eliminar_por_revit_id(db, tipo, revit_id, usuario, proyecto, auditoria.escritor.registrar_lote)
+        feed.notificar()
 
         return {"status": "ok", "mensaje": f"{tipo} con RevitID {revit_id} eliminado correctamente"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/revit/delete/lote")
+def eliminar_lote_desde_revit(lote: schemas.RevitDeleteLote, request: Request, db: Session = Depends(get_db)):
+    if not lote.proyecto:
+        raise HTTPException(status_code=400, detail="Falta el parámetro proyecto")
+    try:
+        usuario = lote.usuario or auth.cliente_actual(request).id
+        resultado = crud.eliminar_por_revit_ids(db, lote.items, usuario, lote.proyecto,
+                                                auditoria.escritor.registrar_lote)
+        feed.notificar()
+        total = sum(resultado["eliminados"].values())
+        return {"status": "ok", "mensaje": f"{total} entidades eliminadas correctamente", **resultado}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
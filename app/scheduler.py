@@ -1,59 +1,301 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from . import database, tandem_client, crud
-from sqlalchemy.orm import Session
-import httpx
+from .feed_cambios import feed
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+import asyncio
 import os
+import random
+import socket
+import time
+import uuid
 
 # ✅ Cargar variables de entorno para el scheduler también
 load_dotenv()
 
+TANDEM_PROYECTOS_URL = os.getenv("TANDEM_PROYECTOS_URL", "https://api.tandem.autodesk.com/data/v1/projects")
+# Parámetro de consulta con el que Tandem filtra por fecha de modificación
+TANDEM_PARAM_DESDE = os.getenv("TANDEM_PARAM_DESDE", "modifiedSince")
+CAMPOS_MODIFICADO = ("lastModified", "modifiedAt", "updatedAt")
 
-def sync_tandem_task():
-    """Sincroniza automáticamente proyectos desde Autodesk Tandem hacia SQL Server."""
+
+def _fecha(valor):
+    """Fecha ISO 8601 de Tandem como datetime con zona (o None)."""
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def _modificado(proyecto: dict):
+    for campo in CAMPOS_MODIFICADO:
+        fecha = _fecha(proyecto.get(campo))
+        if fecha is not None:
+            return fecha
+    return None
+
+
+def _leer_marca():
+    db = database.SessionBulk()
+    try:
+        return crud.ultima_marca_tandem(db)
+    finally:
+        db.close()
+
+
+def _aplicar(proyectos: list, ejecucion: dict, t0: float):
+    """Upsert de los proyectos y registro de la ejecución en una transacción."""
+    db = database.SessionBulk()
+    try:
+        contadores = crud.aplicar_proyectos_tandem(db, proyectos)
+        crud.registrar_ejecucion_tandem(
+            db, **ejecucion, **contadores, estado="completado", fin=datetime.utcnow(),
+            duracion=round(time.perf_counter() - t0, 3),
+        )
+        db.commit()
+        if contadores["insertados"] or contadores["actualizados"]:
+            feed.notificar()
+        return contadores
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _registrar_error(ejecucion: dict, t0: float, error: str, leidos: int):
+    db = database.SessionBulk()
+    try:
+        crud.registrar_ejecucion_tandem(
+            db, **ejecucion, estado="error", error=error, leidos=leidos, fin=datetime.utcnow(),
+            duracion=round(time.perf_counter() - t0, 3),
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def sync_tandem_task(ejecutor: str = None):
+    """
+    Sincroniza proyectos desde Autodesk Tandem hacia SQL Server.
+
+    Recorre todas las páginas, pero solo trae los proyectos modificados
+    desde la marca de agua de la última ejecución completada; los aplica
+    con un único upsert en bloque y registra duración y contadores.
+    """
     print("🔄 Ejecutando sincronización automática con Tandem...")
+    ejecucion = {"inicio": datetime.utcnow(), "ejecutor": ejecutor}
+    t0 = time.perf_counter()
+    proyectos = []
+
+    try:
+        marca = await database.ejecutar_en_hilo(_leer_marca)
+        desde = _fecha(marca)
+        nueva_marca = desde
+        params = {TANDEM_PARAM_DESDE: marca} if marca else None
 
-    token = tandem_client.get_2legged_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.tandem.autodesk.com/data/v1/projects"
-
-    session: Session = next(databases.get_db())
-
-    try:
-        r = httpx.get(url, headers=headers, timeout=15.0)
-        r.raise_for_status()
-        data = r.json()
-
-        for p in data.get("results", []):
-            nombre = p.get("name")
-            descripcion = p.get("description", "")
-            tandem_id = p.get("id")
-
-            # Si el proyecto no existe, créalo
-            proyecto = session.query(crud.models.Proyecto).filter_by(nombre=nombre).first()
-            if not proyecto:
-                nuevo = crud.models.Proyecto(
-                    nombre=nombre,
-                    descripcion=descripcion,
-                    tandem_id=tandem_id,
-                    fuente="tandem"
-                )
-                session.add(nuevo)
-                session.commit()
-                session.refresh(nuevo)
-                print(f"✅ Proyecto creado: {nombre}")
-            else:
-                print(f"➡ Proyecto ya existente: {nombre}")
+        async for p in tandem_client.cliente.paginar(TANDEM_PROYECTOS_URL, params):
+            modificado = _modificado(p)
+            # Por si la API ignora el filtro: lo ya visto no se vuelve a aplicar
+            if desde is not None and modificado is not None and modificado < desde:
+                continue
+            if modificado is not None and (nueva_marca is None or modificado > nueva_marca):
+                nueva_marca = modificado
+            proyectos.append({
+                "tandem_id": p.get("id"),
+                "nombre": p.get("name"),
+                "descripcion": p.get("description", ""),
+            })
+
+        ejecucion["marca_agua"] = nueva_marca.isoformat() if nueva_marca else marca
+        contadores = await database.ejecutar_en_hilo(_aplicar, proyectos, ejecucion, t0)
+        print(f"✅ Tandem sincronizado: {contadores}")
+        return contadores
 
     except Exception as e:
         print(f"⚠ Error al sincronizar Tandem: {e}")
+        try:
+            await database.ejecutar_en_hilo(_registrar_error, ejecucion, t0, str(e), len(proyectos))
+        except Exception as e2:
+            print(f"⚠ No se pudo registrar la ejecución fallida: {e2}")
+
+
+# ======================================================
+# 🗓️ Planificador con liderazgo, coalescencia e intervalo adaptativo
+# ======================================================
+class PlanificadorTandem:
+    """
+    Programa ``sync_tandem_task`` en un solo worker de todo el despliegue.
+
+    - Liderazgo: cada worker intenta cada ``latido`` segundos tomar/renovar
+      el bloqueo ``nombre_bloqueo`` en BD (lease de ``ttl`` segundos); solo
+      quien lo tiene sincroniza. Si el líder muere, otro lo releva al
+      caducar el lease. Los tiempos del lease son los del servidor de BD.
+    - Peticiones manuales: un worker que no es líder deja la petición en la
+      tabla de bloqueos (``solicitar``) y el líder la recoge en su próximo
+      latido.
+    - Coalescencia: una ejecución pedida mientras hay otra en curso espera
+      el resultado de esa en lugar de lanzar una segunda.
+    - Intervalo adaptativo: se reduce a la mitad si hubo cambios y crece
+      ×1.5 si no (o ×2 tras un error), dentro de [intervalo_min, intervalo_max],
+      con ±``jitter`` aleatorio en cada programación.
+    """
+
+    nombre_bloqueo = "sync_tandem"
+
+    def __init__(self, intervalo_min: float = 60, intervalo_max: float = 1800,
+                 intervalo_inicial: float = 600, jitter: float = 0.1,
+                 latido: float = 30, ttl: float = 90):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.intervalo = intervalo_inicial
+        self.jitter = jitter
+        self.latido = latido
+        self.ttl = ttl
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.es_lider = False
+        self.proxima = None
+        self.ultimo_resultado = None
+        self._scheduler = None
+        self._en_curso = None
+
+    def iniciar(self):
+        if self._scheduler is not None:
+            return
+        self._scheduler = AsyncIOScheduler()
+        self._scheduler.add_job(self._latido, "interval", seconds=self.latido, id="latido_tandem",
+                                next_run_time=datetime.now(), coalesce=True, max_instances=1)
+        self._scheduler.start()
+        # Primera ejecución tras un retardo aleatorio para no coincidir entre workers
+        self._programar(random.uniform(0, self.intervalo_min))
+        print(f"🕒 Scheduler Tandem iniciado ({self.id}).")
+
+    async def detener(self):
+        if self._scheduler is None:
+            return
+        self._scheduler.shutdown(wait=False)
+        self._scheduler = None
+        if self._en_curso is not None and not self._en_curso.done():
+            await asyncio.wait({self._en_curso})
+        if self.es_lider:
+            self.es_lider = False
+            await database.ejecutar_en_hilo(_liberar_liderazgo, self.nombre_bloqueo, self.id)
+
+    def estado(self):
+        return {
+            "worker": self.id,
+            "es_lider": self.es_lider,
+            "en_curso": self._en_curso is not None and not self._en_curso.done(),
+            "intervalo": round(self.intervalo, 1),
+            "proxima": self.proxima.isoformat() if self.proxima else None,
+            "ultimo_resultado": self.ultimo_resultado,
+        }
+
+    async def ejecutar_ahora(self):
+        """Lanza la sincronización o se une a la que ya esté en curso."""
+        return await asyncio.shield(self._lanzar())
+
+    async def solicitar(self) -> dict:
+        """
+        Pide una ejecución al líder a través de la BD; caduca si nadie la
+        recoge en ``ttl`` segundos. Devuelve si la petición es nueva (o se
+        funde con una pendiente) y quién tiene el liderazgo.
+        """
+        return await database.ejecutar_en_hilo(_solicitar_ejecucion, self.nombre_bloqueo, self.id, self.ttl)
+
+    def _lanzar(self):
+        if self._en_curso is None or self._en_curso.done():
+            self._en_curso = asyncio.create_task(sync_tandem_task(ejecutor=self.id))
+        return self._en_curso
+
+    async def _latido(self):
+        try:
+            self.es_lider = await database.ejecutar_en_hilo(
+                _tomar_liderazgo, self.nombre_bloqueo, self.id, self.ttl
+            )
+            # Sin esperar al resultado: el latido no debe retrasar la renovación
+            if self.es_lider and await database.ejecutar_en_hilo(_consumir_solicitud, self.nombre_bloqueo):
+                self._lanzar().add_done_callback(self._anotar_resultado)
+        except Exception as e:
+            self.es_lider = False
+            print(f"⚠ Error renovando el liderazgo del scheduler: {e}")
+
+    def _anotar_resultado(self, tarea):
+        if not tarea.cancelled():
+            self.ultimo_resultado = tarea.result()
+
+    async def _tick(self):
+        try:
+            await self._latido()
+            if self.es_lider:
+                resultado = await self.ejecutar_ahora()
+                self._adaptar(resultado)
+        except Exception as e:
+            print(f"⚠ Error en el scheduler Tandem: {e}")
+        finally:
+            if self._scheduler is not None:
+                self._programar(self.intervalo)
+
+    def _adaptar(self, resultado):
+        self.ultimo_resultado = resultado
+        if resultado is None:
+            factor = 2.0
+        elif resultado["insertados"] or resultado["actualizados"]:
+            factor = 0.5
+        else:
+            factor = 1.5
+        self.intervalo = min(max(self.intervalo * factor, self.intervalo_min), self.intervalo_max)
+
+    def _programar(self, segundos: float):
+        segundos *= 1 + random.uniform(-self.jitter, self.jitter)
+        self.proxima = datetime.now() + timedelta(seconds=segundos)
+        self._scheduler.add_job(self._tick, "date", run_date=self.proxima, id="sync_tandem",
+                                replace_existing=True, coalesce=True, max_instances=1)
+
+
+def _tomar_liderazgo(nombre: str, propietario: str, ttl: float) -> bool:
+    db = database.SessionLocal()
+    try:
+        return crud.adquirir_bloqueo(db, nombre, propietario, ttl)
     finally:
-        session.close()
+        db.close()
+
+
+def _liberar_liderazgo(nombre: str, propietario: str):
+    db = database.SessionLocal()
+    try:
+        crud.liberar_bloqueo(db, nombre, propietario)
+    finally:
+        db.close()
+
+
+def _solicitar_ejecucion(nombre: str, solicitante: str, ttl: float) -> dict:
+    db = database.SessionLocal()
+    try:
+        nueva = crud.solicitar_ejecucion(db, nombre, solicitante, ttl)
+        return {"nueva": nueva, "lider": crud.obtener_bloqueo(db, nombre)}
+    finally:
+        db.close()
+
+
+def _consumir_solicitud(nombre: str) -> bool:
+    db = database.SessionLocal()
+    try:
+        return crud.consumir_solicitud(db, nombre)
+    finally:
+        db.close()
+
+
+planificador = PlanificadorTandem(
+    intervalo_min=float(os.getenv("TANDEM_SYNC_MIN", "60")),
+    intervalo_max=float(os.getenv("TANDEM_SYNC_MAX", "1800")),
+    intervalo_inicial=float(os.getenv("TANDEM_SYNC_INTERVAL", "600")),
+)
 
 
 def start_scheduler():
-    """Inicia el scheduler en segundo plano."""
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(sync_tandem_task, "interval", minutes=10)  # ⏱ cada 10 minutos
-    scheduler.start()
-    print("🕒 Scheduler automático iniciado (cada 10 minutos).")
+    """Inicia el planificador en el event loop en ejecución."""
+    planificador.iniciar()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 
 
@@ -30,6 +30,7 @@ class ElementoBase(BaseModel):
     nombre: str
     omniclass: Optional[str] = None
     parametros: Optional[str] = None
+    revit_id: Optional[int] = None
     usuario: Optional[str] = None
     fecha_modificacion: Optional[datetime] = None
 
@@ -52,6 +53,7 @@ class TipoFamiliaBase(BaseModel):
     nombre: str
     omniclass: Optional[str] = None
     parametros: Optional[str] = None
+    revit_id: Optional[int] = None
 
 
 class TipoFamiliaCreate(TipoFamiliaBase):
@@ -73,6 +75,7 @@ class FamiliaBase(BaseModel):
     nombre: str
     omniclass: Optional[str] = None
     parametros: Optional[str] = None
+    revit_id: Optional[int] = None
 
 
 class FamiliaCreate(FamiliaBase):
@@ -166,6 +169,7 @@ class ProyectoSync(BaseModel):
     horas: float
     usuario: UsuarioBase
     categorias: List[CategoriaCreate]
+    modo: Literal["reemplazar", "reconciliar"] = "reemplazar"
 
     class Config:
         orm_mode = True
@@ -177,4 +181,30 @@ class RevitElementoSync(BaseModel):
 
 class RevitDeleteSync(BaseModel):
     revit_id: int
-    tipo: str
\ No newline at end of file
+    tipo: str
+
+class RevitDeleteLote(BaseModel):
+    usuario: Optional[str] = None
+    proyecto: Optional[str] = None  # nombre del proyecto; obligatorio (400 si falta)
+    items: List[RevitDeleteSync]
+
+# =========================
+#  SCHEMA: SYNC REVIT (NDJSON)
+# =========================
+class ProyectoSyncCabecera(BaseModel):
+    """Primera línea del NDJSON: datos del proyecto sin la jerarquía."""
+    nombre: str
+    horas: float
+    usuario: UsuarioBase
+    modo: Literal["reemplazar"] = "reemplazar"  # la ingesta por líneas solo reemplaza
+
+
+class NodoSync(BaseModel):
+    """Una línea del NDJSON: un nodo de la jerarquía con referencia a su padre."""
+    tipo: Literal["categoria", "familia", "tipo", "elemento"]
+    id: Optional[str] = None      # referencia local para los hijos
+    padre: Optional[str] = None   # id del nodo padre (no aplica a categorías)
+    nombre: str
+    omniclass: Optional[str] = None
+    parametros: Optional[str] = None
+    revit_id: Optional[int] = None
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from app import auditoria, crud, database, schemas
+from app.feed_cambios import feed
+from app.ws_manager import manager
+
+
+# ======================================================
+# 🧾 Trabajo de sincronización
+# ======================================================
+class TrabajoSync:
+    """
+    Estado de una sincronización Revit → SQL encolada.
+    """
+
+    def __init__(self, proyecto_sync: schemas.ProyectoSync):
+        self.id = uuid.uuid4().hex
+        self.proyecto = proyecto_sync.nombre
+        self.proyecto_sync = proyecto_sync
+        self.estado = "en_cola"
+        self.progreso = {}
+        self.resultado = None
+        self.error = None
+        self.fecha_encolado = datetime.now()
+        self.fecha_inicio = None
+        self.fecha_fin = None
+        self._t_inicio = None
+        self.duracion = None
+
+    def como_dict(self):
+        return {
+            "id": self.id,
+            "proyecto": self.proyecto,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "resultado": self.resultado,
+            "error": self.error,
+            "fecha_encolado": self.fecha_encolado.isoformat(),
+            "fecha_inicio": self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            "fecha_fin": self.fecha_fin.isoformat() if self.fecha_fin else None,
+            "duracion": self.duracion,
+        }
+
+
+class ColaLlena(Exception):
+    """La cola de un proyecto ya tiene ``maximo`` trabajos esperando."""
+
+    def __init__(self, proyecto: str, maximo: int):
+        super().__init__(f"Cola de sincronización llena para '{proyecto}' ({maximo} trabajos en espera)")
+        self.proyecto = proyecto
+        self.maximo = maximo
+
+
+# ======================================================
+# 🧵 Cola local (en proceso) con pool de trabajadores
+# ======================================================
+class ColaSyncLocal:
+    """
+    Backend en proceso: un pool de hilos que ejecutan
+    ``crud.sincronizar_desde_revit`` con su propia sesión de BD.
+
+    Cada proyecto tiene su propia cola FIFO; ``_listos`` contiene los
+    proyectos con trabajo pendiente y sin ninguno en curso, cada uno una
+    sola vez. Un trabajador toma un proyecto, ejecuta el primer trabajo de
+    su cola y, si quedan más, lo vuelve a poner al final de ``_listos``. Así
+    los trabajos de un proyecto se aplican en el orden en que llegaron, sin
+    solaparse, y ningún hilo se queda parado esperando a otro proyecto.
+    Cada cola admite como mucho ``max_por_proyecto`` trabajos en espera (0
+    sin límite); más allá, ``encolar`` lanza ``ColaLlena``.
+
+    El progreso se publica con ``ws_manager.manager`` en el event loop que
+    registró ``iniciar``, en los temas ``tema_trabajos()`` (todos los
+    trabajos) y ``tema_trabajos(proyecto)``; nunca a todas las conexiones. Se conservan los últimos ``max_historial``
+    trabajos para consultar su estado.
+
+    Tanto la cola como el estado de los trabajos viven en la memoria del
+    proceso: con varios workers de uvicorn, ``/sync/jobs/{id}`` solo
+    encuentra el trabajo en el worker que lo encoló (en los demás, 404), y
+    un reinicio pierde lo que estaba en cola. Para consultarlo desde
+    cualquier worker hay que fijar la petición al mismo worker o usar
+    ``?esperar=true``.
+    """
+
+    def __init__(self, trabajadores: int = 2, max_historial: int = 1000, max_por_proyecto: int = 20):
+        self.trabajadores = trabajadores
+        self.max_historial = max_historial
+        self.max_por_proyecto = max_por_proyecto
+        self._listos = queue.Queue()
+        self._por_proyecto = {}
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._loop = None
+
+    def iniciar(self, loop: asyncio.AbstractEventLoop = None):
+        """Arranca los hilos trabajadores (idempotente)."""
+        if loop is not None:
+            self._loop = loop
+        with self._lock:
+            if self._hilos:
+                return
+            for i in range(self.trabajadores):
+                hilo = threading.Thread(target=self._trabajador, name=f"sync-worker-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+        print(f"🧵 Cola de sincronización iniciada ({self.trabajadores} trabajadores)")
+
+    def detener(self, timeout: float = None):
+        """Termina los trabajos en curso y detiene los hilos."""
+        with self._lock:
+            hilos, self._hilos = self._hilos, []
+        for _ in hilos:
+            self._listos.put(None)
+        for hilo in hilos:
+            hilo.join(timeout)
+
+    def encolar(self, proyecto_sync: schemas.ProyectoSync) -> TrabajoSync:
+        if self._loop is None:
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        self.iniciar()
+
+        trabajo = TrabajoSync(proyecto_sync)
+        with self._lock:
+            pendientes = self._por_proyecto.get(trabajo.proyecto)
+            if pendientes is not None and 0 < self.max_por_proyecto <= len(pendientes):
+                raise ColaLlena(trabajo.proyecto, self.max_por_proyecto)
+            self._trabajos[trabajo.id] = trabajo
+            while len(self._trabajos) > self.max_historial:
+                self._trabajos.popitem(last=False)
+            if pendientes is None:
+                self._por_proyecto[trabajo.proyecto] = deque([trabajo])
+                self._listos.put(trabajo.proyecto)
+            else:
+                pendientes.append(trabajo)
+        self._publicar(trabajo, "encolado")
+        return trabajo
+
+    def obtener(self, trabajo_id: str):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def _trabajador(self):
+        while True:
+            proyecto = self._listos.get()
+            if proyecto is None:
+                break
+            with self._lock:
+                trabajo = self._por_proyecto[proyecto].popleft()
+            try:
+                self._sincronizar(trabajo)
+            finally:
+                with self._lock:
+                    if self._por_proyecto[proyecto]:
+                        self._listos.put(proyecto)
+                    else:
+                        del self._por_proyecto[proyecto]
+
+    def _sincronizar(self, trabajo: TrabajoSync):
+        trabajo.estado = "en_proceso"
+        trabajo.fecha_inicio = datetime.now()
+        trabajo._t_inicio = time.perf_counter()
+        self._publicar(trabajo, "iniciado")
+
+        def progreso(nivel, contadores):
+            trabajo.progreso[nivel] = contadores
+            self._publicar(trabajo, "progreso", nivel=nivel, contadores=contadores)
+
+        db = database.SessionBulk()
+        try:
+            trabajo.resultado = crud.sincronizar_desde_revit(db, trabajo.proyecto_sync, progreso)
+            trabajo.estado = "completado"
+            feed.notificar()
+            auditoria.escritor.registrar_sincronizacion(trabajo.resultado)
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = "error"
+            print(f"⚠️ Error en trabajo de sincronización {trabajo.id}: {e}")
+        finally:
+            db.close()
+            trabajo.proyecto_sync = None  # liberar el payload
+            trabajo.fecha_fin = datetime.now()
+            trabajo.duracion = round(time.perf_counter() - trabajo._t_inicio, 3)
+            self._publicar(trabajo, trabajo.estado)
+
+    def _publicar(self, trabajo: TrabajoSync, evento: str, **extra):
+        """Envía el evento por WebSocket sin bloquear al trabajador."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        mensaje = {"tipo": "sync_trabajo", "evento": evento, "trabajo_id": trabajo.id,
+                   "proyecto": trabajo.proyecto, "estado": trabajo.estado, **extra}
+        if trabajo.duracion is not None:
+            mensaje["duracion"] = trabajo.duracion
+        asyncio.run_coroutine_threadsafe(_publicar_en_temas(trabajo.proyecto, mensaje), loop)
+
+
+def tema_trabajos(proyecto: str = None) -> str:
+    """Tema de los eventos de trabajos: los de un proyecto (por nombre) o todos."""
+    return f"trabajos:{proyecto}" if proyecto else "trabajos"
+
+
+async def _publicar_en_temas(proyecto: str, mensaje: dict):
+    await manager.publicar(tema_trabajos(), mensaje)
+    await manager.publicar(tema_trabajos(proyecto), mensaje)
+
+
+# Instancia global de la cola
+cola = ColaSyncLocal(
+    trabajadores=int(os.getenv("SYNC_WORKERS", "2")),
+    max_por_proyecto=int(os.getenv("SYNC_MAX_COLA_PROYECTO", "20")),
+)
@@ -1,54 +1,278 @@
+import asyncio
 import os
-import requests
+import random
+import time
+from email.utils import parsedate_to_datetime
+import httpx
 from fastapi import HTTPException
-from dotenv import load_dotenv
-load_dotenv()
+from app.autodesk_auth import proveedor_tokens
 
 
-AUTODESK_AUTH_URL = "https://developer.api.autodesk.com/authentication/v2/token"
+TANDEM_SCOPES = "data:read data:write bucket:create bucket:read"
+TANDEM_API_URL = os.getenv("TANDEM_API_URL", "https://developer.api.autodesk.com/tandem/v1")
 
-CLIENT_ID = os.getenv("AUTODESK_CLIENT_ID")
-CLIENT_SECRET = os.getenv("AUTODESK_CLIENT_SECRETT")
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 en httpx)
+    HTTP2_DISPONIBLE = True
+except ImportError:
+    HTTP2_DISPONIBLE = False
 
 
-def get_2legged_token():
+async def get_2legged_token():
     """
     Obtiene un token 2-legged (client_credentials) de Autodesk APS.
-    Este token se usa para operaciones de servidor a servidor.
+    Este token se usa para operaciones de servidor a servidor; se reutiliza
+    desde la caché compartida de ``autodesk_auth`` mientras siga vigente.
     """
-    if not CLIENT_ID or not CLIENT_SECRET:
+    if not proveedor_tokens.client_id or not proveedor_tokens.client_secret:
         raise HTTPException(status_code=500, detail="CLIENT_ID o CLIENT_SECRET no configurados en el entorno")
 
-    data = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials",
-        "scope": "data:read data:write bucket:create bucket:read"
-    }
+    try:
+        return await proveedor_tokens.token(TANDEM_SCOPES)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ======================================================
+# 🚦 Limitador de tasa (token bucket)
+# ======================================================
+class LimitadorTasa:
+    """
+    Permite ``tasa`` peticiones por segundo con ráfagas de hasta ``rafaga``.
+    ``pausar`` detiene a todos los llamantes (p. ej. tras un 429 con Retry-After).
+    """
 
-    response = requests.post(AUTODESK_AUTH_URL, data=data)
+    def __init__(self, tasa: float, rafaga: int = None):
+        self.tasa = tasa
+        self.rafaga = rafaga or max(int(tasa), 1)
+        self._fichas = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = asyncio.Lock()
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=400, detail=f"Error al obtener token APS: {response.text}")
+    def vincular_loop(self):
+        """Prepara el limitador para un nuevo event loop (el lock es de un solo loop)."""
+        self._lock = asyncio.Lock()
 
-    return response.json().get("access_token")
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    await asyncio.sleep(self._pausa_hasta - ahora)
+                    continue
+                self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                await asyncio.sleep((1 - self._fichas) / self.tasa)
 
-def create_tandem_project(name: str, description: str = ""):
+    def pausar(self, segundos: float):
+        self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+
+# ======================================================
+# 🌐 Cliente Tandem / APS
+# ======================================================
+class TandemClient:
     """
-    Crea un proyecto en Autodesk Tandem usando el token APS.
+    Cliente async para las APIs de Autodesk (Tandem y APS).
+
+    - Un ``httpx.AsyncClient`` de larga vida (pool de conexiones, HTTP/2 si
+      ``h2`` está instalado) por event loop.
+    - Token 2-legged desde ``autodesk_auth.proveedor_tokens``; ante un 401 se
+      invalida y se reintenta una vez. El propio endpoint de tokens se pide
+      con este cliente (``solicitar_token``): toda llamada a Autodesk pasa
+      por el mismo pool, limitador y reintentos.
+    - Reintentos con backoff exponencial y jitter ante errores de red, 429 y
+      5xx transitorios. Solo los métodos idempotentes se reintentan siempre;
+      un POST o PATCH solo si la petición no llegó a enviarse (fallo al
+      conectar) o si el servidor la rechazó con 429/503 y ``Retry-After``,
+      para no duplicar lo que crea (p. ej. ``create_tandem_project``).
+    - ``Retry-After`` se respeta tal cual; si pide esperar más de
+      ``max_retry_after`` segundos, se falla en el acto.
+    - Limitador de tasa del lado del cliente compartido por todas las llamadas.
     """
-    token = get_2legged_token()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
 
-    url = "https://developer.api.autodesk.com/tandem/v1/projects"
+    REINTENTABLES = {429, 500, 502, 503, 504}
+    IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+    # Errores en los que la petición no salió del cliente
+    ERRORES_SIN_ENVIO = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    def __init__(self, base_url: str = TANDEM_API_URL, scope: str = TANDEM_SCOPES,
+                 tasa: float = None, max_reintentos: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, max_retry_after: float = 120.0, timeout: float = 15.0,
+                 max_conexiones: int = 20, transport: httpx.AsyncBaseTransport = None):
+        self.base_url = base_url.rstrip("/")
+        self.scope = scope
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self.max_conexiones = max_conexiones
+        self.limitador = LimitadorTasa(tasa or float(os.getenv("TANDEM_RATE_LIMIT", "10")))
+        self._transport = transport
+        self._cliente = None
+        self._loop = None
+
+    # --------------------------------------------------
+    # Ciclo de vida
+    # --------------------------------------------------
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._cliente is None or self._loop is not loop or self._cliente.is_closed:
+            self._cliente = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_DISPONIBLE and self._transport is None,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_conexiones,
+                                    max_keepalive_connections=self.max_conexiones),
+                transport=self._transport,
+            )
+            self._loop = loop
+            self.limitador.vincular_loop()
+        return self._cliente
+
+    async def cerrar(self):
+        if self._cliente is not None and not self._cliente.is_closed:
+            await self._cliente.aclose()
+        self._cliente = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    # --------------------------------------------------
+    # Peticiones
+    # --------------------------------------------------
+    async def _token(self) -> str:
+        return await proveedor_tokens.token(self.scope)
+
+    async def solicitar_token(self, url: str, datos: dict) -> dict:
+        """POST ``client_credentials`` al endpoint de tokens (solicitante de ``proveedor_tokens``)."""
+        try:
+            # Sin efectos en el servidor: se puede reintentar como un GET
+            respuesta = await self.request("POST", url, data=datos, idempotente=True, autenticar=False)
+        except httpx.HTTPStatusError as e:
+            raise Exception(f"Error al obtener token de Autodesk: {e.response.text}")
+        return respuesta.json()
+
+    def _backoff(self, intento: int) -> float:
+        espera = min(self.backoff_base * 2 ** intento, self.backoff_max)
+        return random.uniform(espera / 2, espera)
+
+    @staticmethod
+    def _retry_after(respuesta: httpx.Response):
+        """Segundos pedidos en ``Retry-After`` (número o fecha HTTP), o None."""
+        valor = respuesta.headers.get("Retry-After")
+        if valor is None:
+            return None
+        try:
+            return max(float(valor), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(valor).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                return None
+
+    async def request(self, metodo: str, url: str, idempotente: bool = None, autenticar: bool = True,
+                      **kwargs) -> httpx.Response:
+        """
+        Envía la petición con autenticación, límite de tasa y reintentos.
+        ``url`` puede ser relativa a ``base_url`` o absoluta. ``idempotente``
+        fuerza la política de reintentos (por defecto se deduce del método);
+        ``autenticar=False`` omite el token (petición al endpoint de tokens).
+        """
+        cliente = self._http()
+        headers = dict(kwargs.pop("headers", None) or {})
+        if idempotente is None:
+            idempotente = metodo.upper() in self.IDEMPOTENTES
+        reautenticado = not autenticar
+        intento = 0
+        while True:
+            if autenticar:
+                headers["Authorization"] = f"Bearer {await self._token()}"
+            await self.limitador.adquirir()
+            try:
+                respuesta = await cliente.request(metodo, url, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                if intento >= self.max_reintentos or not (idempotente or isinstance(e, self.ERRORES_SIN_ENVIO)):
+                    raise
+                await asyncio.sleep(self._backoff(intento))
+                intento += 1
+                continue
+
+            if respuesta.status_code == 401 and not reautenticado:
+                proveedor_tokens.invalidar(self.scope)
+                reautenticado = True
+                continue
+
+            if respuesta.status_code in self.REINTENTABLES and intento < self.max_reintentos:
+                retry_after = self._retry_after(respuesta)
+                reintentar = idempotente or (respuesta.status_code in (429, 503) and retry_after is not None)
+                if reintentar and (retry_after is None or retry_after <= self.max_retry_after):
+                    espera = self._backoff(intento) if retry_after is None else retry_after
+                    if respuesta.status_code == 429:
+                        # Frena todas las llamadas, no solo esta
+                        self.limitador.pausar(espera)
+                    else:
+                        await asyncio.sleep(espera)
+                    intento += 1
+                    continue
+
+            respuesta.raise_for_status()
+            return respuesta
+
+    async def get_json(self, url: str, **kwargs):
+        return (await self.request("GET", url, **kwargs)).json()
+
+    async def post_json(self, url: str, payload: dict, **kwargs):
+        return (await self.request("POST", url, json=payload, **kwargs)).json()
+
+    async def paginar(self, url: str, params: dict = None, clave: str = "results"):
+        """
+        Recorre todas las páginas de un listado y produce sus elementos.
+
+        Sigue el enlace ``Link: rel=next``, los campos ``next``/``nextUrl`` o
+        un ``continuationToken`` devuelto por la API.
+        """
+        params = dict(params or {})
+        while url:
+            respuesta = await self.request("GET", url, params=params)
+            datos = respuesta.json()
+            elementos = datos if isinstance(datos, list) else datos.get(clave, [])
+            for elemento in elementos:
+                yield elemento
+
+            url, params = self._siguiente_pagina(url, params, respuesta, datos)
+
+    @staticmethod
+    def _siguiente_pagina(url, params, respuesta, datos):
+        if "next" in respuesta.links:
+            return respuesta.links["next"]["url"], None
+        if isinstance(datos, dict):
+            for clave in ("next", "nextUrl"):
+                if datos.get(clave):
+                    return datos[clave], None
+            if datos.get("continuationToken"):
+                return url, {**(params or {}), "continuationToken": datos["continuationToken"]}
+        return None, None
+
+
+# Instancia compartida por toda la aplicación
+cliente = TandemClient()
+
+
+async def create_tandem_project(name: str, description: str = ""):
+    """
+    Crea un proyecto en Autodesk Tandem usando el token APS.
+    """
     payload = {
         "name": name,
         "description": description
     }
-
-    r = httpx.post(url, json=payload, headers=headers, timeout=10.0)
-    r.raise_for_status()
-    return r.json()
\ No newline at end of file
+    return await cliente.post_json("/projects", payload)
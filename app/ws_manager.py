@@ -1,53 +1,200 @@
 from fastapi import WebSocket
-from typing import List
+from collections import deque
+from typing import Dict, List, Set
 import asyncio
 import json
+import os
+
+
+def _serializar(message: dict) -> str:
+    # Mismo formato que WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class Conexion:
+    """
+    Estado de envío de un cliente: cola acotada de mensajes ya serializados
+    y la tarea que los escribe en el socket.
+    """
+
+    __slots__ = ("websocket", "cola", "hay_mensajes", "tarea", "temas", "resync", "desbordes")
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.cola = deque()
+        self.hay_mensajes = asyncio.Event()
+        self.tarea = None
+        self.temas: Set[str] = set()
+        self.resync = False
+        self.desbordes = 0
+
+    def encolar(self, texto: str):
+        self.cola.append(texto)
+        self.hay_mensajes.set()
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Reparto de mensajes a clientes WebSocket con control de contrapresión.
+
+    Cada mensaje se serializa una sola vez y se deja en la cola de cada
+    conexión, que tiene su propia tarea escritora: un cliente lento nunca
+    frena el envío a los demás. Si la cola de un cliente supera
+    ``max_cola`` se vacía y se le envía ``{"tipo": "resync_requerido"}``
+    (debe reanudar, p. ej. con ``desde``); tras ``max_desbordes`` desbordes,
+    o si un envío tarda más de ``timeout_envio``, se cierra la conexión.
+    """
+
+    def __init__(self, max_cola: int = 256, max_desbordes: int = 3, timeout_envio: float = 10.0):
+        self.max_cola = max_cola
+        self.max_desbordes = max_desbordes
+        self.timeout_envio = timeout_envio
+        self.conexiones: Dict[WebSocket, Conexion] = {}
+        self.topics: Dict[str, Set[Conexion]] = {}
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.conexiones)
 
     async def connect(self, websocket: WebSocket):
         """
-        Acepta una nueva conexión WebSocket y la agrega a la lista activa.
+        Acepta una nueva conexión WebSocket y arranca su escritor.
         """
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"🔌 Cliente conectado ({len(self.active_connections)} conectados)")
+        self.registrar(websocket)
+        print(f"🔌 Cliente conectado ({len(self.conexiones)} conectados)")
+
+    def registrar(self, websocket: WebSocket) -> Conexion:
+        """Da de alta un socket ya aceptado."""
+        conexion = Conexion(websocket)
+        conexion.tarea = asyncio.create_task(self._escritor(conexion))
+        self.conexiones[websocket] = conexion
+        return conexion
 
     def disconnect(self, websocket: WebSocket):
         """
-        Elimina la conexión de la lista activa.
+        Elimina la conexión, sus suscripciones y su escritor.
+        """
+        conexion = self.conexiones.pop(websocket, None)
+        if conexion is None:
+            return
+        for topic in conexion.temas:
+            conexiones = self.topics.get(topic)
+            if conexiones is not None:
+                conexiones.discard(conexion)
+                if not conexiones:
+                    del self.topics[topic]
+        conexion.temas.clear()
+        if conexion.tarea is not None and conexion.tarea is not asyncio.current_task():
+            conexion.tarea.cancel()
+        print(f"❌ Cliente desconectado ({len(self.conexiones)} restantes)")
+
+    def suscribir(self, websocket: WebSocket, topic: str):
         """
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"❌ Cliente desconectado ({len(self.active_connections)} restantes)")
+        Suscribe la conexión a un tema (p. ej. ``proyecto:42``).
+        """
+        conexion = self.conexiones.get(websocket)
+        if conexion is None:
+            return
+        self.topics.setdefault(topic, set()).add(conexion)
+        conexion.temas.add(topic)
+
+    def cancelar(self, websocket: WebSocket, topic: str):
+        """
+        Cancela la suscripción de la conexión a un tema.
+        """
+        conexion = self.conexiones.get(websocket)
+        conexiones = self.topics.get(topic)
+        if conexion is None or conexiones is None:
+            return
+        conexiones.discard(conexion)
+        conexion.temas.discard(topic)
+        if not conexiones:
+            del self.topics[topic]
+
+    def temas_activos(self) -> List[str]:
+        return list(self.topics)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """
-        Envía un mensaje JSON a un cliente específico.
+        Envía un mensaje JSON a un cliente específico, en orden con lo ya
+        encolado. Las respuestas directas no cuentan para el límite de cola.
         """
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            print(f"⚠️ Error enviando mensaje individual: {e}")
+        conexion = self.conexiones.get(websocket)
+        if conexion is not None:
+            conexion.encolar(_serializar(message))
 
     async def broadcast(self, message: dict):
         """
         Envía un mensaje JSON a todos los clientes conectados.
         """
-        if not self.active_connections:
-            return
+        self._repartir(self.conexiones.values(), _serializar(message))
 
-        coros = []
-        for conn in list(self.active_connections):
-            try:
-                coros.append(conn.send_json(message))
-            except Exception as e:
-                print(f"⚠️ Error al enviar a una conexión: {e}")
+    async def publicar(self, topic: str, message: dict):
+        """
+        Envía un mensaje JSON a los clientes suscritos a ``topic``.
+        """
+        conexiones = self.topics.get(topic)
+        if conexiones:
+            self._repartir(conexiones, _serializar(message))
+
+    # --------------------------------------------------
+    # Reparto y escritura
+    # --------------------------------------------------
+    def _repartir(self, conexiones, texto: str):
+        cerrar = []
+        for conexion in conexiones:
+            if conexion.resync:
+                continue  # ya sabe que debe reanudar; no acumular más
+            if len(conexion.cola) >= self.max_cola:
+                conexion.desbordes += 1
+                if conexion.desbordes >= self.max_desbordes:
+                    cerrar.append(conexion)
+                    continue
+                conexion.cola.clear()
+                conexion.resync = True
+                conexion.encolar(_serializar({"tipo": "resync_requerido", "temas": sorted(conexion.temas)}))
+                continue
+            conexion.encolar(texto)
+        for conexion in cerrar:
+            print("⚠️ Cliente demasiado lento: se cierra la conexión")
+            self.disconnect(conexion.websocket)
+            asyncio.ensure_future(self._cerrar_socket(conexion.websocket))
+
+    async def _escritor(self, conexion: Conexion):
+        websocket = conexion.websocket
+        try:
+            while True:
+                await conexion.hay_mensajes.wait()
+                while conexion.cola:
+                    texto = conexion.cola.popleft()
+                    await self._enviar(websocket, texto)
+                    if conexion.resync and not conexion.cola:
+                        conexion.resync = False  # aviso entregado
+                conexion.hay_mensajes.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Error enviando a una conexión: {e}")
+            self.disconnect(websocket)
+            await self._cerrar_socket(websocket)
 
-        if coros:
-            await asyncio.gather(*coros, return_exceptions=True)
+    if hasattr(asyncio, "timeout"):
+        async def _enviar(self, websocket: WebSocket, texto: str):
+            async with asyncio.timeout(self.timeout_envio):
+                await websocket.send_text(texto)
+    else:  # Python < 3.11
+        async def _enviar(self, websocket: WebSocket, texto: str):
+            await asyncio.wait_for(websocket.send_text(texto), self.timeout_envio)
+
+    async def _cerrar_socket(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # intente más tarde
+        except Exception:
+            pass
 
 # Instancia global del administrador
-manager = ConnectionManager()
+manager = ConnectionManager(
+    max_cola=int(os.getenv("WS_MAX_COLA", "256")),
+    timeout_envio=float(os.getenv("WS_TIMEOUT_ENVIO", "10")),
+)
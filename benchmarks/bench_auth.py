@@ -0,0 +1,67 @@
+"""
+Coste de la autenticación JWT: ``jwt.decode`` en cada llamada frente a
+``auth.verify_jwt`` con la caché de tokens verificados, y el coste por
+petición de GET /sync/metricas/bd sin token, con token en caché y con la
+caché desactivada.
+
+    python benchmarks/bench_auth.py --verificaciones 20000 --peticiones 3000
+"""
+import argparse
+import time
+
+import comun
+
+comun.preparar_bd("bench_auth")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _por_llamada(funcion, veces: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(veces):
+        funcion()
+    return (time.perf_counter() - t0) / veces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verificaciones", type=int, default=20_000)
+    parser.add_argument("--peticiones", type=int, default=3000)
+    args = parser.parse_args()
+
+    comun.crear_esquema()
+    auth.cargar_claves()
+    token = auth.create_jwt("bench")
+    clave = auth._clave("verificacion")
+
+    print(f"Verificación de un token {auth.JWT_ALGO}")
+    decode = _por_llamada(lambda: auth.jwt.decode(token, clave, algorithms=[auth.JWT_ALGO]), args.verificaciones)
+    auth.verify_jwt(token)
+    cache = _por_llamada(lambda: auth.verify_jwt(token), args.verificaciones)
+    print(f"  {'jwt.decode':<40} {decode * 1e6:10.1f} µs")
+    print(f"  {'verify_jwt (en caché)':<40} {cache * 1e6:10.1f} µs")
+
+    # Sin lifespan: no arrancan el scheduler ni los hilos de fondo
+    cliente = TestClient(app)
+    cabecera = {"Authorization": f"Bearer {token}"}
+    assert cliente.get("/sync/metricas/bd", headers=cabecera).status_code == 200
+    print(f"GET /sync/metricas/bd ({args.peticiones} peticiones)")
+    for etiqueta, cabeceras in (("sin token", {}), ("token en caché", cabecera)):
+        _por_llamada(lambda: cliente.get("/sync/metricas/bd", headers=cabeceras), 100)
+        media = _por_llamada(lambda: cliente.get("/sync/metricas/bd", headers=cabeceras), args.peticiones)
+        print(f"  {etiqueta:<40} {media * 1e6:10.0f} µs/petición")
+
+    auth.cache_tokens.limpiar()
+    guardar, auth.cache_tokens.guardar = auth.cache_tokens.guardar, lambda *a: None
+    try:
+        media = _por_llamada(lambda: cliente.get("/sync/metricas/bd", headers=cabecera), args.peticiones)
+    finally:
+        auth.cache_tokens.guardar = guardar
+    print(f"  {'token sin caché':<40} {media * 1e6:10.0f} µs/petición")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Búsquedas del camino de sincronización con y sin sus índices (migración
+0003): elementos por ``revit_id`` y elementos por tipo de familia (el JOIN
+de exportación y reconciliación). Cada búsqueda se repite con el índice
+creado y después borrado.
+
+    python benchmarks/bench_indices.py --elementos 1000000
+"""
+import argparse
+import random
+import time
+
+import comun
+
+comun.preparar_bd("bench_indices")
+
+from sqlalchemy import bindparam, func, insert, select  # noqa: E402
+
+from app import database, models  # noqa: E402
+
+
+def _indice(tabla, nombre):
+    return next(indice for indice in tabla.indexes if indice.name == nombre)
+
+
+def _cargar(elementos: int, por_tipo: int = 100):
+    Elem = models.Elemento.__table__
+    tipos = max(1, elementos // por_tipo)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.Proyecto.__table__), [{"id": 1, "nombre": "Bench"}])
+        conn.execute(insert(models.Categoria.__table__), [{"id": 1, "nombre": "Muros", "proyecto_id": 1}])
+        conn.execute(insert(models.Familia.__table__), [{"id": 1, "nombre": "Muro", "categoria_id": 1}])
+        conn.execute(insert(models.TipoFamilia.__table__),
+                     [{"id": t, "nombre": f"Tipo {t}", "familia_id": 1} for t in range(1, tipos + 1)])
+        for inicio in range(1, elementos + 1, 50_000):
+            conn.execute(insert(Elem), [
+                {"id": i, "nombre": f"Elemento {i}", "tipo_familia_id": 1 + i % tipos, "revit_id": 100_000 + i}
+                for i in range(inicio, min(inicio + 50_000, elementos + 1))
+            ])
+    return tipos
+
+
+def _medir(etiqueta, consulta, valores):
+    with database.engine.connect() as conn:
+        t0 = time.perf_counter()
+        for valor in valores:
+            conn.execute(consulta, {"valor": valor}).all()
+        media = (time.perf_counter() - t0) / len(valores)
+    print(f"  {etiqueta:<40} {media * 1000:10.3f} ms/consulta")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elementos", type=int, default=200_000)
+    parser.add_argument("--consultas", type=int, default=50)
+    args = parser.parse_args()
+
+    comun.crear_esquema()
+    t0 = time.perf_counter()
+    tipos = _cargar(args.elementos)
+    print(f"{args.elementos:,} elementos cargados en {time.perf_counter() - t0:.1f} s")
+
+    Elem = models.Elemento.__table__
+    random.seed(1)
+    casos = [
+        ("ix_elementos_revit_id", "revit_id",
+         select(Elem.c.id).where(Elem.c.revit_id == bindparam("valor")),
+         [100_000 + random.randint(1, args.elementos) for _ in range(args.consultas)]),
+        ("ix_elementos_tipo_familia_id", "tipo_familia_id",
+         select(func.count()).where(Elem.c.tipo_familia_id == bindparam("valor")),
+         [random.randint(1, tipos) for _ in range(args.consultas)]),
+    ]
+    for nombre, columna, consulta, valores in casos:
+        indice = _indice(Elem, nombre)
+        print(f"elementos.{columna}")
+        _medir("con índice", consulta, valores)
+        indice.drop(database.engine)
+        try:
+            _medir("sin índice", consulta, valores[:max(1, len(valores) // 10)])
+        finally:
+            indice.create(database.engine)
+
+
+if __name__ == "__main__":
+    main()
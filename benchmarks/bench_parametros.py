@@ -0,0 +1,101 @@
+"""
+Filtros por parámetro: recorrer los blobs ``parametros`` y filtrarlos con
+``json.loads`` en Python (lo único posible antes de ``parametros_valores``)
+frente a las consultas SQL sobre el índice tipado (un COUNT y una página
+de ``buscar_por_parametros``). También mide ``reconstruir_parametros``.
+
+    python benchmarks/bench_parametros.py --elementos 1000000
+"""
+import argparse
+import json
+
+import comun
+
+comun.preparar_bd("bench_parametros")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import crud, database, models  # noqa: E402
+
+RESISTENCIAS = ["30min", "1h", "2h", "3h", "4h", "NR", "45min", "90min", "EI60", "EI120"]
+
+
+def _blob(i: int) -> str:
+    return json.dumps({
+        "FireRating": RESISTENCIAS[i % 10],
+        "Width": {"valor": 50 + (i * 7) % 500, "unidad": "mm"},
+        "Mark": f"M-{i}",
+        "Level": f"Nivel {i % 20}",
+        "Comments": "Muro de carga" if i % 3 == 0 else "",
+        "Phase": "Nueva construcción",
+    }, ensure_ascii=False)
+
+
+def _cargar(elementos: int, por_tipo: int = 1000):
+    tipos = max(1, elementos // por_tipo)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.Proyecto.__table__), [{"id": 1, "nombre": "Bench"}])
+        conn.execute(insert(models.Categoria.__table__), [{"id": 1, "nombre": "Muros", "proyecto_id": 1}])
+        conn.execute(insert(models.Familia.__table__), [{"id": 1, "nombre": "Muro", "categoria_id": 1}])
+        conn.execute(insert(models.TipoFamilia.__table__),
+                     [{"id": t, "nombre": f"Tipo {t}", "familia_id": 1} for t in range(1, tipos + 1)])
+        for inicio in range(1, elementos + 1, 20_000):
+            conn.execute(insert(models.Elemento.__table__), [
+                {"id": i, "nombre": f"Elemento {i}", "tipo_familia_id": 1 + i % tipos,
+                 "revit_id": 100_000 + i, "parametros": _blob(i)}
+                for i in range(inicio, min(inicio + 20_000, elementos + 1))
+            ])
+
+
+def _recorrer_blobs(db, predicado) -> int:
+    Elem = models.Elemento
+    coincidencias = 0
+    for parametros, in db.execute(select(Elem.parametros)).yield_per(10_000):
+        if predicado(json.loads(parametros) if parametros else {}):
+            coincidencias += 1
+    return coincidencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elementos", type=int, default=100_000)
+    parser.add_argument("--pagina", type=int, default=1000)
+    args = parser.parse_args()
+
+    comun.crear_esquema()
+    with comun.cronometro(f"carga de {args.elementos:,} elementos", args.elementos, "elementos"):
+        _cargar(args.elementos)
+
+    db = database.SessionLocal()
+    try:
+        with comun.cronometro("reconstruir_parametros", args.elementos, "elementos"):
+            valores = crud.reconstruir_parametros(db, tamano_lote=20_000)
+        print(f"  {valores:,} valores indexados")
+
+        Elem = models.Elemento
+        casos = [
+            ("FireRating=2h", lambda d: d.get("FireRating") == "2h", ["FireRating=2h"]),
+            ("FireRating=EI120 & Width>=500",
+             lambda d: d.get("FireRating") == "EI120" and d["Width"]["valor"] >= 500,
+             ["FireRating=EI120", "Width>=500"]),
+            ("Mark=M-77777", lambda d: d.get("Mark") == "M-77777", ["Mark=M-77777"]),
+        ]
+        for etiqueta, predicado, textos in casos:
+            filtros = [crud.parsear_filtro_parametro(t) for t in textos]
+            print(etiqueta)
+            with comun.cronometro("blobs + json.loads"):
+                antes = _recorrer_blobs(db, predicado)
+            with comun.cronometro("SQL COUNT sobre parametros_valores"):
+                ahora = db.scalar(select(func.count()).select_from(Elem).where(
+                    *(crud.condicion_parametro(Elem, *f) for f in filtros)
+                ))
+            with comun.cronometro(f"SQL página de {args.pagina} (buscar_por_parametros)"):
+                crud.buscar_por_parametros(db, "elemento", filtros, limite=args.pagina)
+            assert antes == ahora, (antes, ahora)
+            print(f"  {ahora:,} coincidencias")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Escritura de revit_id (POST /sync/revit/ids): un SELECT + commit por
+elemento (el camino anterior) frente a ``crud.actualizar_revit_ids``
+(un SELECT y un UPDATE ... CASE por lote de IDs, una sola transacción).
+
+    python benchmarks/bench_revit_ids.py --elementos 3000
+"""
+import argparse
+
+import comun
+
+comun.preparar_bd("bench_revit_ids")
+
+from sqlalchemy import select  # noqa: E402
+
+from app import crud, database, models, schemas  # noqa: E402
+
+
+def actualizar_uno_a_uno(db, items):
+    """Réplica del camino anterior: consulta ORM y commit por elemento."""
+    for item in items:
+        registro = db.query(models.Elemento).filter(models.Elemento.id == item.id_sql).first()
+        if registro:
+            registro.revit_id = item.revit_id
+            registro.version = crud.siguiente_version(db)
+            db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elementos", type=int, default=3000)
+    args = parser.parse_args()
+
+    comun.crear_esquema()
+    tipos = max(1, args.elementos // 100)
+    datos = comun.payload_proyecto(categorias=1, familias=1, tipos=tipos, elementos=args.elementos // tipos,
+                                   parametros=False)
+    db = database.SessionLocal()
+    try:
+        crud.sincronizar_desde_revit(db, schemas.ProyectoSync(**datos))
+        ids = db.scalars(select(models.Elemento.id).order_by(models.Elemento.id)).all()
+        print(f"Escritura de revit_id para {len(ids):,} elementos")
+
+        def items(desplazamiento):
+            return [schemas.RevitElementoSync(tipo="elemento", id_sql=i, revit_id=i + desplazamiento) for i in ids]
+
+        with comun.cronometro("uno a uno (SELECT + commit)", len(ids), "elementos"):
+            actualizar_uno_a_uno(db, items(1_000_000))
+        with comun.cronometro("en bloque (actualizar_revit_ids)", len(ids), "elementos"):
+            resultado = crud.actualizar_revit_ids(db, items(2_000_000))
+        assert resultado["actualizados"] == len(ids)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
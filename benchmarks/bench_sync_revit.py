@@ -0,0 +1,76 @@
+"""
+Sincronización Revit → SQL: escritura fila a fila con un commit por nodo
+(como era ``sincronizar_desde_revit`` antes de escribir por niveles)
+frente a ``crud.sincronizar_desde_revit`` actual (INSERT multi-fila por
+nivel y un solo commit).
+
+    python benchmarks/bench_sync_revit.py --familias 10 --tipos 5 --elementos 20
+"""
+import argparse
+from datetime import datetime
+
+import comun
+
+comun.preparar_bd("bench_sync_revit")
+
+from app import crud, database, models, schemas  # noqa: E402
+
+
+def sincronizar_fila_a_fila(db, proyecto_sync):
+    """Réplica del camino anterior: db.add + commit + refresh por nodo."""
+    usuario = crud.obtener_o_crear_usuario(db, proyecto_sync.usuario)
+    proyecto = crud.obtener_o_crear_proyecto(db, proyecto_sync.nombre, usuario.id, proyecto_sync.horas)
+    db.commit()
+    for cat_data in proyecto_sync.categorias:
+        categoria = models.Categoria(nombre=cat_data.nombre, omniclass=cat_data.omniclass,
+                                     usuario=usuario.nombre, proyecto_id=proyecto.id)
+        db.add(categoria)
+        db.commit()
+        db.refresh(categoria)
+        for fam_data in cat_data.familias:
+            familia = models.Familia(nombre=fam_data.nombre, omniclass=fam_data.omniclass,
+                                     parametros=fam_data.parametros, categoria_id=categoria.id)
+            db.add(familia)
+            db.commit()
+            db.refresh(familia)
+            for tipo_data in fam_data.tipos_familia:
+                tipo = models.TipoFamilia(nombre=tipo_data.nombre, omniclass=tipo_data.omniclass,
+                                          parametros=tipo_data.parametros, familia_id=familia.id)
+                db.add(tipo)
+                db.commit()
+                db.refresh(tipo)
+                for elem_data in tipo_data.elementos:
+                    db.add(models.Elemento(nombre=elem_data.nombre, omniclass=elem_data.omniclass,
+                                           parametros=elem_data.parametros, usuario=usuario.nombre,
+                                           fecha_modificacion=datetime.now(), tipo_familia_id=tipo.id))
+                    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categorias", type=int, default=5)
+    parser.add_argument("--familias", type=int, default=10)
+    parser.add_argument("--tipos", type=int, default=5)
+    parser.add_argument("--elementos", type=int, default=15)
+    args = parser.parse_args()
+
+    comun.crear_esquema()
+    datos = comun.payload_proyecto(categorias=args.categorias, familias=args.familias,
+                                   tipos=args.tipos, elementos=args.elementos)
+    nodos = comun.contar_nodos(datos)
+    print(f"Sincronización de {nodos:,} nodos")
+
+    db = database.SessionLocal()
+    try:
+        with comun.cronometro("fila a fila (commit por nodo)", nodos, "nodos"):
+            sincronizar_fila_a_fila(db, schemas.ProyectoSync(**{**datos, "nombre": "Fila a fila"}))
+        with comun.cronometro("por niveles (sincronizar_desde_revit)", nodos, "nodos"):
+            crud.sincronizar_desde_revit(db, schemas.ProyectoSync(**datos))
+        with comun.cronometro("por niveles, reconciliar sin cambios", nodos, "nodos"):
+            crud.sincronizar_desde_revit(db, schemas.ProyectoSync(**{**datos, "modo": "reconciliar"}))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Reparto de mensajes WebSocket con clientes lentos y caídos: el
+``broadcast`` anterior (``gather`` de ``send_json`` por mensaje, que
+espera al cliente más lento y serializa una vez por socket) frente a
+``ConnectionManager`` actual (cola acotada y escritor por conexión).
+
+Los sockets son simulados: ``--lentos`` tardan ``--retardo`` segundos por
+envío y ``--caidos`` fallan siempre.
+
+    python benchmarks/bench_ws_fanout.py --sockets 1000 --mensajes 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+import comun
+
+comun.preparar_bd("bench_ws_fanout")
+
+from app.ws_manager import ConnectionManager  # noqa: E402
+
+MENSAJE = {
+    "tipo": "cambios", "proyecto_id": 1,
+    "cambios": {"elementos": [{"id": i, "nombre": f"Elemento {i}", "revit_id": i} for i in range(20)]},
+}
+
+
+class SocketSimulado:
+    def __init__(self, retardo: float = 0.0, caido: bool = False):
+        self.retardo = retardo
+        self.caido = caido
+        self.recibidos = 0
+        self.serializaciones = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texto):
+        if self.caido:
+            raise RuntimeError("socket cerrado")
+        await asyncio.sleep(self.retardo)
+        self.recibidos += 1
+
+    async def send_json(self, mensaje):
+        json.dumps(mensaje)
+        self.serializaciones += 1
+        await self.send_text(None)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def broadcast_anterior(sockets, mensaje):
+    """Réplica del broadcast anterior: un send_json por socket y gather."""
+    await asyncio.gather(*(s.send_json(mensaje) for s in sockets), return_exceptions=True)
+
+
+def crear_sockets(args):
+    return [
+        SocketSimulado(retardo=args.retardo if i < args.lentos else 0.0,
+                       caido=args.lentos <= i < args.lentos + args.caidos)
+        for i in range(args.sockets)
+    ]
+
+
+async def medir_anterior(args):
+    sockets = crear_sockets(args)
+    t0 = time.perf_counter()
+    for _ in range(args.mensajes):
+        await broadcast_anterior(sockets, MENSAJE)
+    total = time.perf_counter() - t0
+    print(f"  anterior: {args.mensajes} mensajes en {total:.2f} s "
+          f"({total / args.mensajes * 1000:.1f} ms/mensaje), "
+          f"{sum(s.serializaciones for s in sockets) // args.mensajes} json.dumps por mensaje, "
+          f"caídos retirados 0/{args.caidos}")
+
+
+async def medir_actual(args, mensajes: int):
+    manager = ConnectionManager(max_cola=args.max_cola)
+    sockets = crear_sockets(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for socket in sockets:
+            await manager.connect(socket)
+            manager.suscribir(socket, "proyecto:1")
+
+    sanos = sockets[args.lentos + args.caidos:]
+    t0 = time.perf_counter()
+    publicar = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(mensajes):
+            t1 = time.perf_counter()
+            await manager.publicar("proyecto:1", MENSAJE)
+            publicar += time.perf_counter() - t1
+            await asyncio.sleep(args.pausa)
+        while any(s.recibidos < mensajes for s in sanos) and time.perf_counter() - t0 < 60:
+            await asyncio.sleep(0.005)
+    entrega = time.perf_counter() - t0
+
+    lentos = [manager.conexiones.get(s) for s in sockets[:args.lentos]]
+    caidos = sockets[args.lentos:args.lentos + args.caidos]
+    print(f"  actual: {mensajes} mensajes, publicar {publicar / mensajes * 1000:.2f} ms/mensaje; "
+          f"{sum(s.recibidos == mensajes for s in sanos)}/{len(sanos)} sanos completos en {entrega:.2f} s; "
+          f"lentos: {sum(c is None for c in lentos)} cerrados, "
+          f"{sum(1 for c in lentos if c is not None and c.desbordes)} con resync; "
+          f"caídos retirados {sum(s not in manager.conexiones for s in caidos)}/{len(caidos)}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for socket in list(manager.conexiones):
+            manager.disconnect(socket)
+
+
+async def principal(args):
+    print(f"{args.sockets} sockets ({args.lentos} lentos de {args.retardo * 1000:.0f} ms, {args.caidos} caídos)")
+    await medir_anterior(args)
+    await medir_actual(args, args.mensajes)
+    await medir_actual(args, args.mensajes * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--lentos", type=int, default=10)
+    parser.add_argument("--caidos", type=int, default=5)
+    parser.add_argument("--retardo", type=float, default=0.2)
+    parser.add_argument("--mensajes", type=int, default=20)
+    parser.add_argument("--pausa", type=float, default=0.001, help="segundos entre publicaciones")
+    parser.add_argument("--max-cola", type=int, default=256)
+    asyncio.run(principal(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
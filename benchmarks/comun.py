@@ -0,0 +1,91 @@
+"""
+Utilidades compartidas por los benchmarks. Se ejecutan desde la raíz del
+repositorio, p. ej. ``python benchmarks/bench_sync_revit.py --elementos 5000``.
+
+Cada benchmark crea su esquema en un SQLite temporal. Para medir contra
+otro motor se indica ``BENCH_DATABASE_URL``: debe ser una base desechable,
+porque se borra y se vuelve a crear su esquema.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def preparar_bd(nombre: str) -> str:
+    """Configura la BD del benchmark; llamar antes de importar ``app``."""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        ruta = os.path.join(tempfile.mkdtemp(prefix="revit-sync-bench-"), f"{nombre}.db")
+        url = f"sqlite:///{ruta}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("AUTH_REQUERIDA", "0")
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    return url
+
+
+def crear_esquema():
+    from app import database, models
+    models.Base.metadata.drop_all(database.engine)
+    models.Base.metadata.create_all(database.engine)
+
+
+def payload_proyecto(nombre: str = "Bench", categorias: int = 5, familias: int = 10, tipos: int = 5,
+                     elementos: int = 20, parametros: bool = True) -> dict:
+    """Cuerpo de POST /sync/revit/ con revit_id únicos por nivel."""
+    contador = {"familia": 0, "tipo": 0, "elemento": 0}
+
+    def siguiente(nivel):
+        contador[nivel] += 1
+        return contador[nivel]
+
+    def params(i):
+        return f'{{"FireRating": "{i % 4}h", "Mark": "M-{i}"}}' if parametros else None
+
+    return {
+        "nombre": nombre,
+        "horas": 1.0,
+        "usuario": {"nombre": "Bench", "correo": "bench@example.com"},
+        "categorias": [{
+            "nombre": f"Categoría {c}",
+            "omniclass": f"21-0{c % 9 + 1} 10",
+            "familias": [{
+                "nombre": f"Familia {c}.{f}",
+                "revit_id": siguiente("familia"),
+                "omniclass": f"21-0{c % 9 + 1} 10 {f % 90 + 10}",
+                "parametros": params(f),
+                "tipos_familia": [{
+                    "nombre": f"Tipo {c}.{f}.{t}",
+                    "revit_id": siguiente("tipo"),
+                    "parametros": params(t),
+                    "elementos": [
+                        {"nombre": f"Elemento {c}.{f}.{t}.{e}", "revit_id": siguiente("elemento"),
+                         "parametros": params(e)}
+                        for e in range(elementos)
+                    ],
+                } for t in range(tipos)],
+            } for f in range(familias)],
+        } for c in range(categorias)],
+    }
+
+
+def contar_nodos(payload: dict) -> int:
+    return sum(
+        1 + sum(1 + sum(1 + len(t["elementos"]) for t in f["tipos_familia"]) for f in c["familias"])
+        for c in payload["categorias"]
+    )
+
+
+@contextmanager
+def cronometro(etiqueta: str, unidades: int = None, nombre_unidad: str = "filas"):
+    """Imprime lo que tarda el bloque y, con ``unidades``, el ritmo por segundo."""
+    resultado = {}
+    t0 = time.perf_counter()
+    yield resultado
+    resultado["segundos"] = segundos = time.perf_counter() - t0
+    ritmo = f" ({unidades / segundos:,.0f} {nombre_unidad}/s)" if unidades and segundos else ""
+    print(f"  {etiqueta:<44} {segundos * 1000:10.1f} ms{ritmo}")
@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+# La app crea sus engines al importarse: la base de pruebas (SQLite en un
+# directorio temporal) tiene que estar configurada antes.
+_DIRECTORIO = tempfile.mkdtemp(prefix="revit-sync-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'pruebas.db')}"
+os.environ.setdefault("AUTH_REQUERIDA", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import database, models
+from app.main import app
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre un esquema recién creado."""
+    models.Base.metadata.drop_all(database.engine)
+    models.Base.metadata.create_all(database.engine)
+    sesion = database.SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def cliente(db):
+    """Cliente HTTP sin lifespan: las sincronizaciones se piden con ``esperar``."""
+    return TestClient(app)
+
+
+@pytest.fixture
+def sentencias():
+    """SQL enviado a la BD mientras dura la prueba (cada commit, como ``"COMMIT"``)."""
+    capturadas = []
+
+    def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+        capturadas.append(sentencia)
+
+    def confirmar(conn):
+        capturadas.append("COMMIT")
+
+    event.listen(database.engine, "before_cursor_execute", registrar)
+    event.listen(database.engine, "commit", confirmar)
+    yield capturadas
+    event.remove(database.engine, "before_cursor_execute", registrar)
+    event.remove(database.engine, "commit", confirmar)
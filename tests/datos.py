@@ -0,0 +1,41 @@
+"""Payloads y atajos compartidos por las pruebas."""
+
+
+def payload_proyecto(nombre="Proyecto A", modo="reemplazar", familias=2, tipos=2, elementos=3):
+    """Cuerpo de POST /sync/revit/ con revit_id deterministas (desde 1 en cada nivel)."""
+    contador = {"familia": 0, "tipo": 0, "elemento": 0}
+
+    def siguiente(nivel):
+        contador[nivel] += 1
+        return contador[nivel]
+
+    return {
+        "nombre": nombre,
+        "horas": 1.0,
+        "usuario": {"nombre": "Ana", "correo": "ana@example.com"},
+        "modo": modo,
+        "categorias": [{
+            "nombre": "Muros",
+            "omniclass": "21-02 10 10",
+            "familias": [{
+                "nombre": f"Muro {f}",
+                "revit_id": siguiente("familia"),
+                "omniclass": "21-02 10 10 10",
+                "tipos_familia": [{
+                    "nombre": f"Tipo {f}.{t}",
+                    "revit_id": siguiente("tipo"),
+                    "parametros": "FireRating=2h",
+                    "elementos": [
+                        {"nombre": f"Elemento {f}.{t}.{e}", "revit_id": siguiente("elemento")}
+                        for e in range(elementos)
+                    ],
+                } for t in range(tipos)],
+            } for f in range(familias)],
+        }],
+    }
+
+
+def sincronizar(cliente, payload):
+    respuesta = cliente.post("/sync/revit/?esperar=true", json=payload)
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()["detalle"]
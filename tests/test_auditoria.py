@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import exc, func, select
+
+from app import auditoria, crud, models
+
+
+def _eventos(n, usuario="Ana"):
+    return [{"usuario": usuario, "proyecto": "Proyecto A", "entidad": "Elemento", "revit_id": i,
+             "accion": "ELIMINAR"} for i in range(n)]
+
+
+def _contar(db):
+    return db.scalar(select(func.count(models.AuditoriaSync.id)))
+
+
+@pytest.fixture
+def escritor():
+    escritor = auditoria.EscritorAuditoria(tamano_lote=100, intervalo=3600, max_pendientes=5, retencion_dias=0)
+    yield escritor
+    escritor.detener(timeout=5)
+
+
+def test_buffer_acotado_sin_escribir_desde_quien_registra(db, escritor, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(crud, "insertar_auditoria", lambda *a, **k: llamadas.append(a))
+    escritor.iniciar()
+
+    escritor.registrar_lote(_eventos(8))
+
+    assert llamadas == []
+    assert escritor.estado()["pendientes"] == 5
+    assert escritor.descartados == 3
+
+
+def test_error_de_conexion_conserva_el_lote_dentro_del_limite(db, escritor, monkeypatch):
+    def caida(*args, **kwargs):
+        raise exc.OperationalError("INSERT", {}, Exception("conexión perdida"))
+
+    monkeypatch.setattr(crud, "insertar_auditoria", caida)
+
+    escritor.registrar_lote(_eventos(3))
+    escritor.registrar_lote(_eventos(4))
+
+    assert escritor.errores == 2
+    assert escritor.estado()["pendientes"] == 5
+    assert escritor.descartados == 2
+    assert escritor.rechazados == 0
+
+
+def test_fila_invalida_se_aisla_y_el_resto_se_escribe(db, escritor, monkeypatch):
+    original = crud.insertar_auditoria
+
+    def rechaza_malo(sesion, filas, tamano_lote=500):
+        if any(f["usuario"] == "malo" for f in filas):
+            raise exc.DataError("INSERT", {}, Exception("String or binary data would be truncated"))
+        original(sesion, filas, tamano_lote)
+
+    monkeypatch.setattr(crud, "insertar_auditoria", rechaza_malo)
+    escritor.max_pendientes = 100
+    eventos = _eventos(9)
+    eventos.insert(4, _eventos(1, usuario="malo")[0])
+
+    escritor.registrar_lote(eventos)
+
+    assert _contar(db) == 9
+    assert escritor.rechazados == 1
+    assert escritor.ultimos_rechazos[0]["fila"]["usuario"] == "malo"
+    assert escritor.estado()["pendientes"] == 0
+
+
+def test_textos_largos_se_recortan(db, escritor):
+    escritor.registrar_lote(_eventos(1, usuario="x" * 1000))
+
+    assert db.scalar(select(func.length(models.AuditoriaSync.usuario))) == 255
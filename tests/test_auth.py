@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app import auth
+
+
+@pytest.fixture
+def auth_requerida(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REQUERIDA", True)
+    auth.cache_tokens.limpiar()
+    yield
+    auth.cache_tokens.limpiar()
+
+
+def _cabecera(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_token_valido_identifica_al_cliente(cliente, auth_requerida):
+    respuesta = cliente.get("/sync/metricas/bd", headers=_cabecera(auth.create_jwt("revit-1")))
+    assert respuesta.status_code == 200, respuesta.text
+
+    assert cliente.get("/sync/metricas/bd").status_code == 401
+
+
+def test_token_expirado_se_rechaza(cliente, auth_requerida):
+    respuesta = cliente.get("/sync/metricas/bd", headers=_cabecera(auth.create_jwt("revit-1", expires_minutes=-1)))
+    assert respuesta.status_code == 401
+    assert "expirado" in respuesta.json()["detail"]
+
+
+def test_token_en_cache_no_sobrevive_a_su_exp(cliente, auth_requerida):
+    token = auth.create_jwt("revit-1", expires_minutes=-1)
+    # Como si se hubiera verificado antes de caducar
+    claims = {"sub": "revit-1", "exp": int(time.time()) - 1}
+    auth.cache_tokens.guardar(auth.CacheTokens.clave(token), claims)
+
+    respuesta = cliente.get("/sync/metricas/bd", headers=_cabecera(token))
+    assert respuesta.status_code == 401
+    assert "expirado" in respuesta.json()["detail"]
+
+
+def test_websocket_con_token_invalido_se_cierra_con_1008(cliente, auth_requerida):
+    with pytest.raises(WebSocketDisconnect) as cierre:
+        with cliente.websocket_connect("/sync/ws?token=no-es-un-jwt") as ws:
+            ws.receive_text()
+    assert cierre.value.code == 1008
+
+    with pytest.raises(WebSocketDisconnect) as cierre:
+        with cliente.websocket_connect("/sync/ws") as ws:
+            ws.receive_text()
+    assert cierre.value.code == 1008
+
+
+def test_cache_tokens_caduca_entradas(monkeypatch):
+    cache = auth.CacheTokens(ttl_sin_exp=10)
+    ahora = time.time()
+    cache.guardar(b"con-exp", {"sub": "a", "exp": ahora + 5})
+    cache.guardar(b"sin-exp", {"sub": "b"})
+    assert cache.obtener(b"con-exp") == {"sub": "a", "exp": ahora + 5}
+
+    monkeypatch.setattr(auth.time, "time", lambda: ahora + 6)
+    assert cache.obtener(b"con-exp") is None
+    assert cache.obtener(b"sin-exp") == {"sub": "b"}
+
+    monkeypatch.setattr(auth.time, "time", lambda: ahora + 11)
+    assert cache.obtener(b"sin-exp") is None
+    assert (cache.aciertos, cache.fallos) == (2, 2)
+
+
+def test_cache_tokens_expulsa_la_menos_usada():
+    cache = auth.CacheTokens(max_entradas=2)
+    for clave in (b"a", b"b"):
+        cache.guardar(clave, {"sub": clave.decode()})
+    cache.obtener(b"a")
+    cache.guardar(b"c", {"sub": "c"})
+
+    assert cache.obtener(b"b") is None
+    assert cache.obtener(b"a") == {"sub": "a"}
+    assert cache.obtener(b"c") == {"sub": "c"}
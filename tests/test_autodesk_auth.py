@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from app.autodesk_auth import ProveedorTokenAPS
+from app.tandem_client import TandemClient
+
+
+class _ServidorTokens(ThreadingHTTPServer):
+    """Endpoint de tokens falso: cuenta peticiones por scope y tarda ``demora`` en responder."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Manejador)
+        self.peticiones = Counter()
+        self.demora = 0.0
+        self.expires_in = 3600
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def url(self):
+        return f"{self.base_url}/token"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_POST(self):
+        formulario = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        scope = formulario["scope"][0]
+        with self.server._lock:
+            if self.server.fallos:
+                self.server.fallos -= 1
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.server.peticiones[scope] += 1
+            numero = self.server.peticiones[scope]
+        time.sleep(self.server.demora)
+        cuerpo = json.dumps({"access_token": f"{scope}-{numero}", "token_type": "Bearer",
+                             "expires_in": self.server.expires_in}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = _ServidorTokens()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _ejecutar(servidor, accion, **opciones):
+    """Ejecuta ``accion(proveedor, cliente)`` con los tokens pedidos a través de un TandemClient."""
+    async def principal():
+        async with TandemClient(base_url=servidor.base_url, tasa=1000, backoff_base=0.01) as cliente:
+            proveedor = ProveedorTokenAPS("cliente", "secreto", servidor.url,
+                                          solicitante=cliente.solicitar_token, **opciones)
+            return await accion(proveedor, cliente)
+    return asyncio.run(principal())
+
+
+def test_llamadas_concurrentes_comparten_una_peticion(servidor):
+    servidor.demora = 0.3
+
+    async def accion(proveedor, cliente):
+        return await asyncio.gather(*[proveedor.token("data:read") for _ in range(10)])
+
+    assert _ejecutar(servidor, accion) == ["data:read-1"] * 10
+    assert servidor.peticiones["data:read"] == 1
+
+
+def test_cache_por_scope(servidor):
+    async def accion(proveedor, cliente):
+        assert await proveedor.token("data:read") == "data:read-1"
+        assert await proveedor.token("data:read") == "data:read-1"
+        assert await proveedor.token("data:write") == "data:write-1"
+        assert proveedor.token_en_cache("data:write") == "data:write-1"
+        assert servidor.peticiones == {"data:read": 1, "data:write": 1}
+
+        proveedor.invalidar("data:read")
+        assert await proveedor.token("data:read") == "data:read-2"
+        assert await proveedor.token("data:write") == "data:write-1"
+
+    _ejecutar(servidor, accion)
+
+
+def test_peticiones_de_token_usan_el_limitador_y_los_reintentos_del_cliente(servidor):
+    servidor.fallos = 1
+
+    async def accion(proveedor, cliente):
+        adquiridas = []
+        adquirir = cliente.limitador.adquirir
+
+        async def contar():
+            adquiridas.append(1)
+            await adquirir()
+
+        cliente.limitador.adquirir = contar
+        assert await proveedor.token("data:read") == "data:read-1"
+        assert await proveedor.token("data:read") == "data:read-1"
+        return len(adquiridas)
+
+    # El 503 del endpoint de tokens se reintenta; cada intento pasa por el limitador
+    assert _ejecutar(servidor, accion) == 2
+    assert servidor.peticiones["data:read"] == 1
+
+
+def test_renueva_en_segundo_plano_antes_de_caducar(servidor):
+    # Vida útil 3 s (4 - margen); la renovación empieza a partir de 1 s
+    servidor.expires_in = 4
+
+    async def accion(proveedor, cliente):
+        assert await proveedor.token("data:read") == "data:read-1"
+
+        await asyncio.sleep(1.2)
+        servidor.demora = 0.3
+        inicio = time.perf_counter()
+        # Sigue sirviendo el vigente sin esperar a la renovación
+        assert await proveedor.token("data:read") == "data:read-1"
+        assert time.perf_counter() - inicio < 0.2
+
+        limite = time.time() + 3
+        while servidor.peticiones["data:read"] < 2 and time.time() < limite:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.4)
+        assert await proveedor.token("data:read") == "data:read-2"
+        assert servidor.peticiones["data:read"] == 2
+
+    _ejecutar(servidor, accion, margen=1, ventana_refresco=2)
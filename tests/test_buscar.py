@@ -0,0 +1,67 @@
+from datos import payload_proyecto, sincronizar
+
+
+def _payload_dos_categorias():
+    payload = payload_proyecto(familias=2, tipos=1, elementos=2)
+    puertas = payload_proyecto(familias=1, tipos=1, elementos=3)["categorias"][0]
+    puertas["nombre"] = "Puertas"
+    puertas["familias"][0]["nombre"] = "Puerta simple"
+    for i, elemento in enumerate(puertas["familias"][0]["tipos_familia"][0]["elementos"]):
+        elemento["nombre"] = f"Puerta {i}"
+        elemento["revit_id"] = 100 + i
+    payload["categorias"].append(puertas)
+    return payload
+
+
+def _buscar(cliente, **parametros):
+    respuesta = cliente.get("/sync/buscar", params={"campos": "nombre", **parametros})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def _nombres(cliente, **parametros):
+    return [fila["nombre"] for fila in _buscar(cliente, **parametros)["resultados"]]
+
+
+def test_filtro_por_categoria(cliente, db):
+    sincronizar(cliente, _payload_dos_categorias())
+
+    assert _nombres(cliente, categoria="Puertas") == ["Puerta 0", "Puerta 1", "Puerta 2"]
+    assert _nombres(cliente, categoria="Muros", tipo="familia") == ["Muro 0", "Muro 1"]
+    assert _nombres(cliente, categoria="Ventanas") == []
+
+
+def test_filtro_por_familia(cliente, db):
+    sincronizar(cliente, _payload_dos_categorias())
+
+    assert _nombres(cliente, familia="Muro 1") == ["Elemento 1.0.0", "Elemento 1.0.1"]
+    assert _nombres(cliente, familia="Puerta simple", tipo="tipo") == ["Tipo 0.0"]
+
+
+def test_filtro_por_nombre_exacto_y_patron(cliente, db):
+    sincronizar(cliente, _payload_dos_categorias())
+
+    assert _nombres(cliente, nombre="Puerta 1") == ["Puerta 1"]
+    assert _nombres(cliente, nombre="Elemento 0.*") == ["Elemento 0.0.0", "Elemento 0.0.1"]
+    assert _nombres(cliente, nombre="Muro*", tipo="familia") == ["Muro 0", "Muro 1"]
+    # "_" y "%" son literales, no comodines de LIKE
+    assert _nombres(cliente, nombre="Puerta_0") == []
+
+
+def test_paginacion_por_cursor(cliente, db):
+    sincronizar(cliente, _payload_dos_categorias())
+
+    vistos, despues_de = [], None
+    while True:
+        parametros = {"limite": 3}
+        if despues_de is not None:
+            parametros["despues_de"] = despues_de
+        pagina = _buscar(cliente, **parametros)
+        vistos += [fila["nombre"] for fila in pagina["resultados"]]
+        despues_de = pagina["siguiente"]
+        if despues_de is None:
+            break
+        assert despues_de == pagina["resultados"][-1]["id"]
+
+    assert vistos == _nombres(cliente, limite=100)
+    assert len(vistos) == 7
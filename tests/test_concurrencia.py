@@ -0,0 +1,46 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.main import app
+from datos import payload_proyecto
+
+
+def test_la_app_puede_arrancar_dos_veces(db):
+    for nombre in ("Proyecto A", "Proyecto B"):
+        with TestClient(app) as cliente:
+            respuesta = cliente.post("/sync/revit/?esperar=true", json=payload_proyecto(nombre))
+            assert respuesta.status_code == 200, respuesta.text
+
+
+def test_una_sincronizacion_lenta_no_bloquea_otras_rutas(db, monkeypatch):
+    original = crud.sincronizar_desde_revit
+    empezada = threading.Event()
+
+    def sincronizar_lento(*args, **kwargs):
+        empezada.set()
+        time.sleep(1.5)  # trabajo de BD bloqueante
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "sincronizar_desde_revit", sincronizar_lento)
+    with TestClient(app) as cliente:
+        respuestas = []
+        hilo = threading.Thread(target=lambda: respuestas.append(
+            cliente.post("/sync/revit/?esperar=true", json=payload_proyecto())
+        ))
+        hilo.start()
+        assert empezada.wait(5)
+
+        latencias = []
+        for ruta in ("/", "/sync/metricas/auditoria", "/", "/sync/jobs/no-existe", "/"):
+            inicio = time.perf_counter()
+            cliente.get(ruta)
+            latencias.append(time.perf_counter() - inicio)
+        sigue_en_curso = hilo.is_alive()
+        hilo.join(10)
+
+    assert sigue_en_curso
+    assert max(latencias) < 0.5, latencias
+    assert respuestas[0].status_code == 200
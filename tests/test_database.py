@@ -0,0 +1,70 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+from sqlalchemy.pool import StaticPool
+
+from app import database
+
+URL_MSSQL = "mssql+pyodbc://u:p@servidor/bd?driver=ODBC+Driver+17+for+SQL+Server"
+
+
+@pytest.fixture
+def creados(monkeypatch):
+    """Sustituye create_engine: construye solo el pool del perfil, sobre SQLite en memoria."""
+    creados = {}
+
+    def create_engine_falso(url, poolclass, pool_size, max_overflow, pool_timeout, **opciones):
+        pool = poolclass(lambda: sqlite3.connect(":memory:"), pool_size=pool_size,
+                         max_overflow=max_overflow, timeout=pool_timeout)
+        creados[poolclass.metricas.perfil] = opciones
+        return SimpleNamespace(url=url, pool=pool)
+
+    monkeypatch.setattr(database, "_engines", {})
+    monkeypatch.setattr(database, "create_engine", create_engine_falso)
+    return creados
+
+
+def test_perfiles_y_fast_executemany(creados):
+    engines = {perfil: database.crear_engine(perfil, URL_MSSQL) for perfil in database.PERFILES}
+
+    assert database.crear_engine("bulk", URL_MSSQL) is engines["bulk"]
+    for perfil, engine in engines.items():
+        assert isinstance(engine.pool, database.PoolMedido)
+        assert engine.pool.size() == database.PERFILES[perfil]["pool_size"]
+        assert engine.pool.metricas.max_overflow == database.PERFILES[perfil]["max_overflow"]
+    assert creados["bulk"]["fast_executemany"] is True
+    assert creados["bulk"]["insertmanyvalues_page_size"] == database.PERFILES["bulk"]["insertmanyvalues_page_size"]
+    assert "fast_executemany" not in creados["oltp"] and "fast_executemany" not in creados["lectura"]
+
+    # Solo con el driver pyodbc
+    database.crear_engine("bulk", URL_MSSQL.replace("+pyodbc", "+pymssql"))
+    assert "fast_executemany" not in creados["bulk"]
+
+
+def test_sqlite_comparte_un_engine_entre_perfiles(monkeypatch):
+    monkeypatch.setattr(database, "_engines", {})
+    engine = database.crear_engine("oltp", "sqlite://")
+
+    assert database.crear_engine("bulk", "sqlite://") is engine
+    assert isinstance(engine.pool, StaticPool)
+    assert database.metricas_pools() == []
+
+
+def test_metricas_cuentan_checkouts_y_timeouts(creados, monkeypatch):
+    monkeypatch.setitem(database.PERFILES, "bulk", {**database.PERFILES["bulk"], "pool_size": 1, "pool_timeout": 0.05})
+    pool = database.crear_engine("bulk", URL_MSSQL).pool
+
+    conexion = pool.connect()
+    with pytest.raises(TimeoutPool):
+        pool.connect()
+    metricas = {m["perfil"]: m for m in database.metricas_pools()}["bulk"]
+    assert (metricas["checkouts"], metricas["timeouts"]) == (1, 1)
+    assert (metricas["tamano"], metricas["en_uso"], metricas["saturacion"]) == (1, 1, 1.0)
+
+    conexion.close()
+    pool.connect().close()
+    metricas = database.metricas_pools()[0]
+    assert (metricas["checkouts"], metricas["en_uso"], metricas["saturacion"]) == (2, 0, 0.0)
+    assert metricas["espera_max_ms"] >= metricas["espera_media_ms"] >= 0
@@ -0,0 +1,53 @@
+from sqlalchemy import func, select
+
+from app import models
+from datos import payload_proyecto, sincronizar
+
+
+def _elementos(db, proyecto):
+    return db.scalar(
+        select(func.count(models.Elemento.id))
+        .join(models.TipoFamilia, models.Elemento.tipo_familia_id == models.TipoFamilia.id)
+        .join(models.Familia, models.TipoFamilia.familia_id == models.Familia.id)
+        .join(models.Categoria, models.Familia.categoria_id == models.Categoria.id)
+        .join(models.Proyecto, models.Categoria.proyecto_id == models.Proyecto.id)
+        .where(models.Proyecto.nombre == proyecto)
+    )
+
+
+def test_lote_solo_borra_en_su_proyecto(cliente, db):
+    # Los dos modelos usan los mismos revit_id
+    sincronizar(cliente, payload_proyecto("Proyecto A"))
+    sincronizar(cliente, payload_proyecto("Proyecto B"))
+
+    respuesta = cliente.post("/sync/revit/delete/lote", json={
+        "proyecto": "Proyecto A",
+        "items": [{"tipo": "elemento", "revit_id": 1}, {"tipo": "elemento", "revit_id": 2}],
+    })
+
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["eliminados"] == {"elemento": 2}
+    assert _elementos(db, "Proyecto A") == 10
+    assert _elementos(db, "Proyecto B") == 12
+
+
+def test_borrado_individual_solo_en_su_proyecto(cliente, db):
+    sincronizar(cliente, payload_proyecto("Proyecto A"))
+    sincronizar(cliente, payload_proyecto("Proyecto B"))
+
+    respuesta = cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto B"})
+
+    assert respuesta.status_code == 200, respuesta.text
+    assert _elementos(db, "Proyecto A") == 12
+    assert _elementos(db, "Proyecto B") == 11
+
+
+def test_sin_proyecto_responde_400_y_no_borra(cliente, db):
+    sincronizar(cliente, payload_proyecto("Proyecto A"))
+
+    lote = cliente.post("/sync/revit/delete/lote", json={"items": [{"tipo": "elemento", "revit_id": 1}]})
+    individual = cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1})
+
+    assert lote.status_code == 400
+    assert individual.status_code == 400
+    assert _elementos(db, "Proyecto A") == 12
@@ -0,0 +1,56 @@
+from app import crud, database
+from datos import payload_proyecto, sincronizar
+
+
+def test_exportar_usa_una_consulta_por_nivel(cliente, db, sentencias):
+    for nombre in ("Proyecto A", "Proyecto B", "Proyecto C"):
+        sincronizar(cliente, payload_proyecto(nombre))
+    sentencias.clear()
+
+    proyectos = crud._exportar_proyectos(db)
+
+    # proyectos + categorías + familias + tipos + elementos, sea cual sea el tamaño
+    assert len(sentencias) == 5
+    assert [p["nombre"] for p in proyectos] == ["Proyecto A", "Proyecto B", "Proyecto C"]
+    elementos = [e for p in proyectos for c in p["categorias"] for f in c["familias"]
+                 for t in f["tipos_familia"] for e in t["elementos"]]
+    assert len(elementos) == 36
+
+
+def test_iterar_proyectos_consulta_por_pagina(cliente, db, sentencias):
+    for i in range(5):
+        sincronizar(cliente, payload_proyecto(f"Proyecto {i}", familias=1, tipos=1, elementos=1))
+    sentencias.clear()
+
+    proyectos = list(crud.iterar_proyectos(db, tamano_pagina=2))
+
+    # 1 consulta de IDs + 5 por cada una de las 3 páginas
+    assert len(sentencias) == 1 + 5 * 3
+    assert [p["nombre"] for p in proyectos] == [f"Proyecto {i}" for i in range(5)]
+
+
+def test_sync_sql_usa_la_sesion_de_la_peticion_en_ambas_ramas(cliente, monkeypatch):
+    sincronizar(cliente, payload_proyecto())
+    sesiones, fabrica = [], database.SessionLectura
+
+    def get_db_lectura():
+        db = fabrica()
+        sesiones.append(db)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    cliente.app.dependency_overrides[database.get_db_lectura] = get_db_lectura
+    try:
+        # Ninguna rama abre sesiones por su cuenta
+        monkeypatch.setattr(database, "SessionLectura", None)
+        completo = cliente.get("/sync/sql/")
+        cambios = cliente.get("/sync/sql/", params={"since": 0})
+    finally:
+        cliente.app.dependency_overrides.pop(database.get_db_lectura)
+
+    assert [p["nombre"] for p in completo.json()["proyectos"]] == ["Proyecto A"]
+    assert cambios.json()["token"] == completo.json()["token"]
+    assert len(sesiones) == 2
+    assert not any(db.in_transaction() for db in sesiones)
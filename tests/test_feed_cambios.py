@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+
+from fastapi import WebSocketDisconnect
+from sqlalchemy import select
+
+from app import crud, feed_cambios, models, routes
+from app.ws_manager import manager
+from datos import payload_proyecto, sincronizar
+
+
+class _SocketFalso:
+    def __init__(self, mensajes):
+        self.mensajes = list(mensajes)
+        self.recibidos = []
+        self.cerrar = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        if self.mensajes:
+            return self.mensajes.pop(0)
+        await self.cerrar.wait()
+        raise WebSocketDisconnect()
+
+    async def send_text(self, texto):
+        self.recibidos.append(json.loads(texto))
+
+
+def test_reanudacion_llega_antes_que_lo_publicado_en_vivo(cliente, db, monkeypatch):
+    sincronizar(cliente, payload_proyecto(modo="reconciliar"))
+    proyecto_id = db.scalar(select(models.Proyecto.id))
+    v1 = crud.version_actual(db)
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+    v2 = crud.version_actual(db)
+    assert v2 > v1
+
+    # La lectura de la reanudación (hasta v1) espera a que la liberemos
+    liberar = threading.Event()
+    leer_cambios = feed_cambios._leer_cambios
+
+    def leer_lento(desde, proyectos, hasta=None):
+        if hasta == v1:
+            liberar.wait(5)
+        return leer_cambios(desde, proyectos, hasta)
+
+    monkeypatch.setattr(feed_cambios, "_leer_cambios", leer_lento)
+    feed = feed_cambios.FeedCambios(intervalo_sondeo=3600, retencion_lapidas_dias=0)
+    monkeypatch.setattr(routes, "feed", feed)
+
+    async def escenario():
+        await feed.iniciar()
+        feed.cursor = v1  # el feed aún no ha repartido el borrado
+        socket = _SocketFalso([{"accion": "suscribir", "proyectos": [proyecto_id], "desde": 0}])
+        ruta = asyncio.create_task(routes.feed_de_cambios(socket))
+        while not socket.recibidos:
+            await asyncio.sleep(0.01)
+
+        # El reparto en vivo de (v1, v2] coincide con la reanudación de (0, v1]
+        publicacion = asyncio.create_task(feed._publicar_pendientes())
+        await asyncio.sleep(0.2)
+        recibidos_antes = list(socket.recibidos)
+        liberar.set()
+        await publicacion
+        while len(socket.recibidos) < 3:
+            await asyncio.sleep(0.01)
+
+        socket.cerrar.set()
+        await ruta
+        await feed.detener()
+        return recibidos_antes, socket.recibidos
+
+    recibidos_antes, recibidos = asyncio.run(escenario())
+
+    assert [m["tipo"] for m in recibidos_antes] == ["suscrito"]
+    assert recibidos[0] == {"tipo": "suscrito", "proyectos": [proyecto_id], "version": v1}
+    reanudado, en_vivo = recibidos[1:]
+    assert reanudado["reanudacion"] and (reanudado["desde"], reanudado["version"]) == (0, v1)
+    assert "reanudacion" not in en_vivo and (en_vivo["desde"], en_vivo["version"]) == (v1, v2)
+    assert [e["revit_id"] for e in en_vivo["eliminados"]] == [1]
+    assert manager.temas_activos() == []
@@ -0,0 +1,32 @@
+from sqlalchemy import func, select
+
+from app import models
+from datos import payload_proyecto, sincronizar
+
+
+def test_since_anterior_a_la_purga_responde_410(cliente, db):
+    sincronizar(cliente, payload_proyecto(modo="reconciliar"))
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+
+    delta = cliente.get("/sync/sql/", params={"since": 1})
+    assert delta.status_code == 200
+    assert [e["revit_id"] for e in delta.json()["eliminados"]] == [1]
+    token = delta.json()["token"]
+
+    purga = cliente.post("/sync/lapidas/purgar", params={"dias": 0})
+
+    assert purga.status_code == 200, purga.text
+    assert purga.json() == {"status": "ok", "purgadas": 1, "minimo": token}
+    assert db.scalar(select(func.count(models.Eliminacion.id))) == 0
+    assert cliente.get("/sync/sql/", params={"since": 1}).status_code == 410
+    assert cliente.get("/sync/sql/", params={"since": token}).status_code == 200
+
+
+def test_purga_respeta_la_retencion(cliente, db):
+    sincronizar(cliente, payload_proyecto(modo="reconciliar"))
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+
+    purga = cliente.post("/sync/lapidas/purgar", params={"dias": 7})
+
+    assert purga.json()["purgadas"] == 0
+    assert cliente.get("/sync/sql/", params={"since": 0}).status_code == 200
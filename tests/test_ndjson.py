@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, models, routes, schemas
+
+
+CABECERA = {"nombre": "Proyecto NDJSON", "horas": 1, "usuario": {"nombre": "Ana", "correo": "ana@example.com"}}
+
+
+def _nodos(familias=3, elementos=4):
+    yield {"tipo": "categoria", "id": "c1", "nombre": "Muros"}
+    for f in range(familias):
+        yield {"tipo": "familia", "id": f"f{f}", "padre": "c1", "nombre": f"Muro {f}", "revit_id": f + 1}
+        yield {"tipo": "tipo", "id": f"t{f}", "padre": f"f{f}", "nombre": f"Tipo {f}", "revit_id": f + 1}
+        for e in range(elementos):
+            yield {"tipo": "elemento", "padre": f"t{f}", "nombre": f"Elemento {f}.{e}",
+                   "revit_id": f * elementos + e + 1}
+
+
+def test_agregar_no_toca_la_bd_hasta_cerrar(db, sentencias):
+    ingesta = crud.IngestaNDJSON(db, schemas.ProyectoSyncCabecera(**CABECERA), tamano_lote=2)
+    for nodo in _nodos():
+        ingesta.agregar(schemas.NodoSync(**nodo))
+    assert sentencias == []
+
+    resultado = ingesta.cerrar()
+
+    assert resultado["insertados"] == {"categoria": 1, "familia": 3, "tipo": 3, "elemento": 12}
+    assert db.scalar(select(func.count(models.Elemento.id))) == 12
+
+
+def test_nodo_invalido_falla_sin_tocar_la_bd(db, sentencias):
+    ingesta = crud.IngestaNDJSON(db, schemas.ProyectoSyncCabecera(**CABECERA))
+    ingesta.agregar(schemas.NodoSync(tipo="categoria", id="c1", nombre="Muros"))
+    with pytest.raises(ValueError, match="desconocido"):
+        ingesta.agregar(schemas.NodoSync(tipo="familia", id="f1", padre="c9", nombre="Muro"))
+    ingesta.descartar()
+    assert sentencias == []
+
+
+def test_endpoint_ndjson(cliente, db):
+    cuerpo = "\n".join(json.dumps(linea) for linea in [CABECERA, *_nodos()])
+
+    respuesta = cliente.post("/sync/revit/", content=cuerpo, headers={"content-type": "application/x-ndjson"})
+
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["detalle"]["insertados"]["elemento"] == 12
+    assert db.scalar(select(func.min(models.Elemento.version))) > 0
+
+
+class _PeticionPorFragmentos:
+    def __init__(self, cuerpo: bytes, tamano: int):
+        self.fragmentos = [cuerpo[i:i + tamano] for i in range(0, len(cuerpo), tamano)]
+
+    async def stream(self):
+        for fragmento in self.fragmentos:
+            yield fragmento
+
+
+def _leer_lineas(cuerpo: bytes, tamano: int):
+    async def leer():
+        return [linea async for linea in routes._lineas_ndjson(_PeticionPorFragmentos(cuerpo, tamano))]
+
+    return asyncio.run(leer())
+
+
+def test_lineas_ndjson_independientes_del_tamano_de_fragmento():
+    cuerpo = b'{"a": 1}\n\n{"b": "' + b"x" * 5000 + b'"}\r\n{"c": 3}'
+    esperado = [(1, {"a": 1}), (3, {"b": "x" * 5000}), (4, {"c": 3})]
+
+    for tamano in (1, 7, 64, len(cuerpo)):
+        assert _leer_lineas(cuerpo, tamano) == esperado
+
+
+def test_json_no_valido_indica_su_propia_linea(cliente, db):
+    lineas = [json.dumps(CABECERA), json.dumps({"tipo": "categoria", "id": "c1", "nombre": "Muros"}), "{roto"]
+
+    respuesta = cliente.post("/sync/revit/", content="\n".join(lineas), headers={"content-type": "application/x-ndjson"})
+
+    assert respuesta.status_code == 422
+    assert respuesta.json()["detail"].startswith("Línea 3: JSON no válido")
+
+
+def test_ndjson_guarda_huellas_de_subarbol_como_json(cliente, db):
+    cuerpo = "\n".join(json.dumps(linea) for linea in [CABECERA, *_nodos()])
+    respuesta = cliente.post("/sync/revit/", content=cuerpo, headers={"content-type": "application/x-ndjson"})
+    assert respuesta.status_code == 200, respuesta.text
+
+    # El mismo árbol en JSON, reconciliando: nada cambió, todo se poda
+    payload = {**CABECERA, "modo": "reconciliar", "categorias": [{
+        "nombre": "Muros",
+        "familias": [{
+            "nombre": f"Muro {f}", "revit_id": f + 1,
+            "tipos_familia": [{
+                "nombre": f"Tipo {f}", "revit_id": f + 1,
+                "elementos": [{"nombre": f"Elemento {f}.{e}", "revit_id": f * 4 + e + 1} for e in range(4)],
+            }],
+        } for f in range(3)],
+    }]}
+    respuesta = cliente.post("/sync/revit/?esperar=true", json=payload)
+    assert respuesta.status_code == 200, respuesta.text
+    detalle = respuesta.json()["detalle"]
+    assert detalle["cambios"]["categorias"]["omitidos"] == 1
+    assert detalle["cambios"]["familias"] == {"insertados": 0, "actualizados": 0, "eliminados": 0, "omitidos": 0}
+    assert None not in set(db.scalars(select(models.TipoFamilia.hash_subarbol)))
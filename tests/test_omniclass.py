@@ -0,0 +1,73 @@
+from sqlalchemy import select
+
+from app import crud, models
+from datos import payload_proyecto, sincronizar
+
+
+def _conteos(db):
+    Conteo = models.ConteoOmniclass
+    return sorted(
+        (c.codigo, c.padre, c.nivel, c.categorias, c.familias, c.tipos_familia, c.elementos)
+        for c in db.scalars(select(Conteo))
+    )
+
+
+def _con_codigos(payload):
+    """Elementos con códigos escritos de formas distintas."""
+    codigos = ["23.13.11.00", "23-13 12", "23-130", None]
+    tipos = [t for f in payload["categorias"][0]["familias"] for t in f["tipos_familia"]]
+    for i, elemento in enumerate(e for t in tipos for e in t["elementos"]):
+        elemento["omniclass"] = codigos[i % len(codigos)]
+    return payload
+
+
+def test_los_cambios_aplican_diferencias_iguales_al_recalculo(cliente, db):
+    payload = _con_codigos(payload_proyecto(modo="reconciliar"))
+    sincronizar(cliente, payload)
+
+    # Cambia el código de una familia y de un elemento, y desaparece un tipo
+    familia = payload["categorias"][0]["familias"][0]
+    familia["omniclass"] = "21-03"
+    familia["tipos_familia"][0]["elementos"][0]["omniclass"] = "23-13-12"
+    del familia["tipos_familia"][1]
+    sincronizar(cliente, payload)
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 12, "proyecto": "Proyecto A"})
+
+    incremental = _conteos(db)
+    crud.reconstruir_omniclass(db)
+    db.expire_all()
+
+    assert incremental == _conteos(db)
+    assert ("21-03", "21", 2, 0, 1, 0, 0) in incremental
+    assert "21-02-10-10-10" in {c[0] for c in incremental}
+
+
+def test_borrar_no_recalcula_el_proyecto(cliente, db, sentencias):
+    sincronizar(cliente, _con_codigos(payload_proyecto(modo="reconciliar")))
+    sentencias.clear()
+
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+
+    agrupadas = [s for s in sentencias if "GROUP BY" in s and "omniclass_codigo" in s]
+    assert len(agrupadas) == 1
+    assert "FROM elementos" in agrupadas[0]
+    assert not any(s.startswith("DELETE FROM omniclass_conteos WHERE omniclass_conteos.proyecto_id = ?") and
+                   "codigo" not in s for s in sentencias)
+    elementos = {c[0]: c[6] for c in _conteos(db)}
+    assert elementos["23-13-11"] == 2
+
+
+def test_buscar_normaliza_el_prefijo_como_el_arbol(cliente, db):
+    sincronizar(cliente, _con_codigos(payload_proyecto()))
+
+    def revit_ids(prefijo):
+        respuesta = cliente.get("/sync/buscar", params={"omniclass": prefijo, "campos": "revit_id"})
+        assert respuesta.status_code == 200, respuesta.text
+        return sorted(r["revit_id"] for r in respuesta.json()["resultados"])
+
+    arbol = cliente.get("/sync/omniclass/1", params={"prefijo": "23.13"}).json()["arbol"]
+
+    assert revit_ids("23-13") == revit_ids("23.13") == revit_ids("23 13 00") == [1, 2, 5, 6, 9, 10]
+    assert arbol[0]["elementos"] == 6
+    assert revit_ids("23-130") == [3, 7, 11]
+    assert cliente.get("/sync/buscar", params={"omniclass": "Puertas"}).status_code == 400
@@ -0,0 +1,59 @@
+import json
+
+from sqlalchemy import update
+
+from app import models
+from datos import payload_proyecto, sincronizar
+
+
+def _buscar(cliente, *filtros, tipo="elemento"):
+    respuesta = cliente.get("/sync/parametros", params={"filtro": list(filtros), "tipo": tipo})
+    assert respuesta.status_code == 200, respuesta.text
+    return [fila["nombre"] for fila in respuesta.json()["resultados"]]
+
+
+def _payload_con_anchos():
+    payload = payload_proyecto(familias=1, tipos=1, elementos=4)
+    for i, elemento in enumerate(payload["categorias"][0]["familias"][0]["tipos_familia"][0]["elementos"]):
+        elemento["parametros"] = json.dumps({"Width": 100 * (i + 1), "Mark": f"M-{i}"})
+    return payload
+
+
+def test_busca_por_texto_en_blobs_clave_valor(cliente, db):
+    sincronizar(cliente, payload_proyecto(familias=2, tipos=2))
+
+    # Los tipos traen "FireRating=2h", sin JSON
+    assert _buscar(cliente, "FireRating=2h", tipo="tipo") == ["Tipo 0.0", "Tipo 0.1", "Tipo 1.0", "Tipo 1.1"]
+    assert _buscar(cliente, "FireRating^=2", tipo="tipo") == ["Tipo 0.0", "Tipo 0.1", "Tipo 1.0", "Tipo 1.1"]
+    assert _buscar(cliente, "FireRating=1h", tipo="tipo") == []
+
+
+def test_busca_por_valor_numerico(cliente, db):
+    sincronizar(cliente, _payload_con_anchos())
+
+    assert _buscar(cliente, "Width>=300") == ["Elemento 0.0.2", "Elemento 0.0.3"]
+    assert _buscar(cliente, "Width=200") == ["Elemento 0.0.1"]
+    assert _buscar(cliente, "Width<300", "Mark=M-0") == ["Elemento 0.0.0"]
+
+    respuesta = cliente.get("/sync/parametros", params={"filtro": "Width>ancho"})
+    assert respuesta.status_code == 400
+
+
+def test_reconstruir_reindexa_tras_cambiar_el_blob(cliente, db):
+    sincronizar(cliente, payload_proyecto(familias=1, tipos=2))
+
+    # Cambio escrito fuera de la API: el índice queda desfasado
+    db.execute(
+        update(models.TipoFamilia).where(models.TipoFamilia.nombre == "Tipo 0.1")
+        .values(parametros="FireRating=1h|Width=250")
+    )
+    db.commit()
+    assert _buscar(cliente, "FireRating=1h", tipo="tipo") == []
+
+    respuesta = cliente.post("/sync/parametros/reconstruir")
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["parametros_indexados"] == 3
+
+    assert _buscar(cliente, "FireRating=1h", tipo="tipo") == ["Tipo 0.1"]
+    assert _buscar(cliente, "FireRating=2h", tipo="tipo") == ["Tipo 0.0"]
+    assert _buscar(cliente, "Width>200", tipo="tipo") == ["Tipo 0.1"]
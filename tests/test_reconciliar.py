@@ -0,0 +1,110 @@
+from sqlalchemy import func, select
+
+from app import crud, models
+from datos import payload_proyecto, sincronizar
+
+
+def test_resync_restaura_elemento_borrado(cliente, db):
+    payload = payload_proyecto(modo="reconciliar")
+    sincronizar(cliente, payload)
+
+    respuesta = cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+    assert respuesta.status_code == 200, respuesta.text
+    assert db.scalar(select(models.Elemento.id).where(models.Elemento.revit_id == 1)) is None
+
+    resultado = sincronizar(cliente, payload)
+
+    # Sin invalidar las huellas de los ancestros, la categoría se podaba
+    # entera y el elemento no volvía
+    assert resultado["cambios"]["elementos"]["insertados"] == 1
+    assert db.scalar(select(models.Elemento.id).where(models.Elemento.revit_id == 1)) is not None
+
+
+def test_resync_deshace_revit_id_escrito_por_write_back(cliente, db):
+    payload = payload_proyecto(modo="reconciliar")
+    sincronizar(cliente, payload)
+    tipo_id = db.scalar(select(models.TipoFamilia.id).where(models.TipoFamilia.revit_id == 1))
+
+    respuesta = cliente.post("/sync/revit/ids", json=[{"tipo": "tipo", "id_sql": tipo_id, "revit_id": 99}])
+    assert respuesta.status_code == 200, respuesta.text
+
+    sincronizar(cliente, payload)
+
+    revit_ids = set(db.scalars(select(models.TipoFamilia.revit_id)))
+    assert revit_ids == {1, 2, 3, 4}
+
+
+def test_cambio_en_una_hoja_no_versiona_a_sus_ancestros(cliente, db):
+    payload = payload_proyecto(modo="reconciliar")
+    sincronizar(cliente, payload)
+    desde = crud.version_actual(db)
+    huella_categoria = db.scalar(select(models.Categoria.hash_subarbol))
+    versiones = {
+        modelo: dict(db.execute(select(modelo.id, modelo.version)).all())
+        for modelo in (models.Categoria, models.Familia, models.TipoFamilia)
+    }
+
+    payload["categorias"][0]["familias"][0]["tipos_familia"][0]["elementos"][0]["nombre"] = "Elemento renombrado"
+    resultado = sincronizar(cliente, payload)
+
+    for nivel in ("categorias", "familias", "tipos_familia"):
+        assert resultado["cambios"][nivel]["actualizados"] == 0
+    assert resultado["cambios"]["elementos"]["actualizados"] == 1
+    db.expire_all()
+    for modelo, anteriores in versiones.items():
+        assert dict(db.execute(select(modelo.id, modelo.version)).all()) == anteriores
+
+    # La huella nueva sí se guarda, para podar en la próxima sincronización
+    assert db.scalar(select(models.Categoria.hash_subarbol)) != huella_categoria
+    delta = crud.exportar_cambios(db, desde)["cambios"]
+    assert [fila["nombre"] for fila in delta["elementos"]] == ["Elemento renombrado"]
+    assert delta["categorias"] == delta["familias"] == delta["tipos_familia"] == []
+
+    resultado = sincronizar(cliente, payload)
+    assert resultado["cambios"]["categorias"]["omitidos"] == 1
+    assert resultado["cambios"]["elementos"]["omitidos"] == 0
+
+
+def _contadores(resultado):
+    return {
+        nivel: (c["insertados"], c["actualizados"], c["eliminados"])
+        for nivel, c in resultado["cambios"].items()
+    }
+
+
+def test_reconciliar_cambio_de_una_hoja_cuenta_solo_esa_hoja(cliente, db):
+    payload = payload_proyecto(modo="reconciliar")
+    sincronizar(cliente, payload)
+
+    payload["categorias"][0]["familias"][1]["tipos_familia"][1]["elementos"][2]["nombre"] = "Elemento nuevo nombre"
+    resultado = sincronizar(cliente, payload)
+
+    assert _contadores(resultado) == {
+        "categorias": (0, 0, 0),
+        "familias": (0, 0, 0),
+        "tipos_familia": (0, 0, 0),
+        "elementos": (0, 1, 0),
+    }
+
+
+def test_reconciliar_hoja_movida_de_padre_es_una_actualizacion(cliente, db):
+    payload = payload_proyecto(modo="reconciliar")
+    sincronizar(cliente, payload)
+    elemento_id = db.scalar(select(models.Elemento.id).where(models.Elemento.revit_id == 1))
+
+    tipos = payload["categorias"][0]["familias"][1]["tipos_familia"]
+    origen = payload["categorias"][0]["familias"][0]["tipos_familia"][0]["elementos"]
+    tipos[0]["elementos"].append(origen.pop(0))
+    resultado = sincronizar(cliente, payload)
+
+    assert _contadores(resultado) == {
+        "categorias": (0, 0, 0),
+        "familias": (0, 0, 0),
+        "tipos_familia": (0, 0, 0),
+        "elementos": (0, 1, 0),
+    }
+    db.expire_all()
+    elemento = db.get(models.Elemento, elemento_id)
+    assert elemento.revit_id == 1
+    assert db.get(models.TipoFamilia, elemento.tipo_familia_id).revit_id == 3
+    assert db.scalar(select(func.count()).select_from(models.Elemento)) == 12
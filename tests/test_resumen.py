@@ -0,0 +1,87 @@
+from sqlalchemy import delete, select
+
+from app import models
+from datos import payload_proyecto, sincronizar
+
+
+def _verificar(cliente, proyecto_id=None):
+    parametros = {} if proyecto_id is None else {"proyecto_id": proyecto_id}
+    respuesta = cliente.get("/sync/resumen/verificar", params=parametros)
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def _totales(cliente, proyecto_id):
+    respuesta = cliente.get(f"/sync/resumen/proyectos/{proyecto_id}")
+    assert respuesta.status_code == 200, respuesta.text
+    proyecto = respuesta.json()["proyecto"]
+    return proyecto["familias"], proyecto["tipos_familia"], proyecto["elementos"]
+
+
+def _proyecto_id(db, nombre="Proyecto A"):
+    return db.scalar(select(models.Proyecto.id).where(models.Proyecto.nombre == nombre))
+
+
+def test_resumen_consistente_tras_reemplazar_y_reconciliar(cliente, db):
+    sincronizar(cliente, payload_proyecto(familias=2, tipos=2, elementos=3))
+    proyecto_id = _proyecto_id(db)
+    assert _verificar(cliente)["consistente"]
+    assert _totales(cliente, proyecto_id) == (2, 4, 12)
+
+    # Reemplazar con otra forma
+    sincronizar(cliente, payload_proyecto(familias=3, tipos=1, elementos=2))
+    assert _verificar(cliente)["consistente"]
+    assert _totales(cliente, proyecto_id) == (3, 3, 6)
+
+    # Reconciliar: un elemento menos y una familia nueva
+    payload = payload_proyecto(modo="reconciliar", familias=4, tipos=1, elementos=2)
+    payload["categorias"][0]["familias"][0]["tipos_familia"][0]["elementos"].pop()
+    sincronizar(cliente, payload)
+    assert _verificar(cliente, proyecto_id)["consistente"]
+    assert _totales(cliente, proyecto_id) == (4, 4, 7)
+
+
+def test_resumen_consistente_tras_borrar(cliente, db):
+    sincronizar(cliente, payload_proyecto("Proyecto A"))
+    sincronizar(cliente, payload_proyecto("Proyecto B"))
+    proyecto_id = _proyecto_id(db)
+
+    respuesta = cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+    assert respuesta.status_code == 200, respuesta.text
+    assert _verificar(cliente)["consistente"]
+    assert _totales(cliente, proyecto_id) == (2, 4, 11)
+
+    respuesta = cliente.post("/sync/revit/delete/lote", json={
+        "proyecto": "Proyecto A",
+        "items": [{"tipo": "familia", "revit_id": 1}, {"tipo": "elemento", "revit_id": 12}],
+    })
+    assert respuesta.status_code == 200, respuesta.text
+    assert _verificar(cliente)["consistente"]
+    assert _totales(cliente, proyecto_id) == (1, 2, 5)
+    assert _totales(cliente, _proyecto_id(db, "Proyecto B")) == (2, 4, 12)
+
+
+def test_reconstruir_resumen_repara_las_tablas(cliente, db):
+    sincronizar(cliente, payload_proyecto("Proyecto A"))
+    sincronizar(cliente, payload_proyecto("Proyecto B"))
+    proyecto_id = _proyecto_id(db)
+
+    # Resúmenes perdidos por una escritura fuera de la API
+    db.execute(delete(models.ResumenFamilia))
+    db.execute(delete(models.ResumenProyecto).where(models.ResumenProyecto.proyecto_id == proyecto_id))
+    db.commit()
+    verificacion = _verificar(cliente)
+    assert not verificacion["consistente"]
+    assert verificacion["familias"] and verificacion["proyectos"]
+
+    respuesta = cliente.post("/sync/resumen/reconstruir", params={"proyecto_id": proyecto_id})
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json() == {"status": "ok", "proyectos": 1, "usuarios": 1}
+    assert _verificar(cliente, proyecto_id)["consistente"]
+    assert not _verificar(cliente)["consistente"]
+
+    respuesta = cliente.post("/sync/resumen/reconstruir")
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["proyectos"] == 2
+    assert _verificar(cliente)["consistente"]
+    assert _totales(cliente, proyecto_id) == (2, 4, 12)
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app import crud, models, scheduler
+
+
+class _RelojAdelantado(datetime):
+    """Reloj de un worker que va un día por delante."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(days=1)
+
+    @classmethod
+    def utcnow(cls):
+        return datetime.utcnow() + timedelta(days=1)
+
+
+def test_el_lease_usa_la_hora_de_la_bd(db, monkeypatch):
+    assert crud.adquirir_bloqueo(db, "sync_tandem", "a", ttl=60)
+
+    # Un reloj local adelantado no da por caducado el lease del líder
+    monkeypatch.setattr(crud, "datetime", _RelojAdelantado)
+    assert not crud.adquirir_bloqueo(db, "sync_tandem", "b", ttl=60)
+    assert crud.adquirir_bloqueo(db, "sync_tandem", "a", ttl=60)
+
+    db.execute(update(models.BloqueoScheduler).values(expira=crud._ahora_bd(-1)))
+    db.commit()
+    assert crud.adquirir_bloqueo(db, "sync_tandem", "b", ttl=60)
+    assert crud.obtener_bloqueo(db, "sync_tandem")["propietario"] == "b"
+
+
+def test_ejecutar_en_un_worker_no_lider_queda_en_cola(cliente, db, monkeypatch):
+    ejecuciones = []
+
+    async def sync_falso(ejecutor=None):
+        ejecuciones.append(ejecutor)
+        return {"insertados": 0, "actualizados": 0}
+
+    monkeypatch.setattr(scheduler, "sync_tandem_task", sync_falso)
+    lider = scheduler.PlanificadorTandem()
+    assert crud.adquirir_bloqueo(db, lider.nombre_bloqueo, lider.id, ttl=lider.ttl)
+
+    primera = cliente.post("/sync/tandem/ejecutar")
+    segunda = cliente.post("/sync/tandem/ejecutar")
+
+    assert primera.status_code == 202, primera.text
+    assert primera.json()["status"] == "en_cola"
+    assert primera.json()["lider"]["propietario"] == lider.id
+    assert segunda.json()["status"] == "ya_en_cola"
+
+    async def latidos():
+        await lider._latido()
+        await lider._en_curso
+        await lider._latido()
+
+    asyncio.run(latidos())
+
+    assert lider.es_lider
+    assert ejecuciones == [lider.id]
+    assert lider.ultimo_resultado == {"insertados": 0, "actualizados": 0}
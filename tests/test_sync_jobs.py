@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi import WebSocketDisconnect
+
+from app import crud, routes, schemas, sync_jobs
+from app.feed_cambios import tema_proyecto
+from app.ws_manager import manager
+from datos import payload_proyecto
+
+
+def _proyecto(nombre, orden):
+    return schemas.ProyectoSync(nombre=nombre, horas=orden, usuario={"nombre": "Ana", "correo": "ana@example.com"},
+                                categorias=[])
+
+
+def test_orden_por_proyecto_sin_bloquear_otros(db, monkeypatch):
+    eventos, en_curso = [], set()
+    lock = threading.Lock()
+
+    def sincronizar_lento(sesion, proyecto_sync, progreso=None):
+        clave = proyecto_sync.nombre
+        with lock:
+            assert clave not in en_curso, f"dos trabajos de {clave} a la vez"
+            en_curso.add(clave)
+            eventos.append(("inicio", clave, proyecto_sync.horas))
+        time.sleep(0.05)
+        with lock:
+            en_curso.discard(clave)
+            eventos.append(("fin", clave, proyecto_sync.horas))
+        return {"proyecto": clave, "usuario": "Ana"}
+
+    monkeypatch.setattr(crud, "sincronizar_desde_revit", sincronizar_lento)
+    cola = sync_jobs.ColaSyncLocal(trabajadores=4)
+    try:
+        trabajos = [cola.encolar(_proyecto("A", i)) for i in range(5)]
+        trabajos += [cola.encolar(_proyecto("B", i)) for i in range(2)]
+        limite = time.time() + 10
+        while any(t.estado in ("en_cola", "en_proceso") for t in trabajos) and time.time() < limite:
+            time.sleep(0.01)
+    finally:
+        cola.detener(timeout=5)
+
+    assert all(t.estado == "completado" for t in trabajos)
+    inicios_a = [orden for evento, clave, orden in eventos if evento == "inicio" and clave == "A"]
+    assert inicios_a == [0, 1, 2, 3, 4]
+    # B no espera detrás de la cola de A
+    fin_b = max(i for i, (evento, clave, _) in enumerate(eventos) if evento == "fin" and clave == "B")
+    ultimo_a = eventos.index(("inicio", "A", 4))
+    assert fin_b < ultimo_a
+
+
+def test_cola_llena_responde_429(cliente, monkeypatch):
+    # Sin trabajadores: lo encolado se queda esperando
+    monkeypatch.setattr(sync_jobs, "cola", sync_jobs.ColaSyncLocal(trabajadores=0, max_por_proyecto=2))
+
+    estados = [cliente.post("/sync/revit/", json=payload_proyecto()).status_code for _ in range(3)]
+    otro = cliente.post("/sync/revit/", json=payload_proyecto(nombre="Proyecto B"))
+
+    assert estados == [202, 202, 429]
+    assert otro.status_code == 202
+    respuesta = cliente.post("/sync/revit/", json=payload_proyecto())
+    assert "Proyecto A" in respuesta.json()["detail"]
+    assert len(sync_jobs.cola._trabajos) == 3
+
+
+class _SocketFalso:
+    def __init__(self):
+        self.recibidos = []
+        self.cerrar = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        await self.cerrar.wait()
+        raise WebSocketDisconnect()
+
+    async def send_text(self, texto):
+        self.recibidos.append(json.loads(texto))
+
+
+def test_eventos_de_trabajos_solo_a_sus_suscriptores():
+    async def escenario():
+        todos, de_a, de_b, feed = (_SocketFalso() for _ in range(4))
+        canales = [
+            asyncio.create_task(routes.eventos_sync(todos)),
+            asyncio.create_task(routes.eventos_sync(de_a, proyecto="A")),
+            asyncio.create_task(routes.eventos_sync(de_b, proyecto="B")),
+        ]
+        # Un cliente del feed de cambios suscrito a un proyecto
+        await manager.connect(feed)
+        manager.suscribir(feed, tema_proyecto(1))
+        await asyncio.sleep(0)
+
+        cola = sync_jobs.ColaSyncLocal(trabajadores=0)
+        cola._loop = asyncio.get_running_loop()
+        cola._publicar(sync_jobs.TrabajoSync(_proyecto("A", 0)), "encolado")
+        await asyncio.sleep(0.05)
+
+        for socket in (todos, de_a, de_b):
+            socket.cerrar.set()
+        await asyncio.gather(*canales)
+        manager.disconnect(feed)
+        return todos.recibidos, de_a.recibidos, de_b.recibidos, feed.recibidos
+
+    todos, de_a, de_b, feed = asyncio.run(escenario())
+
+    assert [(m["evento"], m["proyecto"]) for m in todos] == [("encolado", "A")]
+    assert de_a == todos
+    assert de_b == [] and feed == []
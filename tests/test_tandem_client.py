@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+from app.tandem_client import TandemClient
+
+
+@pytest.fixture(autouse=True)
+def token_fijo(monkeypatch):
+    async def token(self):
+        return "token-de-prueba"
+
+    monkeypatch.setattr(TandemClient, "_token", token)
+
+
+def _respuesta(estado, cuerpo=None, cabeceras=None, demora=0.0):
+    return {"estado": estado, "cuerpo": cuerpo, "cabeceras": cabeceras or {}, "demora": demora}
+
+
+class _ServidorGuion(ThreadingHTTPServer):
+    """
+    API falsa: contesta las respuestas del ``guion`` en orden y anota cada
+    petición. Se enlaza al puerto al crearse pero no escucha hasta
+    ``arrancar``: antes, las conexiones se rechazan.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, guion):
+        super().__init__(("127.0.0.1", 0), _Manejador, bind_and_activate=False)
+        self.server_bind()
+        self.guion = list(guion)
+        self.peticiones = []
+        self.activo = False
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def arrancar(self):
+        self.server_activate()
+        self.activo = True
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def handle_error(self, request, client_address):
+        pass  # el cliente cortó la conexión (timeout)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def _atender(self):
+        ruta = urlsplit(self.path)
+        self.server.peticiones.append({"metodo": self.command, "ruta": ruta.path,
+                                       "params": parse_qs(ruta.query), "cabeceras": dict(self.headers)})
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        respuesta = self.server.guion.pop(0)
+        time.sleep(respuesta["demora"])
+
+        cuerpo = b"" if respuesta["cuerpo"] is None else json.dumps(respuesta["cuerpo"]).encode()
+        self.send_response(respuesta["estado"])
+        for nombre, valor in respuesta["cabeceras"].items():
+            self.send_header(nombre, valor.format(url=self.server.url))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    do_GET = do_POST = _atender
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidores = []
+
+    def crear(guion, arrancar=True):
+        servidor = _ServidorGuion(guion)
+        servidores.append(servidor)
+        if arrancar:
+            servidor.arrancar()
+        return servidor
+
+    yield crear
+    for servidor in servidores:
+        if servidor.activo:
+            servidor.shutdown()
+        servidor.server_close()
+
+
+def _cliente(servidor, **opciones):
+    opciones = {"tasa": 1000, "backoff_base": 0.001, **opciones}
+    return TandemClient(base_url=servidor.url, **opciones)
+
+
+def _ejecutar(cliente, accion):
+    async def principal():
+        async with cliente:
+            return await accion(cliente)
+    return asyncio.run(principal())
+
+
+def test_get_se_reintenta_ante_5xx(servidor):
+    api = servidor([_respuesta(502), _respuesta(200, {"ok": True})])
+
+    datos = _ejecutar(_cliente(api), lambda c: c.get_json("/projects"))
+
+    assert datos == {"ok": True}
+    assert len(api.peticiones) == 2
+    assert api.peticiones[0]["cabeceras"]["Authorization"] == "Bearer token-de-prueba"
+
+
+def test_post_no_se_reintenta_ante_5xx_ni_timeout(servidor):
+    api = servidor([_respuesta(500)])
+    with pytest.raises(httpx.HTTPStatusError):
+        _ejecutar(_cliente(api), lambda c: c.post_json("/projects", {"name": "A"}))
+    assert len(api.peticiones) == 1
+
+    api = servidor([_respuesta(201, {"id": "p1"}, demora=1.0)])
+    with pytest.raises(httpx.ReadTimeout):
+        _ejecutar(_cliente(api, timeout=0.2), lambda c: c.post_json("/projects", {"name": "A"}))
+    assert len(api.peticiones) == 1
+
+
+def test_post_se_reintenta_si_no_llego_a_enviarse_o_con_retry_after(servidor):
+    api = servidor([
+        _respuesta(503, cabeceras={"Retry-After": "0"}),
+        _respuesta(201, {"id": "p1"}),
+    ], arrancar=False)
+    # El primer intento encuentra la conexión rechazada; el servidor escucha
+    # antes del reintento (backoff de 0.1 a 0.2 s)
+    threading.Timer(0.05, api.arrancar).start()
+
+    datos = _ejecutar(_cliente(api, backoff_base=0.2), lambda c: c.post_json("/projects", {"name": "A"}))
+
+    assert datos == {"id": "p1"}
+    assert len(api.peticiones) == 2
+
+
+def test_retry_after_se_respeta_aunque_supere_el_backoff_maximo(servidor):
+    api = servidor([_respuesta(429, cabeceras={"Retry-After": "0.3"}), _respuesta(200)])
+
+    inicio = time.perf_counter()
+    _ejecutar(_cliente(api, backoff_max=0.01), lambda c: c.request("GET", "/projects"))
+
+    assert time.perf_counter() - inicio >= 0.3
+    assert len(api.peticiones) == 2
+
+
+def test_retry_after_mayor_que_el_limite_falla_en_el_acto(servidor):
+    api = servidor([_respuesta(429, cabeceras={"Retry-After": "600"})])
+
+    inicio = time.perf_counter()
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        _ejecutar(_cliente(api, max_retry_after=5), lambda c: c.request("GET", "/projects"))
+
+    assert error.value.response.status_code == 429
+    assert time.perf_counter() - inicio < 1
+    assert len(api.peticiones) == 1
+
+
+def test_paginacion_sigue_link_next(servidor):
+    api = servidor([
+        _respuesta(200, {"results": [1, 2]}, cabeceras={"Link": '<{url}/projects?page=2>; rel="next"'}),
+        _respuesta(200, {"results": [3]}),
+    ])
+
+    async def recorrer(cliente):
+        return [elemento async for elemento in cliente.paginar("/projects")]
+
+    assert _ejecutar(_cliente(api), recorrer) == [1, 2, 3]
+    assert api.peticiones[1]["params"]["page"] == ["2"]
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import crud, models, scheduler, tandem_client
+
+
+def _proyectos(db):
+    filas = db.execute(select(models.Proyecto.tandem_id, models.Proyecto.nombre, models.Proyecto.descripcion))
+    return {fila.tandem_id: (fila.nombre, fila.descripcion) for fila in filas}
+
+
+def test_aplicar_inserta_actualiza_y_adopta(db):
+    crud.aplicar_proyectos_tandem(db, [{"tandem_id": "t1", "nombre": "Torre", "descripcion": "v1"}])
+    # Proyecto creado desde Revit, sin tandem_id todavía
+    db.add(models.Proyecto(nombre="Nave", horas=0))
+    db.commit()
+
+    contadores = crud.aplicar_proyectos_tandem(db, [
+        {"tandem_id": "t1", "nombre": "Torre Norte", "descripcion": "v1"},
+        {"tandem_id": "t2", "nombre": "Nave", "descripcion": ""},
+        {"tandem_id": "t3", "nombre": "Puente", "descripcion": "nuevo"},
+    ])
+    db.commit()
+
+    assert contadores == {"leidos": 3, "insertados": 1, "actualizados": 2, "sin_cambios": 0}
+    assert _proyectos(db) == {"t1": ("Torre Norte", "v1"), "t2": ("Nave", ""), "t3": ("Puente", "nuevo")}
+
+    contadores = crud.aplicar_proyectos_tandem(db, [{"tandem_id": "t1", "nombre": "Torre Norte", "descripcion": "v1"}])
+    assert contadores == {"leidos": 1, "insertados": 0, "actualizados": 0, "sin_cambios": 1}
+
+
+class _TandemFalso:
+    def __init__(self, proyectos):
+        self.proyectos = proyectos
+        self.consultas = []
+
+    async def paginar(self, url, params=None):
+        self.consultas.append(params)
+        for proyecto in self.proyectos:
+            yield proyecto
+
+
+def test_sync_tandem_task_respeta_la_marca_de_agua(db, monkeypatch):
+    crud.aplicar_proyectos_tandem(db, [{"tandem_id": "t1", "nombre": "Torre", "descripcion": ""}])
+    marca = "2026-01-01T00:00:00+00:00"
+    crud.registrar_ejecucion_tandem(db, inicio=datetime(2026, 1, 1), estado="completado", marca_agua=marca)
+    db.commit()
+
+    tandem = _TandemFalso([
+        {"id": "t1", "name": "Torre", "description": "renovada", "lastModified": "2026-02-01T10:00:00Z"},
+        {"id": "t2", "name": "Puente", "lastModified": "2026-03-01T08:30:00Z"},
+        # Anterior a la marca: la API ignoró el filtro y no se vuelve a aplicar
+        {"id": "t3", "name": "Antiguo", "lastModified": "2025-12-31T23:59:59Z"},
+    ])
+    monkeypatch.setattr(tandem_client, "cliente", tandem)
+
+    contadores = asyncio.run(scheduler.sync_tandem_task(ejecutor="prueba"))
+
+    assert tandem.consultas == [{scheduler.TANDEM_PARAM_DESDE: marca}]
+    assert contadores == {"leidos": 2, "insertados": 1, "actualizados": 1, "sin_cambios": 0}
+    db.expire_all()
+    assert _proyectos(db) == {"t1": ("Torre", "renovada"), "t2": ("Puente", "")}
+
+    ejecucion = db.scalars(select(models.EjecucionSyncTandem).order_by(models.EjecucionSyncTandem.id.desc())).first()
+    assert ejecucion.estado == "completado"
+    assert ejecucion.ejecutor == "prueba"
+    assert (ejecucion.leidos, ejecucion.insertados, ejecucion.actualizados, ejecucion.sin_cambios) == (2, 1, 1, 0)
+    assert ejecucion.duracion is not None and ejecucion.duracion >= 0
+    assert ejecucion.fin >= ejecucion.inicio
+    assert ejecucion.marca_agua == "2026-03-01T08:30:00+00:00"
+    assert crud.ultima_marca_tandem(db) == ejecucion.marca_agua
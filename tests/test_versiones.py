@@ -0,0 +1,32 @@
+from sqlalchemy import func, select
+
+from app import models
+from datos import payload_proyecto, sincronizar
+
+
+def test_version_se_reserva_justo_antes_del_commit(cliente, db, sentencias):
+    sincronizar(cliente, payload_proyecto(modo="reconciliar"))
+    sentencias.clear()
+    sincronizar(cliente, payload_proyecto(modo="reemplazar", elementos=4))
+    sentencias = [" ".join(s.split()).upper() for s in sentencias]
+
+    reserva = next(i for i, s in enumerate(sentencias) if s.startswith("UPDATE CONTADOR_CAMBIOS"))
+    commit = sentencias.index("COMMIT", reserva)
+    assert any(s.startswith("INSERT INTO ELEMENTOS") for s in sentencias[:reserva])
+    # Entre la reserva y el commit solo se estampa la versión en lo ya escrito
+    for sentencia in sentencias[reserva + 1:commit]:
+        assert sentencia.startswith(("SELECT CONTADOR_CAMBIOS", "UPDATE")), sentencia
+        assert "INSERT" not in sentencia and "DELETE" not in sentencia
+
+
+def test_no_quedan_versiones_provisionales(cliente, db):
+    sincronizar(cliente, payload_proyecto(modo="reconciliar"))
+    sincronizar(cliente, payload_proyecto(modo="reemplazar", elementos=2))
+    cliente.post("/sync/revit/delete", json={"tipo": "elemento", "revit_id": 1, "proyecto": "Proyecto A"})
+
+    contador = db.scalar(select(models.ContadorCambios.valor).where(models.ContadorCambios.id == 1))
+    assert contador == 3
+    for modelo in (models.Proyecto, models.Categoria, models.Familia, models.TipoFamilia, models.Elemento,
+                   models.Eliminacion):
+        assert db.scalar(select(func.min(modelo.version))) > 0, modelo.__tablename__
+        assert db.scalar(select(func.max(modelo.version))) <= contador